@@ -0,0 +1,291 @@
+import argparse
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import zstandard
+except ImportError:  # Fall back to zlib so archiving never blocks a run
+    zstandard = None
+
+from categories import DEFAULT_CACHE_FILE, category_path, set_category_tree
+
+
+INDEX_FILE = "index.jsonl"
+_LENGTH = struct.Struct(">I")
+
+# The archive that fetched pages are written to; None means archiving is off.
+_active_archive = None
+
+
+def _compress(data):
+    if zstandard is not None:
+        return "zstd", zstandard.ZstdCompressor(level=3).compress(data)
+    return "zlib", zlib.compress(data, 6)
+
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("This archive was written with zstd; install the 'zstandard' package to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+class PageArchive:
+    """
+    Append-only archive of raw fetched pages.
+
+    Pages are compressed individually (zstd, or zlib if zstandard is not
+    installed) and appended to a segment file; one segment is written per
+    run. `index.jsonl` records, for every page, its URL, kind (listing or
+    product), fetch time, category (if known) and location in the segment,
+    so the archive can be queried without decompressing anything.
+
+    Args:
+        directory (str): Archive directory, created if missing.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_name = None
+        self._index = None
+        self.pages_written = 0
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def start(self):
+        """Open a new segment and make this the archive used by archive_page."""
+        global _active_archive
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._segment_name = f"pages-{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}.bin"
+        self._segment = open(os.path.join(self.directory, self._segment_name), 'ab')
+        self._index = open(os.path.join(self.directory, INDEX_FILE), 'a', encoding='utf-8')
+        _active_archive = self
+
+    def stop(self):
+        """Close the segment and index files."""
+        global _active_archive
+
+        if _active_archive is self:
+            _active_archive = None
+        with self._lock:
+            if self._segment:
+                self._segment.close()
+                self._index.close()
+                self._segment = None
+                self._index = None
+
+        if self.pages_written:
+            ratio = self.bytes_raw / self.bytes_stored if self.bytes_stored else 0
+            print(f"Archived {self.pages_written} pages to {self.directory} "
+                  f"({self.bytes_stored / 1024 / 1024:.1f} MiB, {ratio:.1f}x compression)")
+
+    def store(self, url, html, kind, fetched_at=None, category=None):
+        """
+        Append one page to the archive.
+
+        Args:
+            url (str): Page URL
+            html (str): Raw page HTML
+            kind (str): "listing" or "product"
+            fetched_at (float | None): Unix timestamp, defaults to now
+            category (str | None): Listing URL the page was found in
+        """
+        raw = html.encode('utf-8')
+        codec, payload = _compress(raw)
+
+        with self._lock:
+            if self._segment is None:
+                return
+            offset = self._segment.tell()
+            self._segment.write(_LENGTH.pack(len(payload)))
+            self._segment.write(payload)
+            self._segment.flush()
+
+            entry = {
+                'url': url,
+                'kind': kind,
+                'fetched_at': fetched_at if fetched_at is not None else time.time(),
+                'segment': self._segment_name,
+                'offset': offset,
+                'length': len(payload),
+                'codec': codec,
+            }
+            if category:
+                entry['category'] = category
+            self._index.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._index.flush()
+
+            self.pages_written += 1
+            self.bytes_raw += len(raw)
+            self.bytes_stored += len(payload) + _LENGTH.size
+
+
+def archive_page(url, html, kind, category=None):
+    """Store a fetched page in the active archive, if any."""
+    archive = _active_archive
+    if archive is not None and html:
+        archive.store(url, html, kind, category=category)
+
+
+#####################################################################################################
+## READING
+#####################################################################################################
+
+def iter_index(directory):
+    """Yield every index entry of an archive, oldest first."""
+    path = os.path.join(directory, INDEX_FILE)
+    if not os.path.exists(path):
+        return
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def latest_entries(directory, kind=None, since=None):
+    """
+    Return the most recent index entry per URL.
+
+    Args:
+        directory (str): Archive directory
+        kind (str | None): Only "listing" or "product" pages if given
+        since (float | None): Only pages fetched at or after this Unix timestamp
+
+    Returns:
+        list[dict]: Index entries, one per URL
+    """
+    latest = {}
+    for entry in iter_index(directory):
+        if kind and entry['kind'] != kind:
+            continue
+        if since is not None and entry['fetched_at'] < since:
+            continue
+        current = latest.get(entry['url'])
+        if current is None or entry['fetched_at'] >= current['fetched_at']:
+            latest[entry['url']] = entry
+    return list(latest.values())
+
+
+def read_page(directory, entry, _handles=None):
+    """Return the HTML of an archived page given its index entry."""
+    path = os.path.join(directory, entry['segment'])
+    if _handles is not None:
+        handle = _handles.get(path)
+        if handle is None:
+            handle = _handles[path] = open(path, 'rb')
+    else:
+        handle = open(path, 'rb')
+
+    try:
+        handle.seek(entry['offset'])
+        length, = _LENGTH.unpack(handle.read(_LENGTH.size))
+        return _decompress(entry['codec'], handle.read(length)).decode('utf-8')
+    finally:
+        if _handles is None:
+            handle.close()
+
+
+#####################################################################################################
+## OFFLINE RE-EXTRACTION
+#####################################################################################################
+
+def _reextract_chunk(directory, entries):
+    """Parse a chunk of archived product pages in a worker process; returns the variants per entry."""
+    from main import parse_product_page
+
+    handles = {}
+    variants = []
+    failed = []
+    try:
+        for entry in entries:
+            try:
+                variants.append(parse_product_page(read_page(directory, entry, handles)))
+            except Exception as e:
+                variants.append([])
+                failed.append({'url': entry['url'], 'message': f"{type(e).__name__}: {e}"})
+    finally:
+        for handle in handles.values():
+            handle.close()
+    return variants, failed
+
+
+def reextract(directory, output_file='output_reextracted', processes=None, chunk_size=200, since=None,
+              tree_file=DEFAULT_CACHE_FILE):
+    """
+    Re-run the product page parsers over an archive, without network access,
+    and save the variants like a normal run.
+
+    Args:
+        directory (str): Archive directory
+        output_file (str): Base name for the Excel/JSON outputs
+        processes (int | None): Worker processes, defaults to the CPU count
+        chunk_size (int): Pages handed to a worker at a time
+        since (float | None): Only use pages fetched at or after this Unix timestamp
+        tree_file (str | None): Category tree cache giving the category paths,
+              used however old it is; without it category_path stays empty
+
+    Returns:
+        list: All re-extracted variants
+    """
+    from main import save_outputs
+
+    started = time.perf_counter()
+    if tree_file and os.path.exists(tree_file):
+        with open(tree_file, encoding='utf-8') as f:
+            set_category_tree(json.load(f))
+    entries = latest_entries(directory, kind='product', since=since)
+    print(f"Re-extracting {len(entries)} archived product pages from {directory}...")
+
+    chunks = [entries[i:i + chunk_size] for i in range(0, len(entries), chunk_size)]
+    all_products = []
+    failed = []
+
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        for chunk, (variants, chunk_failed) in zip(chunks, executor.map(_reextract_chunk,
+                                                                        [directory] * len(chunks), chunks)):
+            for entry, page_variants in zip(chunk, variants):
+                path = category_path(entry.get('category'))
+                all_products.extend(dict(variant, category_path=path) for variant in page_variants)
+            failed.extend(chunk_failed)
+
+    for failure in failed:
+        print(f"  Could not parse {failure['url']}: {failure['message']}")
+
+    save_outputs(all_products, output_file)
+    print(f"Re-extraction finished in {time.perf_counter() - started:.1f}s "
+          f"({len(entries)} pages, {len(failed)} parse failures)")
+    return all_products
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Re-extract product data from a raw HTML archive.")
+    parser.add_argument("directory", help="Archive directory written by a scraping run")
+    parser.add_argument("--output", default="output_reextracted", help="Base name for output files")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Pages per worker task")
+    parser.add_argument("--category-tree", default=DEFAULT_CACHE_FILE, help="Category tree cache for the "
+                                                                           "category paths")
+    args = parser.parse_args()
+
+    reextract(args.directory, output_file=args.output, processes=args.processes, chunk_size=args.chunk_size,
+              tree_file=args.category_tree)
@@ -0,0 +1,359 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Backends each CLI stage imports on top of main.py itself
+STAGE_BACKENDS = {
+    'categories': [],
+    'links': ['playwright.sync_api'],
+    'scrape': ['selenium.webdriver', 'pandas', 'openpyxl'],
+    'export': ['pandas', 'openpyxl'],
+}
+ALL_BACKENDS = ['selenium.webdriver', 'playwright.sync_api', 'pandas', 'openpyxl']
+
+
+def _time_python(code, repeat):
+    """Return the wall-clock times of `repeat` fresh interpreters running code."""
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=REPO_DIR, check=True)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def benchmark_startup(repeat=5):
+    """
+    Measure interpreter startup plus imports for every CLI stage.
+
+    Each stage is timed as a fresh `python -c` importing main and the
+    backends that stage loads lazily; "all backends" is what every
+    invocation paid when main.py imported them at module level.
+
+    Returns:
+        dict[str, float]: Median seconds per stage
+    """
+    cases = {'python (no imports)': 'pass'}
+    for stage, backends in STAGE_BACKENDS.items():
+        cases[stage] = '; '.join(['import main'] + [f'import {b}' for b in backends])
+    cases['all backends (eager)'] = '; '.join(['import main'] + [f'import {b}' for b in ALL_BACKENDS])
+
+    results = {}
+    print(f"Startup time (median of {repeat} runs):")
+    for name, code in cases.items():
+        results[name] = statistics.median(_time_python(code, repeat))
+        print(f"  {name:<22} {results[name] * 1000:8.1f} ms")
+    return results
+
+
+LISTING_FIXTURE = """<html><head><meta charset="utf-8"></head><body>
+<div class="grid">{products}</div>
+<div class="floatright"><a href="{name}?seite=1">1</a><a href="{name}?seite=2">2</a></div>
+<script>
+  // Like the real listings, a second batch of products is loaded once the visitor scrolls
+  window.addEventListener('scroll', function () {{
+    if (document.getElementById('more')) return;
+    var more = document.createElement('div');
+    more.id = 'more';
+    more.innerHTML = {lazy_products!r};
+    document.body.appendChild(more);
+  }});
+</script>
+</body></html>"""
+
+PRODUCT_FIXTURE = """<html><head><meta charset="utf-8"></head><body>
+<h1 class="TypUeber">Handseilwinde {product}</h1>
+<div class="TabZel2"><div class="ProdgrupDesktop"><div class="ProdukteCar">{variants}</div></div></div>
+</body></html>"""
+
+VARIANT_FIXTURE = ('<div class="CarArtikel"><div class="ArtTypBez">{load} kg</div>'
+                   '<div class="SortPreis2">{price},00 \u20ac exkl. 19% MwSt.</div>'
+                   '<div class="ArtDetailsCar">HW-{product}-{load}</div></div>')
+
+
+def write_synthetic_fixtures(directory, pages=5, products_per_page=24, variants_per_product=8):
+    """Write listing (*-Gruppe.html) pages and a product (*-Typen.html) page for every product they link."""
+    for idx in range(pages):
+        name = f"{idx}-Bench-Gruppe"
+        products = [f"{idx}-{n}" for n in range(2 * products_per_page)]
+        links = [f'<a href="/{product}-Winde-Typen">Winde {product}</a>' for product in products]
+        with open(os.path.join(directory, f"{name}.html"), 'w', encoding='utf-8') as f:
+            f.write(LISTING_FIXTURE.format(name=name, products=''.join(links[:products_per_page]),
+                                           lazy_products=''.join(links[products_per_page:])))
+
+        for product in products:
+            variants = ''.join(VARIANT_FIXTURE.format(product=product, load=250 * (v + 1), price=100 + v)
+                               for v in range(variants_per_product))
+            with open(os.path.join(directory, f"{product}-Winde-Typen.html"), 'w', encoding='utf-8') as f:
+                f.write(PRODUCT_FIXTURE.format(product=product, variants=variants))
+
+
+class _FixtureHandler(SimpleHTTPRequestHandler):
+    """Serves /<name> from <name>.html, ignoring the query string."""
+
+    extensions_map = {'.html': 'text/html; charset=utf-8'}
+
+    def log_message(self, format, *args):
+        pass
+
+    def translate_path(self, path):
+        return super().translate_path(path.split('?', 1)[0].rstrip('/') + '.html')
+
+
+@contextmanager
+def fixture_server(fixtures_dir=None, **fixture_options):
+    """
+    Serve fixture pages from a local HTTP server for the duration of the block.
+
+    Args:
+        fixtures_dir (str | None): Directory of saved *-Gruppe.html and
+            *-Typen.html pages; synthetic pages (write_synthetic_fixtures,
+            with fixture_options) if None
+
+    Yields:
+        tuple[str, list[str]]: Base URL and the page names (URL paths)
+    """
+    tmp_dir = None
+    if fixtures_dir is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        fixtures_dir = tmp_dir.name
+        write_synthetic_fixtures(fixtures_dir, **fixture_options)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), partial(_FixtureHandler, directory=fixtures_dir))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        pages = sorted(name[:-len('.html')] for name in os.listdir(fixtures_dir) if name.endswith('.html'))
+        yield f"http://127.0.0.1:{server.server_address[1]}/", pages
+    finally:
+        server.shutdown()
+        server.server_close()
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+def benchmark_engines(engine_names=None, fixtures_dir=None, repeat=3, settle_seconds=None, max_pages=5):
+    """
+    Fetch the same fixture pages with every fetch engine and compare them.
+
+    Pages are served from a local HTTP server; each engine fetches up to
+    `max_pages` listing and product pages `repeat` times each. Besides the latency, the number
+    of product links or variants parsed from the result shows whether an
+    engine sees everything (plain HTTP does not run the lazy loading).
+
+    Args:
+        engine_names (list[str] | None): Engines to compare, all if None
+        fixtures_dir (str | None): Directory of saved *-Gruppe.html and
+            *-Typen.html pages; synthetic pages if None
+        repeat (int): Fetches per page and engine
+        settle_seconds (float | None): Product page wait; the engine default if None
+        max_pages (int): Pages fetched per kind
+
+    Returns:
+        dict[tuple[str, str], dict]: (engine, kind) -> median, mean and items
+    """
+    from engines import ENGINES, create_engine
+    from main import parse_listing_page, parse_product_page
+
+    options = {} if settle_seconds is None else {'settle_seconds': settle_seconds}
+    results = {}
+
+    with fixture_server(fixtures_dir) as (base_url, pages):
+        print(f"Fetch engines on up to {max_pages} of {len(pages)} fixture pages per kind, {repeat} fetch(es) each:")
+        print(f"  {'engine':<12}{'kind':<9}{'median':>9}{'mean':>9}{'items/page':>12}")
+        for name in engine_names or list(ENGINES):
+            engine = None
+            try:
+                engine = create_engine(name, **options)
+                for kind in ('listing', 'product'):
+                    urls = [base_url + page for page in pages
+                            if page.endswith('-Typen') == (kind == 'product')][:max_pages]
+                    times = []
+                    items = 0
+                    for url in urls:
+                        for _ in range(repeat):
+                            started = time.perf_counter()
+                            html = engine.fetch(url, kind)
+                            times.append(time.perf_counter() - started)
+                        items += len(parse_listing_page(html, url)[0] if kind == 'listing'
+                                     else parse_product_page(html))
+                    if not times:
+                        continue
+                    results[(name, kind)] = {'median': statistics.median(times), 'mean': statistics.mean(times),
+                                             'items': items / len(urls)}
+                    r = results[(name, kind)]
+                    print(f"  {name:<12}{kind:<9}{r['median']:>8.3f}s{r['mean']:>8.3f}s{r['items']:>12.1f}")
+            except Exception as e:
+                print(f"  {name:<12}unavailable: {type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}")
+            finally:
+                if engine is not None:
+                    engine.close()
+
+    for kind in ('listing', 'product'):
+        # Only engines that see as many items as the best one are candidates
+        candidates = [(r['median'], name) for (name, k), r in results.items() if k == kind]
+        most_items = max((r['items'] for (name, k), r in results.items() if k == kind), default=0)
+        complete = [(median, name) for median, name in candidates if results[(name, kind)]['items'] >= most_items]
+        if complete:
+            print(f"Fastest complete engine for {kind} pages: {min(complete)[1]}")
+    return results
+
+
+def synthetic_variants(count, variants_per_page=8, seed=0):
+    """
+    Return `count` raw variants (as extract_product_variants gives them) in
+    pages of variants_per_page, with the quirks the cleaning handles: doubled
+    first words, stray whitespace, price decorations and repeated serials.
+    """
+    import random
+
+    rng = random.Random(seed)
+    bases = ["Handseilwinde", "Seilwinde Seilwinde", "Kettenzug", "Hebeband  Rundschlinge",
+             "Zahnstangenwinde", "Palettenwinde", "Hubwagen Hubwagen"]
+    price_formats = ["{} \u20ac exkl. 19% MwSt.", "ab {}\u20ac", "{} \u20ac", "{}\u20ac*", "{}", ""]
+
+    variants = []
+    for idx in range(count):
+        page = idx // variants_per_page
+        position = idx % variants_per_page
+        load = 250 * (position + 1)
+        euros = rng.randint(20, 4000)
+        price = f"{euros // 1000}.{euros % 1000:03d},{rng.randint(0, 99):02d}" if euros >= 1000 \
+            else f"{euros},{rng.randint(0, 99):02d}"
+        # Every 20th page lists a variant twice (desktop and mobile grids); few lack a serial
+        serial = "" if rng.random() < 0.02 else \
+            f"HW-{page}-{position - 1 if position and page % 20 == 0 else position}"
+        variants.append({
+            '_page': page,
+            'product_name': f" {bases[page % len(bases)]} {load} kg ",
+            'product_price': rng.choice(price_formats).format(price),
+            'product_serial_number': serial,
+        })
+    return variants
+
+
+def benchmark_postprocess(count=1_000_000, fixtures_dir=None):
+    """
+    Compare page-by-page and batched cleaning and de-duplication of variants.
+
+    The page-by-page path is what parse_product_page does for every page
+    (dedupe_by_serial + clean_product_data); the batched path is
+    postprocess.clean_variants over the whole result set. Both must give
+    identical output, on the synthetic variants and on the fixture pages.
+    Numeric prices are compared the same way: catalog_store.parse_price per
+    row against postprocess.parse_prices over the column.
+
+    Args:
+        count (int): Synthetic variants to clean
+        fixtures_dir (str | None): Directory of saved *-Typen.html pages to
+            check the paths against; synthetic pages if None
+
+    Returns:
+        dict[str, float]: Seconds per path
+    """
+    import pandas as pd
+
+    from catalog_store import parse_price
+    from main import clean_product_data, dedupe_by_serial, extract_product_variants, parse_product_page
+    from postprocess import clean_variants, clean_variants_frame, parse_prices
+
+    tmp_dir = None
+    if fixtures_dir is None:
+        tmp_dir = tempfile.TemporaryDirectory()
+        fixtures_dir = tmp_dir.name
+        write_synthetic_fixtures(fixtures_dir, pages=10)
+    try:
+        raw, expected = [], []
+        for name in sorted(os.listdir(fixtures_dir)):
+            if name.endswith('-Typen.html'):
+                with open(os.path.join(fixtures_dir, name), encoding='utf-8') as f:
+                    html = f.read()
+                raw.extend(dict(variant, _page=name) for variant in extract_product_variants(html))
+                expected.extend(parse_product_page(html))
+        fixtures_match = clean_variants(raw, page_column='_page', drop_page_column=True) == expected
+        print(f"Fixture pages: batched output {'identical' if fixtures_match else 'DIFFERS'} "
+              f"({len(expected)} variants)")
+    finally:
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+    variants = synthetic_variants(count)
+    results = {}
+
+    started = time.perf_counter()
+    pages = {}
+    for variant in variants:
+        pages.setdefault(variant['_page'], []).append(variant)
+    row_wise = []
+    for page_variants in pages.values():
+        row_wise.extend(clean_product_data(dedupe_by_serial(page_variants)))
+    results['page by page'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = clean_variants(variants, page_column='_page')
+    results['batched, list of dicts in and out'] = time.perf_counter() - started
+
+    df = pd.DataFrame(variants)
+    started = time.perf_counter()
+    cleaned = clean_variants_frame(df, page_column='_page')
+    results['batched, DataFrame'] = time.perf_counter() - started
+
+    print(f"Cleaning {count:,} synthetic variants ({len(row_wise):,} after de-duplication): "
+          f"batched output {'identical' if batched == row_wise else 'DIFFERS'}")
+    for name, seconds in results.items():
+        print(f"  {name:<36} {seconds:8.2f}s  {results['page by page'] / seconds:5.1f}x")
+
+    prices = [variant['product_price'] for variant in row_wise]
+    started = time.perf_counter()
+    row_values = [parse_price(price) for price in prices]
+    results['parse_price per row'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    values = parse_prices(cleaned['product_price'])
+    results['parse_prices'] = time.perf_counter() - started
+
+    same = values.isna().tolist() == [value is None for value in row_values] and \
+        values.dropna().tolist() == [value for value in row_values if value is not None]
+    print(f"Numeric prices: batched values {'identical' if same else 'DIFFER'}")
+    for name in ('parse_price per row', 'parse_prices'):
+        print(f"  {name:<36} {results[name]:8.2f}s  {results['parse_price per row'] / results[name]:5.1f}x")
+    return results
+
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the scraper.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    startup_parser = subparsers.add_parser("startup", help="Startup time of each CLI stage")
+    startup_parser.add_argument("--repeat", type=int, default=5)
+
+    engines_parser = subparsers.add_parser("engines", help="Compare fetch engines on fixture pages")
+    engines_parser.add_argument("--engine", action="append", help="Only this engine (repeatable)")
+    engines_parser.add_argument("--fixtures", help="Directory of saved *-Gruppe.html / *-Typen.html pages")
+    engines_parser.add_argument("--repeat", type=int, default=3)
+    engines_parser.add_argument("--settle", type=float, help="Seconds to wait on product pages")
+    engines_parser.add_argument("--pages", type=int, default=5, help="Pages fetched per kind")
+
+    postprocess_parser = subparsers.add_parser("postprocess", help="Page-by-page vs batched variant cleaning")
+    postprocess_parser.add_argument("--variants", type=int, default=1_000_000)
+    postprocess_parser.add_argument("--fixtures", help="Directory of saved *-Typen.html pages")
+
+    args = parser.parse_args()
+
+    if args.command == "startup":
+        benchmark_startup(args.repeat)
+    elif args.command == "engines":
+        benchmark_engines(args.engine, args.fixtures, args.repeat, args.settle, args.pages)
+    elif args.command == "postprocess":
+        benchmark_postprocess(args.variants, args.fixtures)
@@ -0,0 +1,355 @@
+import argparse
+import re
+import sqlite3
+import threading
+import time
+
+from categories import PATH_SEPARATOR, category_path
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS categories (
+    url TEXT PRIMARY KEY,
+    name TEXT,
+    path TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS products (
+    url TEXT PRIMARY KEY,
+    category_url TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    last_scraped REAL
+);
+
+CREATE TABLE IF NOT EXISTS variants (
+    product_url TEXT NOT NULL,
+    variant_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    product_serial_number TEXT,
+    product_name TEXT,
+    product_price TEXT,
+    price_value REAL,
+    category_url TEXT,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL,
+    PRIMARY KEY (product_url, variant_key)
+);
+
+CREATE TABLE IF NOT EXISTS runs (
+    started_at REAL PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    variants INTEGER NOT NULL,
+    partial INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_products_category ON products (category_url);
+CREATE INDEX IF NOT EXISTS idx_products_last_seen ON products (last_seen);
+CREATE INDEX IF NOT EXISTS idx_variants_serial ON variants (product_serial_number);
+CREATE INDEX IF NOT EXISTS idx_variants_category ON variants (category_url);
+CREATE INDEX IF NOT EXISTS idx_variants_last_seen ON variants (last_seen);
+"""
+
+UPSERT_CATEGORY = """
+INSERT INTO categories (url, name, path, first_seen, last_seen) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    name = COALESCE(excluded.name, name),
+    path = COALESCE(excluded.path, path),
+    last_seen = excluded.last_seen
+"""
+
+UPSERT_PRODUCT = """
+INSERT INTO products (url, category_url, first_seen, last_seen, last_scraped) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (url) DO UPDATE SET
+    category_url = COALESCE(excluded.category_url, category_url),
+    last_seen = excluded.last_seen,
+    last_scraped = COALESCE(excluded.last_scraped, last_scraped)
+"""
+
+UPSERT_VARIANT = """
+INSERT INTO variants (product_url, variant_key, position, product_serial_number, product_name,
+                      product_price, price_value, category_url, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (product_url, variant_key) DO UPDATE SET
+    position = excluded.position,
+    product_serial_number = excluded.product_serial_number,
+    product_name = excluded.product_name,
+    product_price = excluded.product_price,
+    price_value = excluded.price_value,
+    category_url = COALESCE(excluded.category_url, category_url),
+    last_seen = excluded.last_seen
+"""
+
+# Columns of the Excel/JSON export, in the order the scraper has always written them,
+# with the SQL expression each is read from
+EXPORT_COLUMNS = {
+    'product_name': 'v.product_name',
+    'product_price': 'v.product_price',
+    'product_serial_number': 'v.product_serial_number',
+    'category_path': "COALESCE(c.path, '')",
+}
+
+# A variant scraped without its category (e.g. found through the sitemaps) takes its product's
+CATEGORY_URL = "COALESCE(v.category_url, p.category_url)"
+
+
+def latest_run(conn, full_only=False):
+    """Return (started_at, finished_at) of the last completed (full) run in a catalog connection, or None."""
+    return conn.execute(
+        f"SELECT started_at, finished_at FROM runs {'WHERE partial = 0' if full_only else ''} "
+        f"ORDER BY finished_at DESC LIMIT 1").fetchone()
+
+
+def export_rows(conn, since, include_category=False):
+    """
+    Return the current variants of every product seen since `since` from a catalog connection.
+
+    Args:
+        conn (sqlite3.Connection): Catalog database, which may be opened read-only
+        since (float): Unix timestamp
+        include_category (bool): Also return each variant's category_url
+
+    Returns:
+        list[dict]: Variant dicts with the export columns
+    """
+    columns = dict(EXPORT_COLUMNS, **({'category_url': CATEGORY_URL} if include_category else {}))
+    cursor = conn.execute(f"""
+        SELECT {', '.join(columns.values())}
+        FROM products p
+        JOIN variants v ON v.product_url = p.url
+        LEFT JOIN categories c ON c.url = {CATEGORY_URL}
+        WHERE p.last_seen >= ? AND v.last_seen >= p.last_scraped
+        ORDER BY p.category_url, p.url, v.position
+    """, (since,))
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def parse_price(price):
+    """
+    Convert a cleaned price such as "1958,37 €" or "1.958,37 €" to a float.
+
+    Returns:
+        float | None: Numeric price, or None if there is none
+    """
+    digits = re.sub(r'[^\d,.]', '', price or '')
+    if not digits:
+        return None
+    digits = digits.replace('.', '').replace(',', '.')
+    try:
+        return float(digits)
+    except ValueError:
+        return None
+
+
+class CatalogStore:
+    """
+    Persistent SQLite catalog of categories, products and variants.
+
+    Writes are buffered and flushed as batched upserts inside one
+    transaction every `batch_size` rows, so variants can be streamed in from
+    many scraping threads. A product's variants are the rows seen at its
+    latest scrape; `export_rows` turns the catalog back into the flat
+    variant dicts the Excel/JSON outputs are built from.
+
+    Args:
+        path (str): Database file
+        batch_size (int): Buffered rows per write transaction
+    """
+
+    def __init__(self, path='catalog.db', batch_size=5000):
+        self.path = path
+        self.batch_size = batch_size
+        self.run_started = time.time()
+        self._lock = threading.Lock()
+        self._categories = []
+        self._products = []
+        self._variants = []
+        # Categories recorded with their path in this run
+        self._known_categories = set()
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        # Catalogs created before partial runs existed
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}
+        if 'partial' not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE runs ADD COLUMN partial INTEGER NOT NULL DEFAULT 0")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _pending(self):
+        return len(self._categories) + len(self._products) + len(self._variants)
+
+    def add_category(self, url, name=None, path=None):
+        """
+        Record that a category was seen in this run.
+
+        Without a name and path, both are taken from the current category tree.
+        """
+        now = time.time()
+        with self._lock:
+            self._add_category_locked(url, name, path, now)
+            if self._pending() >= self.batch_size:
+                self._flush_locked()
+
+    def _add_category_locked(self, url, name, path, now):
+        if path is None:
+            path = category_path(url) or None
+        if name is None and path:
+            name = path.rsplit(PATH_SEPARATOR, 1)[-1]
+        self._categories.append((url, name, path, now, now))
+        if path:
+            self._known_categories.add(url)
+
+    def _note_category_locked(self, category_url, now):
+        # Products found through the sitemap or a retry may be the first sign of their category
+        if category_url and category_url not in self._known_categories:
+            self._add_category_locked(category_url, None, None, now)
+
+    def add_products(self, product_urls, category_url=None):
+        """Record that products were discovered (whether or not they are scraped)."""
+        now = time.time()
+        with self._lock:
+            self._note_category_locked(category_url, now)
+            self._products.extend((url, category_url, now, now, None) for url in product_urls)
+            if self._pending() >= self.batch_size:
+                self._flush_locked()
+
+    def add_variants(self, product_url, variants, category_url=None):
+        """Record the variants of a freshly scraped product page."""
+        now = time.time()
+        rows = []
+        for position, variant in enumerate(variants):
+            serial = variant.get('product_serial_number', '')
+            name = variant.get('product_name', '')
+            price = variant.get('product_price', '')
+            rows.append((product_url, serial or f"name:{name}", position, serial, name, price,
+                         parse_price(price), category_url, now, now))
+
+        with self._lock:
+            self._note_category_locked(category_url, now)
+            self._products.append((product_url, category_url, now, now, now))
+            self._variants.extend(rows)
+            if self._pending() >= self.batch_size:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending():
+            return
+        with self.conn:
+            self.conn.executemany(UPSERT_CATEGORY, self._categories)
+            self.conn.executemany(UPSERT_PRODUCT, self._products)
+            self.conn.executemany(UPSERT_VARIANT, self._variants)
+        self._categories = []
+        self._products = []
+        self._variants = []
+
+    def flush(self):
+        """Write all buffered rows in one transaction."""
+        with self._lock:
+            self._flush_locked()
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    def finish_run(self, variants, partial=False):
+        """
+        Mark this run as complete, so readers can switch to its results.
+
+        A partial run (selected categories only) refreshes part of the catalog;
+        readers keep exporting from the last full run's start.
+        """
+        self.flush()
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO runs (started_at, finished_at, variants, partial) "
+                              "VALUES (?, ?, ?, ?)", (self.run_started, time.time(), variants, int(partial)))
+
+    def latest_run(self, full_only=False):
+        """Return (started_at, finished_at) of the last completed (full) run, or None."""
+        return latest_run(self.conn, full_only)
+
+    def export_rows(self, since=None, include_category=False):
+        """
+        Return the current variants of every product seen since `since`.
+
+        Args:
+            since (float | None): Unix timestamp, defaults to the start of this run
+            include_category (bool): Also return each variant's category_url
+
+        Returns:
+            list[dict]: Variant dicts with the export columns
+        """
+        self.flush()
+        return export_rows(self.conn, self.run_started if since is None else since, include_category)
+
+    def product_categories(self, product_urls):
+        """Return {product_url: category_url} for the given products whose category is known."""
+        self.flush()
+        product_urls = set(product_urls)
+        cursor = self.conn.execute("SELECT url, category_url FROM products WHERE category_url IS NOT NULL")
+        return {url: category_url for url, category_url in cursor if url in product_urls}
+
+    def category_products(self):
+        """Return {category_url: set of product URLs} for every product whose category is known."""
+        self.flush()
+        products = {}
+        for url, category_url in self.conn.execute(
+                "SELECT url, category_url FROM products WHERE category_url IS NOT NULL"):
+            products.setdefault(category_url, set()).add(url)
+        return products
+
+    def find_by_serial(self, serial):
+        """Return the latest known variant(s) with the given serial number."""
+        self.flush()
+        cursor = self.conn.execute("""
+            SELECT product_url, product_serial_number, product_name, product_price, price_value,
+                   category_url, last_seen
+            FROM variants WHERE product_serial_number = ?
+            ORDER BY last_seen DESC
+        """, (serial,))
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def print_summary(self):
+        counts = {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ('categories', 'products', 'variants')}
+        print(f"Catalog {self.path}: {counts['categories']} categories, {counts['products']} products, "
+              f"{counts['variants']} variants")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query or export the SQLite product catalog.")
+    parser.add_argument("--db", default="catalog.db", help="Catalog database file")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Write Excel/JSON outputs from the catalog")
+    export_parser.add_argument("--output", default="output", help="Base name for output files")
+    export_parser.add_argument("--since", type=float, default=0, help="Only products seen since this Unix time")
+
+    lookup_parser = subparsers.add_parser("lookup", help="Look up variants by serial number")
+    lookup_parser.add_argument("serial")
+
+    args = parser.parse_args()
+
+    with CatalogStore(args.db) as store:
+        if args.command == "export":
+            from main import save_outputs
+            save_outputs(store.export_rows(since=args.since), args.output)
+        else:
+            started = time.perf_counter()
+            for row in store.find_by_serial(args.serial):
+                print(row)
+            print(f"({(time.perf_counter() - started) * 1000:.3f} ms)")
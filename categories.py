@@ -0,0 +1,200 @@
+import argparse
+import fnmatch
+import json
+import os
+import time
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+import http_client
+
+
+BASE_URL = "https://www.tomanro.de/"
+MENU_ENDPOINT = "https://www.tomanro.de/MenuDeskNeu.php?Menubut={}"
+MENU_COUNT = 6
+DEFAULT_CACHE_FILE = "category_tree.json"
+DEFAULT_MAX_AGE_DAYS = 1
+PATH_SEPARATOR = " > "
+
+# The tree loaded by get_category_tree, used by category_path()
+_current_tree = None
+
+
+def _slug(url):
+    return url.rstrip('/').rsplit('/', 1)[-1]
+
+
+def parse_menu(menu_html, menu_index):
+    """
+    Parse one mega menu into its Hauptgruppe -> Gruppe hierarchy.
+
+    The menus list each main group's link followed by the links of its
+    groups, so a Gruppe belongs to the closest Hauptgruppe before it.
+
+    Returns:
+        list[dict]: Main groups with url, name and their groups (url, name)
+    """
+    soup = BeautifulSoup(menu_html, "html.parser")
+    main_groups = []
+    current = None
+
+    for a in soup.select("a.MainMenuLink[href]"):
+        href = a["href"].strip()
+        name = a.get_text(" ", strip=True) or a.get("title", "").strip()
+        full_url = urljoin(BASE_URL, href)
+
+        if href.endswith("-Hauptgruppe"):
+            current = {'url': full_url, 'name': name or _slug(full_url), 'groups': []}
+            main_groups.append(current)
+        elif href.endswith("-Gruppe"):
+            if current is None:
+                # Groups listed before any main group hang off the menu itself
+                current = {'url': None, 'name': f"Menu {menu_index}", 'groups': []}
+                main_groups.append(current)
+            if all(group['url'] != full_url for group in current['groups']):
+                current['groups'].append({'url': full_url, 'name': name or _slug(full_url)})
+
+    return main_groups
+
+
+class CategoryTree:
+    """
+    The site's category hierarchy: mega menu -> Hauptgruppe -> Gruppe.
+
+    Gruppe pages are the product listings the scraper crawls; `select`
+    picks a subset of them by name, URL or path pattern.
+
+    Args:
+        menus (list[list[dict]]): parse_menu() result per mega menu
+        fetched_at (float): When the menus were fetched
+    """
+
+    def __init__(self, menus, fetched_at=None):
+        self.menus = menus
+        self.fetched_at = fetched_at or time.time()
+        self._paths = {}
+        for main_groups in menus:
+            for main_group in main_groups:
+                for group in main_group['groups']:
+                    # A group linked from several main groups keeps its first path
+                    self._paths.setdefault(group['url'], (main_group, group))
+
+    def to_dict(self):
+        return {'fetched_at': self.fetched_at, 'menus': self.menus}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['menus'], data['fetched_at'])
+
+    def leaf_urls(self):
+        """Return every Gruppe (product listing) URL, sorted."""
+        return sorted(self._paths)
+
+    def path(self, url):
+        """Return the path of a Gruppe as a list of names, or [] if it is unknown."""
+        if url not in self._paths:
+            return []
+        main_group, group = self._paths[url]
+        return [main_group['name'], group['name']]
+
+    def path_string(self, url):
+        return PATH_SEPARATOR.join(self.path(url))
+
+    def select(self, patterns):
+        """
+        Return the Gruppe URLs matching any of the patterns, sorted.
+
+        A pattern is compared, case-insensitively, with the group's URL and
+        slug, its name, its main group's URL, slug and name, and the full
+        path ("Hauptgruppe > Gruppe"). Shell wildcards are allowed, so
+        "Hebetechnik" selects a whole subtree and "*winden*" every group
+        with "winden" in its name or path.
+        """
+        patterns = [pattern.strip().lower() for pattern in patterns if pattern.strip()]
+        selected = []
+        for url, (main_group, group) in self._paths.items():
+            candidates = [url, _slug(url), group['name'], main_group['name'], self.path_string(url)]
+            if main_group['url']:
+                candidates += [main_group['url'], _slug(main_group['url'])]
+            candidates = [candidate.lower() for candidate in candidates]
+            if any(fnmatch.fnmatchcase(candidate, pattern) for pattern in patterns for candidate in candidates):
+                selected.append(url)
+        return sorted(selected)
+
+    def print_tree(self, urls=None):
+        """Print the hierarchy, limited to the given Gruppe URLs if any."""
+        urls = set(urls) if urls is not None else None
+        for main_groups in self.menus:
+            for main_group in main_groups:
+                groups = [g for g in main_group['groups'] if urls is None or g['url'] in urls]
+                if not groups:
+                    continue
+                print(f"{main_group['name']}  {main_group['url'] or ''}")
+                for group in groups:
+                    print(f"    {group['name']}  {group['url']}")
+
+
+def build_category_tree():
+    """Fetch the mega menus concurrently over the shared pooled client and build the tree."""
+    menu_urls = [MENU_ENDPOINT.format(menubut) for menubut in range(1, MENU_COUNT + 1)]
+    menus = [parse_menu(menu_html, idx)
+             for idx, menu_html in enumerate(http_client.fetch_many(menu_urls), start=1)]
+    return CategoryTree(menus)
+
+
+def get_category_tree(cache_file=DEFAULT_CACHE_FILE, max_age_days=DEFAULT_MAX_AGE_DAYS, refresh=False):
+    """
+    Return the category tree, from cache_file if it is younger than
+    max_age_days, otherwise freshly fetched (and cached).
+
+    The tree also becomes the one category_path() answers from.
+    """
+    global _current_tree
+
+    tree = None
+    if cache_file and not refresh and os.path.exists(cache_file):
+        with open(cache_file, encoding='utf-8') as f:
+            cached = CategoryTree.from_dict(json.load(f))
+        if time.time() - cached.fetched_at < max_age_days * 24 * 60 * 60:
+            tree = cached
+
+    if tree is None:
+        tree = build_category_tree()
+        if cache_file:
+            tmp_file = f"{cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(tree.to_dict(), f, ensure_ascii=False, indent=1)
+            os.replace(tmp_file, cache_file)
+
+    _current_tree = tree
+    return tree
+
+
+def set_category_tree(tree):
+    """Make tree (a CategoryTree or its to_dict() form) the one category_path() answers from."""
+    global _current_tree
+
+    if isinstance(tree, dict):
+        tree = CategoryTree.from_dict(tree)
+    _current_tree = tree
+    return tree
+
+
+def category_path(url):
+    """Return "Hauptgruppe > Gruppe" for a listing URL of the current tree, or ""."""
+    tree = _current_tree
+    if tree is None or not url:
+        return ""
+    return tree.path_string(url)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show the cached category tree.")
+    parser.add_argument("patterns", nargs="*", help="Only groups matching these names, URLs or path patterns")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_FILE, help="Category tree cache file")
+    parser.add_argument("--refresh", action="store_true", help="Fetch the menus even if the cache is fresh")
+    args = parser.parse_args()
+
+    category_tree = get_category_tree(args.cache, refresh=args.refresh)
+    category_tree.print_tree(category_tree.select(args.patterns) if args.patterns else None)
@@ -0,0 +1,448 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+from main import (
+    LISTING_HEADERS,
+    fetch_page_links,
+    get_sub_sub_category_links,
+    save_outputs,
+    scrape_products,
+)
+from categories import get_category_tree, set_category_tree
+from planner import CrawlPlanner
+from processes import reap_orphaned_browsers
+from resilience import FailureTracker, ScrapeError, retry_call
+
+
+# Azure Functions on the Consumption plan stop an invocation after 10 minutes
+DEFAULT_TIME_BUDGET = 480
+DEFAULT_RESERVE = 60
+PRODUCT_BATCH_SIZE = 25
+# Result chunks record the page of every variant under this key until they are merged
+PAGE_KEY = 'product_url'
+
+
+#####################################################################################################
+## STATE STORES
+#####################################################################################################
+
+class FileStateStore:
+    """Job state kept as JSON files below a local directory."""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, name):
+        return os.path.join(self.directory, *name.split("/"))
+
+    def read_json(self, name):
+        try:
+            with open(self._path(name), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_json(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def list(self, prefix):
+        directory = self._path(prefix)
+        if not os.path.isdir(directory):
+            return []
+        return sorted(f"{prefix.rstrip('/')}/{name}" for name in os.listdir(directory)
+                      if name.endswith('.json'))
+
+
+class BlobStateStore:
+    """Job state kept as JSON blobs in an Azure Storage container."""
+
+    def __init__(self, connection_string, container="scrape-jobs"):
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.blob import BlobServiceClient
+
+        service = BlobServiceClient.from_connection_string(connection_string)
+        self.container = service.get_container_client(container)
+        try:
+            self.container.create_container()
+        except ResourceExistsError:
+            pass
+
+    def read_json(self, name):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            return json.loads(self.container.download_blob(name).readall())
+        except ResourceNotFoundError:
+            return None
+
+    def write_json(self, name, data):
+        self.container.upload_blob(name, json.dumps(data, ensure_ascii=False), overwrite=True)
+
+    def delete(self, name):
+        from azure.core.exceptions import ResourceNotFoundError
+
+        try:
+            self.container.delete_blob(name)
+        except ResourceNotFoundError:
+            pass
+
+    def list(self, prefix):
+        prefix = prefix.rstrip('/') + '/'
+        return sorted(blob.name for blob in self.container.list_blobs(name_starts_with=prefix))
+
+
+def get_state_store():
+    """
+    Return the state store for the current environment: a local directory if
+    JOB_STATE_DIR is set, otherwise blobs in the Functions storage account.
+    """
+    if os.environ.get("JOB_STATE_DIR"):
+        return FileStateStore(os.environ["JOB_STATE_DIR"])
+    return BlobStateStore(os.environ["AzureWebJobsStorage"])
+
+
+#####################################################################################################
+## TIME BUDGET
+#####################################################################################################
+
+class TimeBudget:
+    """
+    Wall-clock budget for one invocation.
+
+    `should_stop` turns true once the remaining time could not fit another
+    unit of work (the slowest seen so far) plus a fixed reserve for saving
+    the cursor and enqueueing follow-ups. The first unit always runs, so
+    every invocation makes progress.
+    """
+
+    def __init__(self, seconds, reserve=DEFAULT_RESERVE):
+        self.deadline = time.monotonic() + seconds
+        self.reserve = reserve
+        self._slowest_unit = 0.0
+        self._unit_started = None
+        self._units = 0
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def start_unit(self):
+        self._unit_started = time.monotonic()
+
+    def end_unit(self):
+        if self._unit_started is not None:
+            self._slowest_unit = max(self._slowest_unit, time.monotonic() - self._unit_started)
+            self._unit_started = None
+            self._units += 1
+
+    def should_stop(self):
+        return self._units > 0 and self.remaining() < self.reserve + self._slowest_unit
+
+
+#####################################################################################################
+## JOB
+#####################################################################################################
+
+def _job_path(job_id, *parts):
+    return "/".join(("jobs", job_id) + parts)
+
+
+def _work_message(job_id, item_id):
+    return {'job_id': job_id, 'item_id': item_id}
+
+
+def start_job(store, category_links=None, batch_size=PRODUCT_BATCH_SIZE, crawl_history=None,
+              max_workers=2, budget_seconds=DEFAULT_TIME_BUDGET):
+    """
+    Plan a new job: one listing work item per category.
+
+    Args:
+        store: State store
+        category_links (list[str] | None): Categories to crawl, all if None
+        batch_size (int): Product links per product work item
+        crawl_history (str | None): Latency history for the crawl planner; if
+            given, batch_size is chosen so that one product work item fills an
+            invocation of budget_seconds with max_workers browser workers
+        max_workers (int): Browser workers per invocation
+        budget_seconds (float): Seconds per invocation
+
+    Returns:
+        list[dict]: Work messages to enqueue
+    """
+    job_id = time.strftime('%Y%m%d-%H%M%S')
+    if category_links is None:
+        category_links = get_sub_sub_category_links()
+    # Workers give the variants their category paths from the job's copy of the tree
+    category_tree = get_category_tree()
+    if crawl_history:
+        plan = CrawlPlanner(crawl_history).make_plan(category_links, max_workers=max_workers,
+                                                     batch_seconds=budget_seconds - DEFAULT_RESERVE)
+        plan.print_summary()
+        batch_size = plan.product_batch_size
+        print(f"  {batch_size} products per work item.")
+
+    messages = []
+    for idx, category_link in enumerate(category_links):
+        item_id = f"c{idx:04d}"
+        store.write_json(_job_path(job_id, "items", f"{item_id}.json"), {
+            'stage': 'listing',
+            'category': category_link,
+            'pending_pages': [category_link],
+            'visited_pages': [],
+            'product_links': [],
+        })
+        messages.append(_work_message(job_id, item_id))
+
+    store.write_json(_job_path(job_id, "job.json"), {
+        'job_id': job_id,
+        'started_at': time.time(),
+        'categories': len(category_links),
+        'batch_size': batch_size,
+        'category_tree': category_tree.to_dict(),
+    })
+    store.write_json("latest_job.json", {'job_id': job_id})
+    print(f"Started job {job_id} with {len(messages)} categories.")
+    return messages
+
+
+def _crawl_listing(item, budget, failures):
+    """Advance a listing cursor until its pages are exhausted or time runs out."""
+    pending = item['pending_pages']
+    visited = set(item['visited_pages'])
+    product_links = set(item['product_links'])
+
+    while pending and not budget.should_stop():
+        url = pending.pop(0)
+        if url in visited:
+            continue
+        visited.add(url)
+
+        budget.start_unit()
+        try:
+            products, pages = retry_call(fetch_page_links, url, LISTING_HEADERS)
+        except ScrapeError as e:
+            failures.record(url, 'listing', e, context={'category': item['category']})
+            continue
+        finally:
+            budget.end_unit()
+
+        product_links.update(products)
+        for p_url in pages:
+            if p_url not in visited and p_url not in pending:
+                pending.append(p_url)
+
+    item['visited_pages'] = sorted(visited)
+    item['product_links'] = sorted(product_links)
+    return not pending
+
+
+def _scrape_batch(item, budget, failures, max_workers):
+    """Scrape product links from the cursor until done or time runs out."""
+    links = item['product_links']
+    variants = []
+
+    while links and not budget.should_stop():
+        batch, links = links[:max_workers], links[max_workers:]
+        budget.start_unit()
+        variants.extend(scrape_products(batch, max_workers, failures, category_url=item['category'],
+                                        page_key=PAGE_KEY))
+        budget.end_unit()
+
+    item['scraped'] = item.get('scraped', 0) + len(item['product_links']) - len(links)
+    item['product_links'] = links
+    return variants, not links
+
+
+def _cursor_position(item):
+    """Pages a work item has worked through so far."""
+    if item['stage'] == 'listing':
+        return len(item['visited_pages'])
+    return item.get('scraped', 0)
+
+
+def process_work_item(store, job_id, item_id, budget_seconds=DEFAULT_TIME_BUDGET, max_workers=5):
+    """
+    Run one budgeted invocation of a work item.
+
+    Listing items crawl their category's pagination and then fan out into
+    product batch items. Product items scrape their links. Either kind saves
+    its cursor and re-enqueues itself when the time budget is nearly used up.
+    The invocation that completes the last pending item merges the results.
+
+    Returns:
+        list[dict]: Follow-up work messages to enqueue
+    """
+    item_path = _job_path(job_id, "items", f"{item_id}.json")
+    item = store.read_json(item_path)
+    if item is None:
+        # Already completed (queue messages may be delivered more than once)
+        return []
+
+    # The host may keep browsers of worker processes that died; browsers of this process,
+    # earlier invocations' included, stay until it exits
+    orphans = reap_orphaned_browsers()
+    if orphans:
+        print(f"[{job_id}/{item_id}] Terminated {orphans} orphaned browser process(es).")
+
+    job = store.read_json(_job_path(job_id, "job.json")) or {}
+    if job.get('category_tree'):
+        set_category_tree(job['category_tree'])
+
+    budget = TimeBudget(budget_seconds)
+    failures = FailureTracker()
+    follow_ups = []
+    variants = []
+    start = _cursor_position(item)
+
+    if item['stage'] == 'listing':
+        finished = _crawl_listing(item, budget, failures)
+        if finished:
+            links = item['product_links']
+            batch_size = job.get('batch_size', PRODUCT_BATCH_SIZE)
+            for idx in range(0, len(links), batch_size):
+                batch_id = f"{item_id}-p{idx // batch_size:04d}"
+                store.write_json(_job_path(job_id, "items", f"{batch_id}.json"), {
+                    'stage': 'products',
+                    'category': item['category'],
+                    'product_links': links[idx:idx + batch_size],
+                })
+                follow_ups.append(_work_message(job_id, batch_id))
+    else:
+        variants, finished = _scrape_batch(item, budget, failures, max_workers)
+
+    # Results go in before the cursor moves, so a crash can only repeat work. Chunks are
+    # named after the cursor range they cover, so a redelivered message that repeats a
+    # crashed invocation's work overwrites its chunk; finish_job merges overlaps by page.
+    chunk_id = f"{item_id}-{start:05d}-{_cursor_position(item):05d}"
+    if variants:
+        store.write_json(_job_path(job_id, "results", f"{chunk_id}.json"), variants)
+    if len(failures):
+        store.write_json(_job_path(job_id, "failures", f"{chunk_id}.json"), failures.failures())
+
+    if finished:
+        store.delete(item_path)
+    else:
+        store.write_json(item_path, item)
+        follow_ups.append(_work_message(job_id, item_id))
+
+    print(f"[{job_id}/{item_id}] {len(variants)} variants, {len(failures)} failures, "
+          f"{'done' if finished else 'continuing'} ({budget.remaining():.0f}s budget left)")
+
+    if not follow_ups and not store.list(_job_path(job_id, "items")):
+        finish_job(store, job_id)
+
+    return follow_ups
+
+
+def finish_job(store, job_id):
+    """
+    Merge all result chunks of a job into output.json and output_failures.json.
+
+    A page scraped by more than one invocation (a message delivered twice
+    while its item was still in progress) contributes only the variants of
+    its last chunk. Failures are listed once per URL, and not at all for
+    pages another invocation scraped.
+    """
+    pages = {}
+    for name in store.list(_job_path(job_id, "results")):
+        chunk_pages = {}
+        for variant in store.read_json(name) or []:
+            # Chunks written before pages were recorded are kept whole
+            chunk_pages.setdefault(variant.get(PAGE_KEY) or name, []).append(variant)
+        pages.update(chunk_pages)
+    products = [{key: value for key, value in variant.items() if key != PAGE_KEY}
+                for variants in pages.values() for variant in variants]
+
+    failures = {}
+    for name in store.list(_job_path(job_id, "failures")):
+        for failure in store.read_json(name) or []:
+            failures[(failure['stage'], failure['url'])] = failure
+    failures = [failure for key, failure in failures.items() if key[1] not in pages]
+
+    store.write_json(_job_path(job_id, "output.json"), products)
+    store.write_json(_job_path(job_id, "output_failures.json"), {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'failed_count': len(failures),
+        'failures': failures,
+    })
+    print(f"Job {job_id} finished: {len(products)} variants, {len(failures)} failed URLs.")
+    return products
+
+
+#####################################################################################################
+## LOCAL STAND-IN FOR THE FUNCTIONS RUNTIME
+#####################################################################################################
+
+def run_locally(state_dir='job_state', budget_seconds=DEFAULT_TIME_BUDGET, invocations=4, max_workers=2,
+                category_links=None, output_file='output', batch_size=PRODUCT_BATCH_SIZE, crawl_history=None):
+    """
+    Run a whole job on this machine the way the Functions host would: the
+    timer step enqueues work, and `invocations` concurrent workers pull
+    messages from an in-process queue, each call limited to budget_seconds.
+
+    With a crawl_history the planner chooses batch_size; `python planner.py`
+    also suggests it, and max_workers, for a target time.
+    """
+    store = FileStateStore(state_dir)
+    work_queue = queue.Queue()
+    for message in start_job(store, category_links, batch_size, crawl_history, max_workers, budget_seconds):
+        work_queue.put(message)
+
+    def worker():
+        while True:
+            message = work_queue.get()
+            if message is None:
+                work_queue.task_done()
+                return
+            try:
+                for follow_up in process_work_item(store, message['job_id'], message['item_id'],
+                                                   budget_seconds, max_workers):
+                    work_queue.put(follow_up)
+            finally:
+                work_queue.task_done()
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(invocations)]
+    for thread in threads:
+        thread.start()
+    work_queue.join()
+    for _ in threads:
+        work_queue.put(None)
+    for thread in threads:
+        thread.join()
+
+    job_id = store.read_json("latest_job.json")['job_id']
+    products = store.read_json(_job_path(job_id, "output.json")) or []
+    save_outputs(products, output_file)
+    return products
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the chunked scrape job locally.")
+    parser.add_argument("--state-dir", default="job_state", help="Directory for job cursors and results")
+    parser.add_argument("--budget", type=float, default=DEFAULT_TIME_BUDGET, help="Seconds per invocation")
+    parser.add_argument("--invocations", type=int, default=4, help="Concurrent invocations")
+    parser.add_argument("--max-workers", type=int, default=2, help="Browser workers per invocation")
+    parser.add_argument("--category", action="append", help="Only crawl this category URL (repeatable)")
+    parser.add_argument("--output", default="output", help="Base name for output files")
+    parser.add_argument("--batch-size", type=int, default=PRODUCT_BATCH_SIZE, help="Product links per work item")
+    parser.add_argument("--crawl-history", help="Plan the batch size from this latency history instead")
+    args = parser.parse_args()
+
+    run_locally(state_dir=args.state_dir, budget_seconds=args.budget, invocations=args.invocations,
+                max_workers=args.max_workers, category_links=args.category, output_file=args.output,
+                batch_size=args.batch_size, crawl_history=args.crawl_history)
@@ -0,0 +1,177 @@
+import json
+import os
+import threading
+import time
+
+from profiling import add_page_listener, remove_page_listener
+
+
+# Time kept free at the end of a budgeted run for draining and writing the outputs
+DEFAULT_RESERVE = 5 * 60
+
+# The deadline of the running scrape; None means no time budget.
+_active_deadline = None
+
+
+def dispatch_allowed():
+    """Return False once the active run's deadline says no new pages may be started."""
+    deadline = _active_deadline
+    return deadline is None or not deadline.expired()
+
+
+def time_left():
+    """Return the seconds until the active run's deadline stops new pages, or None without a deadline."""
+    deadline = _active_deadline
+    return None if deadline is None else deadline.time_left()
+
+
+def defer(kind, url, category=None):
+    """Record that a category or product was left out to meet the deadline (no-op without one)."""
+    deadline = _active_deadline
+    if deadline is not None:
+        deadline.coverage.defer(kind, url, category)
+
+
+class CrawlCoverage:
+    """
+    Which categories were crawled when, and what previous runs left uncovered.
+
+    The state file keeps, per category URL, when its listing was last
+    crawled completely, plus the categories and products a deadline cut
+    off. The next run takes the uncovered work first and then the stalest
+    categories.
+
+    Args:
+        path (str): JSON state file
+    """
+
+    def __init__(self, path='crawl_coverage.json'):
+        self.path = path
+        self._lock = threading.Lock()
+        self.last_crawled = {}
+        self.previous_categories = []
+        self.previous_products = []
+        self.uncovered_categories = []
+        self.uncovered_products = []
+
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                state = json.load(f)
+            self.last_crawled = state.get('last_crawled', {})
+            self.previous_categories = state.get('uncovered_categories', [])
+            self.previous_products = state.get('uncovered_products', [])
+
+    def prioritize(self, category_links):
+        """Order categories: left uncovered last time first, then the longest not crawled."""
+        links = set(category_links)
+        previous = [link for link in self.previous_categories if link in links]
+        rest = sorted(links.difference(previous), key=lambda link: (self.last_crawled.get(link, 0), link))
+        return previous + rest
+
+    def pending_products(self, category_links=None):
+        """
+        Return the products a previous deadline left unrendered, grouped by category.
+
+        Returns:
+            dict[str | None, list[str]]: Category URL (None if unknown) -> product links
+        """
+        selected = set(category_links) if category_links is not None else None
+        grouped = {}
+        for entry in self.previous_products:
+            category = entry.get('category')
+            if selected is None or category is None or category in selected:
+                grouped.setdefault(category, []).append(entry['url'])
+        return grouped
+
+    def category_done(self, url):
+        with self._lock:
+            self.last_crawled[url] = time.time()
+
+    def defer(self, kind, url, category=None):
+        with self._lock:
+            if kind == 'category':
+                if url not in self.uncovered_categories:
+                    self.uncovered_categories.append(url)
+            else:
+                self.uncovered_products.append({'url': url, 'category': category})
+
+    @property
+    def complete(self):
+        return not self.uncovered_categories and not self.uncovered_products
+
+    def save(self):
+        """Atomically write the state, replacing the previous run's uncovered lists."""
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'uncovered_categories': self.uncovered_categories,
+                'uncovered_products': self.uncovered_products,
+                'last_crawled': self.last_crawled,
+            }, f, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def print_summary(self):
+        if self.complete:
+            print(f"Coverage: everything crawled; state saved to {self.path}")
+        else:
+            print(f"Coverage: deadline left {len(self.uncovered_categories)} categories and "
+                  f"{len(self.uncovered_products)} products uncovered; listed in {self.path} "
+                  f"and taken first next run")
+
+
+class RunDeadline:
+    """
+    Wall-clock budget for a whole scrape.
+
+    Once the remaining time could not fit the slowest page seen so far plus
+    `reserve_seconds` for draining and writing the outputs, dispatch_allowed()
+    turns false: the pipeline starts no new pages, lets in-flight pages finish
+    and records what it skipped in `coverage`. Page latencies come from
+    profiling.record_page.
+
+    Args:
+        budget_seconds (float): Time from entering the context to the hard deadline
+        coverage (CrawlCoverage): Receives the skipped work
+        reserve_seconds (float): Time kept free at the end
+    """
+
+    def __init__(self, budget_seconds, coverage, reserve_seconds=DEFAULT_RESERVE):
+        self.budget_seconds = budget_seconds
+        self.coverage = coverage
+        self.reserve_seconds = reserve_seconds
+        self.deadline = None
+        self._slowest_page = 0.0
+        self._reported = False
+
+    def __enter__(self):
+        global _active_deadline
+        self.deadline = time.monotonic() + self.budget_seconds
+        add_page_listener(self._on_page)
+        _active_deadline = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active_deadline
+        if _active_deadline is self:
+            _active_deadline = None
+        remove_page_listener(self._on_page)
+        return False
+
+    def _on_page(self, url, timings):
+        self._slowest_page = max(self._slowest_page, sum(timings.values()))
+
+    def remaining(self):
+        return self.deadline - time.monotonic()
+
+    def time_left(self):
+        """Seconds until no new pages may be started."""
+        return max(0.0, self.remaining() - self.reserve_seconds - self._slowest_page)
+
+    def expired(self):
+        expired = self.remaining() < self.reserve_seconds + self._slowest_page
+        if expired and not self._reported:
+            self._reported = True
+            print(f"\nTime budget nearly used up ({self.remaining() / 60:.1f} min left); "
+                  f"finishing in-flight pages and writing the outputs.")
+        return expired
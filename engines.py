@@ -0,0 +1,437 @@
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import http_client
+from processes import browser_env
+from profiling import record_page
+from resilience import HTTPStatusError
+
+
+# Seconds a page may take to load before the fetch counts as timed out
+DEFAULT_TIMEOUT = 60
+# Product pages fill their variant grid after load; Selenium always waited this long
+DEFAULT_SETTLE_SECONDS = 5
+COOKIE_BUTTON = "button.button_einverstanden"
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/144.0.0.0 Safari/537.36')
+
+
+class FetchEngine:
+    """
+    Fetches rendered page HTML for one pipeline stage.
+
+    `kind` is "listing" (accept cookies and scroll until lazy loading stops)
+    or "product" (let the variant grid settle). Every engine applies the same
+    timeout, raises HTTPStatusError for error responses where the status is
+    known, reports its phase timings through profiling.record_page and keeps
+    page counts and latencies for print_summary.
+
+    Args:
+        timeout (float): Page load timeout in seconds
+        settle_seconds (float): Wait after loading a product page
+    """
+
+    name = None
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, settle_seconds=DEFAULT_SETTLE_SECONDS):
+        self.timeout = timeout
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.seconds = 0.0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def fetch(self, url, kind, headers=None):
+        """
+        Return the HTML of url as a browser would show it for the given kind of page.
+
+        Raises:
+            HTTPStatusError: If the page answered with an error status
+        """
+        timings = {}
+        html, status = self._fetch(url, kind, headers or {}, timings)
+        if status is not None and status >= 400:
+            raise HTTPStatusError(f"HTTP {status} for {url}", status=status)
+
+        record_page(url, timings, html)
+        with self._lock:
+            self.pages += 1
+            self.seconds += sum(timings.values())
+        return html
+
+    def _fetch(self, url, kind, headers, timings):
+        """Return (html, status or None), filling timings with phase -> seconds."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def print_summary(self):
+        if self.pages:
+            print(f"{self.name} engine: {self.pages} pages, {self.seconds / self.pages:.2f}s avg")
+
+
+def scroll_to_bottom(page, max_iterations: int = 40, wait_ms: int = 600) -> None:
+    """
+    Scrolls a Playwright page to the bottom, repeatedly, to trigger lazy loading.
+    Stops when further scrolling no longer increases the document height
+    or when max_iterations is reached.
+    """
+    last_height = 0
+
+    for _ in range(max_iterations):
+        # Scroll to the bottom
+        page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
+        page.wait_for_timeout(wait_ms)
+
+        # Check if more content was loaded
+        new_height = page.evaluate("document.body.scrollHeight")
+        if new_height == last_height:
+            break
+        last_height = new_height
+
+
+class PlaywrightEngine(FetchEngine):
+    """
+    Headless Chromium through Playwright.
+
+    Playwright's sync API is bound to the thread that started it, so the
+    engine runs its own worker threads, up to `max_browsers`, and each keeps
+    one browser open across the pages it is handed. Every page still gets a
+    fresh browser context, with its own cookies and user agent.
+
+    Args:
+        max_browsers (int): Upper bound on browsers (worker threads)
+    """
+
+    name = 'playwright'
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, settle_seconds=DEFAULT_SETTLE_SECONDS, max_browsers=8):
+        super().__init__(timeout, settle_seconds)
+        self.max_browsers = max_browsers
+        self.launches = 0
+        self._tasks = queue.Queue()
+        self._workers = []
+        self._in_flight = 0
+
+    def _fetch(self, url, kind, headers, timings):
+        result = Future()
+        with self._lock:
+            self._in_flight += 1
+            # One browser per concurrent caller, as when every fetch launched its own
+            if len(self._workers) < min(self._in_flight, self.max_browsers):
+                worker = threading.Thread(target=self._work, name=f"playwright-{len(self._workers)}", daemon=True)
+                self._workers.append(worker)
+                worker.start()
+        try:
+            self._tasks.put((result, url, kind, headers, timings))
+            return result.result()
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def _work(self):
+        """Worker thread: render the queued pages in this thread's browser until close()."""
+        playwright = browser = None
+        try:
+            from playwright.sync_api import sync_playwright
+            playwright = sync_playwright().start()
+            startup_error = None
+        except Exception as e:
+            startup_error = e
+
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    return
+                result, url, kind, headers, timings = task
+                if startup_error is not None:
+                    result.set_exception(startup_error)
+                    continue
+                try:
+                    started = time.perf_counter()
+                    if browser is None or not browser.is_connected():
+                        browser = playwright.chromium.launch(headless=True, env=browser_env())
+                        with self._lock:
+                            self.launches += 1
+                    result.set_result(self._render(browser, url, kind, headers, timings, started))
+                except Exception as e:
+                    result.set_exception(e)
+                    # A browser that failed mid-page may be wedged; the next page gets a new one
+                    browser = self._close_browser(browser)
+        finally:
+            self._close_browser(browser)
+            if playwright is not None:
+                playwright.stop()
+
+    @staticmethod
+    def _close_browser(browser):
+        if browser is not None:
+            try:
+                browser.close()
+            except Exception:
+                pass
+        return None
+
+    def _render(self, browser, url, kind, headers, timings, started):
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+        context = browser.new_context(user_agent=headers.get("User-Agent", USER_AGENT))
+        try:
+            page = context.new_page()
+            timings["launch"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            response = page.goto(url, wait_until="load", timeout=self.timeout * 1000)
+            timings["goto"] = time.perf_counter() - started
+            status = response.status if response is not None else None
+            if status is not None and status >= 400:
+                return None, status
+
+            if kind == 'listing':
+                # Try to accept cookies if the banner appears
+                started = time.perf_counter()
+                try:
+                    page.locator(COOKIE_BUTTON).first.click(timeout=3000)
+                    page.wait_for_timeout(500)
+                except PlaywrightTimeoutError:
+                    pass
+                timings["cookies"] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                scroll_to_bottom(page)
+                timings["scroll"] = time.perf_counter() - started
+            else:
+                started = time.perf_counter()
+                page.wait_for_timeout(self.settle_seconds * 1000)
+                timings["wait"] = time.perf_counter() - started
+
+            return page.content(), status
+        finally:
+            context.close()
+
+    def close(self):
+        with self._lock:
+            workers, self._workers = self._workers, []
+        # Each worker closes its own browser; Playwright objects cannot be used from another thread
+        for _ in workers:
+            self._tasks.put(None)
+        for worker in workers:
+            worker.join(timeout=self.timeout)
+
+
+class SeleniumEngine(FetchEngine):
+    """
+    Headless Chrome through Selenium.
+
+    WebDriver sessions are not tied to a thread, so drivers are kept in a
+    pool and reused across pages instead of starting Chrome for every page;
+    at most `max_drivers` run at once. Chrome's user agent is fixed when it
+    starts, so idle drivers are pooled by user agent and a page only reuses
+    a driver started with the one it asks for.
+
+    Args:
+        max_drivers (int): Upper bound on concurrently running drivers
+    """
+
+    name = 'selenium'
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, settle_seconds=DEFAULT_SETTLE_SECONDS, max_drivers=8):
+        super().__init__(timeout, settle_seconds)
+        self.max_drivers = max_drivers
+        self._idle = {}
+        self._drivers = []
+        self._slots = threading.BoundedSemaphore(max_drivers)
+
+    def _new_driver(self, user_agent):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.service import Service
+
+        options = webdriver.ChromeOptions()
+        options.add_argument('--headless')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        options.add_experimental_option("excludeSwitches", ["enable-automation"])
+        options.add_experimental_option('useAutomationExtension', False)
+        options.add_argument(f'user-agent={user_agent}')
+
+        driver = webdriver.Chrome(options=options, service=Service(env=browser_env()))
+        driver.set_page_load_timeout(self.timeout)
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    def _checkout(self, user_agent):
+        """Return an idle driver started with user_agent, or a new one."""
+        stale = None
+        with self._lock:
+            idle = self._idle.get(user_agent)
+            if idle:
+                return idle.pop()
+            if len(self._drivers) >= self.max_drivers:
+                # Make room by quitting a driver that sits idle with another user agent
+                stale = next((drivers.pop() for drivers in self._idle.values() if drivers), None)
+        if stale is not None:
+            self._discard(stale)
+        return self._new_driver(user_agent)
+
+    def _discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _fetch(self, url, kind, headers, timings):
+        self._slots.acquire()
+        user_agent = headers.get("User-Agent", USER_AGENT)
+        driver = None
+        healthy = False
+        try:
+            started = time.perf_counter()
+            driver = self._checkout(user_agent)
+            timings['launch'] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            driver.get(url)
+            timings['goto'] = time.perf_counter() - started
+
+            if kind == 'listing':
+                started = time.perf_counter()
+                for button in driver.find_elements("css selector", COOKIE_BUTTON)[:1]:
+                    try:
+                        button.click()
+                        time.sleep(0.5)
+                    except Exception:
+                        pass
+                timings['cookies'] = time.perf_counter() - started
+
+                started = time.perf_counter()
+                last_height = 0
+                for _ in range(40):
+                    driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+                    time.sleep(0.6)
+                    new_height = driver.execute_script("return document.body.scrollHeight")
+                    if new_height == last_height:
+                        break
+                    last_height = new_height
+                timings['scroll'] = time.perf_counter() - started
+            else:
+                started = time.perf_counter()
+                time.sleep(self.settle_seconds)
+                timings['wait'] = time.perf_counter() - started
+
+            html = driver.page_source
+            healthy = True
+            return html, None
+        finally:
+            if driver is not None:
+                if healthy:
+                    with self._lock:
+                        self._idle.setdefault(user_agent, []).append(driver)
+                else:
+                    # A driver that failed mid-page may be wedged; never hand it out again
+                    self._discard(driver)
+            self._slots.release()
+
+    def close(self):
+        with self._lock:
+            drivers, self._drivers = self._drivers, []
+            self._idle.clear()
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class HttpEngine(FetchEngine):
+    """
+    Plain HTTP through the shared pooled session, without running JavaScript.
+
+    Listing pages only contain their first, server-rendered batch of products
+    (see xhr_replay for the lazy-loaded rest); product pages contain the full
+    variant grid if the site renders it server-side.
+    """
+
+    name = 'http'
+
+    def _fetch(self, url, kind, headers, timings):
+        started = time.perf_counter()
+        resp = http_client.get_session().get(url, headers=headers or None, timeout=self.timeout)
+        timings['goto'] = time.perf_counter() - started
+        return resp.text, resp.status_code
+
+
+ENGINES = {
+    'playwright': PlaywrightEngine,
+    'selenium': SeleniumEngine,
+    'http': HttpEngine,
+}
+
+# Engine per pipeline stage, matching the scraper's historical behaviour
+DEFAULT_STAGE_ENGINES = {'listing': 'playwright', 'product': 'selenium'}
+
+_stage_engines = {}
+_stage_lock = threading.Lock()
+
+
+def create_engine(name, **options):
+    """Create a fetch engine by name ("playwright", "selenium" or "http")."""
+    try:
+        engine_class = ENGINES[name]
+    except KeyError:
+        raise ValueError(f"Unknown fetch engine: {name} (choose from {', '.join(ENGINES)})") from None
+    return engine_class(**options)
+
+
+def get_stage_engine(stage):
+    """Return the engine for a stage ("listing" or "product"), creating the default if none is set."""
+    engine = _stage_engines.get(stage)
+    if engine is None:
+        with _stage_lock:
+            engine = _stage_engines.get(stage)
+            if engine is None:
+                engine = _stage_engines[stage] = create_engine(DEFAULT_STAGE_ENGINES[stage])
+                atexit.register(engine.close)
+    return engine
+
+
+@contextmanager
+def use_engines(listing=None, product=None, **options):
+    """
+    Select the fetch engine per stage for the duration of the block and close
+    them afterwards. None keeps the stage's default engine.
+    """
+    names = {'listing': listing or DEFAULT_STAGE_ENGINES['listing'],
+             'product': product or DEFAULT_STAGE_ENGINES['product']}
+    created = {}
+    for stage, name in names.items():
+        # Stages using the same kind of engine share one instance and its pool
+        created.setdefault(name, create_engine(name, **options))
+
+    with _stage_lock:
+        previous = dict(_stage_engines)
+        _stage_engines.update({stage: created[name] for stage, name in names.items()})
+    try:
+        yield {stage: created[name] for stage, name in names.items()}
+    finally:
+        with _stage_lock:
+            _stage_engines.clear()
+            _stage_engines.update(previous)
+        for engine in created.values():
+            engine.print_summary()
+            engine.close()
@@ -1,12 +1,57 @@
+import json
 import logging
+import os
 import azure.functions as func
 
+import chunked_job
+
 app = func.FunctionApp()
 
+WORK_QUEUE = "scrape-work"
+
+
+def _time_budget():
+    return float(os.environ.get("CHUNK_TIME_BUDGET", chunked_job.DEFAULT_TIME_BUDGET))
+
+
+def _max_workers():
+    return int(os.environ.get("CHUNK_MAX_WORKERS", "2"))
+
+
 @app.timer_trigger(schedule="0 0 15 * * *", arg_name="myTimer", run_on_startup=False,
-              use_monitor=False) 
-def timer_trigger(myTimer: func.TimerRequest) -> None:
+              use_monitor=False)
+@app.queue_output(arg_name="work", queue_name=WORK_QUEUE, connection="AzureWebJobsStorage")
+def timer_trigger(myTimer: func.TimerRequest, work: func.Out[list[str]]) -> None:
     if myTimer.past_due:
         logging.info('The timer is past due!')
 
-    logging.info('Python timer trigger function executed.')
\ No newline at end of file
+    # Plan the job and fan out one work item per category
+    messages = chunked_job.start_job(
+        chunked_job.get_state_store(),
+        crawl_history=os.environ.get("CRAWL_HISTORY") or None,
+        max_workers=_max_workers(),
+        budget_seconds=_time_budget(),
+    )
+    work.set([json.dumps(message) for message in messages])
+
+    logging.info('Scrape job started with %d work items.', len(messages))
+
+
+@app.queue_trigger(arg_name="msg", queue_name=WORK_QUEUE, connection="AzureWebJobsStorage")
+@app.queue_output(arg_name="work", queue_name=WORK_QUEUE, connection="AzureWebJobsStorage")
+def scrape_worker(msg: func.QueueMessage, work: func.Out[list[str]]) -> None:
+    message = json.loads(msg.get_body().decode('utf-8'))
+
+    # Process the item until the time budget is nearly used, then hand off the rest
+    follow_ups = chunked_job.process_work_item(
+        chunked_job.get_state_store(),
+        message['job_id'],
+        message['item_id'],
+        budget_seconds=_time_budget(),
+        max_workers=_max_workers(),
+    )
+    if follow_ups:
+        work.set([json.dumps(follow_up) for follow_up in follow_ups])
+
+    logging.info('Processed %s/%s, enqueued %d follow-up items.',
+                 message['job_id'], message['item_id'], len(follow_ups))
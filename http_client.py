@@ -0,0 +1,250 @@
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import NameResolutionError, NewConnectionError
+from urllib3.util.connection import allowed_gai_family
+
+from resilience import retry_call
+
+
+DEFAULT_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/144.0.0.0 Safari/537.36"
+    ),
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+
+#####################################################################################################
+## CONNECTION STATISTICS
+#####################################################################################################
+
+class ConnectionStats:
+    """Counts requests and new TCP/TLS connections made by the shared client."""
+
+    def __init__(self):
+        self.requests = 0
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record_request(self):
+        with self._lock:
+            self.requests += 1
+
+    def record_connect(self, elapsed):
+        with self._lock:
+            self.connections += 1
+            self.connect_seconds += elapsed
+
+    def summary(self):
+        """
+        Return request/connection counts and the connection setup time saved
+        by reusing pooled connections, estimated from the average setup time
+        of the connections that were actually opened.
+        """
+        with self._lock:
+            reused = max(0, self.requests - self.connections)
+            average = self.connect_seconds / self.connections if self.connections else 0.0
+            return {
+                'requests': self.requests,
+                'connections': self.connections,
+                'reused': reused,
+                'connect_seconds': round(self.connect_seconds, 3),
+                'saved_seconds': round(reused * average, 3),
+            }
+
+
+stats = ConnectionStats()
+
+
+class _CachedDNSMixin:
+    """
+    Resolves the host through the session's DNS cache instead of asking the
+    resolver for every new connection. Only connections of the shared
+    session use it; socket.getaddrinfo itself is left alone, so browser
+    drivers and other clients in the process resolve as usual.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        try:
+            addresses = _resolve(host, self.port)
+        except socket.gaierror as e:
+            raise NameResolutionError(self.host, self, e) from e
+
+        # Like socket.create_connection, try every address before giving up
+        error = None
+        for address in addresses:
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except NewConnectionError as e:
+                error = e
+            finally:
+                self._dns_host = host
+        raise error
+
+
+class _TimedHTTPConnection(_CachedDNSMixin, HTTPConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        stats.record_connect(time.perf_counter() - started)
+
+
+class _TimedHTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        stats.record_connect(time.perf_counter() - started)
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools time every new connection they open."""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _TimedHTTPConnectionPool,
+            'https': _TimedHTTPSConnectionPool,
+        }
+
+
+#####################################################################################################
+## DNS CACHE
+#####################################################################################################
+
+_dns_cache = {}
+_dns_lock = threading.Lock()
+_dns_ttl = 300.0
+
+
+def _resolve(host, port):
+    """Return the addresses of a host, from the cache if looked up within the last `_dns_ttl` seconds."""
+    key = (host, port)
+    now = time.monotonic()
+
+    with _dns_lock:
+        cached = _dns_cache.get(key)
+        if cached and cached[0] > now:
+            return cached[1]
+
+    infos = socket.getaddrinfo(host, port, allowed_gai_family(), socket.SOCK_STREAM)
+    addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    with _dns_lock:
+        _dns_cache[key] = (now + _dns_ttl, addresses)
+    return addresses
+
+
+#####################################################################################################
+## SHARED SESSION
+#####################################################################################################
+
+_session = None
+_session_lock = threading.Lock()
+_pool_size = 10
+
+
+def configure(max_workers):
+    """
+    Size the connection pool for the given number of concurrent workers.
+
+    The pool only grows. If the shared session already exists it gets new
+    adapters of the new size, so call this between stages rather than
+    while requests are in flight.
+    """
+    global _pool_size
+
+    with _session_lock:
+        if max_workers <= _pool_size:
+            return
+        _pool_size = max_workers
+        if _session is not None:
+            _mount_adapters(_session)
+
+
+def _mount_adapters(session):
+    previous = session.adapters.get("https://")
+    adapter = _TimedHTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if previous is not None:
+        previous.close()
+
+
+def get_session():
+    """
+    Return the process-wide pooled requests.Session.
+
+    The session keeps connections alive, asks for compressed responses, caches
+    DNS lookups and counts connection setup time in `stats`.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            _mount_adapters(session)
+            session.hooks['response'].append(lambda response, *args, **kwargs: stats.record_request())
+            _session = session
+
+    return _session
+
+
+def _get_text(url, timeout=30):
+    resp = get_session().get(url, timeout=timeout)
+    resp.raise_for_status()
+    return resp.text
+
+
+def fetch_text(url, timeout=30):
+    """
+    GET a URL through the shared session, with retries, and return its body.
+
+    Raises:
+        ScrapeError: If the request still fails after all retries
+    """
+    return retry_call(_get_text, url, timeout=timeout)
+
+
+def fetch_many(urls, max_workers=None, timeout=30):
+    """
+    GET several URLs concurrently through the shared session.
+
+    Args:
+        urls (list[str]): URLs to fetch
+        max_workers (int | None): Concurrent requests, defaults to the pool size
+        timeout (float): Per-request timeout in seconds
+
+    Returns:
+        list[str]: Response bodies in the same order as urls
+    """
+    with ThreadPoolExecutor(max_workers=max_workers or _pool_size) as executor:
+        return list(executor.map(lambda url: fetch_text(url, timeout), urls))
+
+
+def print_connection_summary():
+    """Print request/connection counts and the setup time saved by pooling."""
+    summary = stats.summary()
+    if summary['requests']:
+        print(f"HTTP client: {summary['requests']} requests over {summary['connections']} connections "
+              f"({summary['connect_seconds']:.2f}s connecting, ~{summary['saved_seconds']:.2f}s saved by reuse)")
@@ -0,0 +1,336 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import closing
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+from urllib.request import pathname2url
+
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+# categories.PATH_SEPARATOR, without importing the scraper's HTML parsing here
+PATH_SEPARATOR = " > "
+
+
+def _category_key(category):
+    """
+    Normalise a category for lookups: a listing URL becomes its slug
+    ("15-Handseilwinden-Gruppe"); slugs, names and paths are compared
+    case-insensitively.
+    """
+    category = (category or '').strip()
+    if '://' in category:
+        category = category.rstrip('/').rsplit('/', 1)[-1]
+    return category.lower()
+
+
+def _category_keys(row, category_urls):
+    """Return every key a row can be looked up by: its category's URL slug, path and path names."""
+    keys = set()
+    path = row.get('category_path')
+    if path:
+        keys.add(path)
+        keys.update(path.split(PATH_SEPARATOR))
+        keys.update(category_urls.get(path, ()))
+    if row.get('category_url'):
+        keys.add(row['category_url'])
+    return {_category_key(key) for key in keys}
+
+
+class CatalogIndex:
+    """
+    Immutable in-memory index over one scrape result.
+
+    Rows are found by category through their category_path ("Hebetechnik >
+    Handseilwinden"), either name in it (a main group finds its whole
+    subtree) and the slug of their category_url. output.json has no
+    category URLs, so category_urls supplies them per path.
+
+    Args:
+        rows (list[dict]): Variant dicts as written to output.json
+        source_version: Whatever identifies the loaded result (mtime, run time)
+        category_urls (dict[str, list[str]] | None): Listing URLs per category path
+    """
+
+    def __init__(self, rows, source_version=None, category_urls=None):
+        self.rows = rows
+        self.source_version = source_version
+        self.loaded_at = time.time()
+        self.by_serial = {}
+        self.by_category = {}
+
+        names = []
+        for idx, row in enumerate(rows):
+            serial = row.get('product_serial_number')
+            if serial:
+                self.by_serial.setdefault(serial, []).append(idx)
+            for key in _category_keys(row, category_urls or {}):
+                self.by_category.setdefault(key, []).append(idx)
+            names.append(((row.get('product_name') or '').lower(), idx))
+
+        names.sort()
+        self._name_keys = [name for name, _ in names]
+        self._name_rows = [idx for _, idx in names]
+
+    def serial(self, serial):
+        return [self.rows[idx] for idx in self.by_serial.get(serial, ())]
+
+    def category(self, category, limit=DEFAULT_LIMIT):
+        return [self.rows[idx] for idx in self.by_category.get(_category_key(category), ())[:limit]]
+
+    def name_prefix(self, prefix, limit=DEFAULT_LIMIT):
+        prefix = prefix.lower()
+        start = bisect_left(self._name_keys, prefix)
+        matches = []
+        for pos in range(start, min(start + limit, len(self._name_keys))):
+            if not self._name_keys[pos].startswith(prefix):
+                break
+            matches.append(self.rows[self._name_rows[pos]])
+        return matches
+
+
+#####################################################################################################
+## SOURCES
+#####################################################################################################
+
+class JsonSource:
+    """
+    Loads output.json; a new version is any change of its mtime or size.
+
+    The category URLs of its rows come from the scraper's category tree
+    cache, if there is one.
+    """
+
+    def __init__(self, path, tree_file='category_tree.json'):
+        self.path = path
+        self.tree_file = tree_file
+
+    def version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def category_urls(self):
+        if not self.tree_file or not os.path.exists(self.tree_file):
+            return {}
+        from categories import CategoryTree
+
+        with open(self.tree_file, encoding='utf-8') as f:
+            tree = CategoryTree.from_dict(json.load(f))
+        urls = {}
+        for url in tree.leaf_urls():
+            urls.setdefault(tree.path_string(url), []).append(url)
+        return urls
+
+
+class CatalogSource:
+    """
+    Loads the latest completed run from catalog.db, including categories.
+
+    The database is opened read-only: the scraper may be writing to it, and
+    a reader must not create or migrate its schema.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _connect(self):
+        return closing(sqlite3.connect(f"file:{pathname2url(os.path.abspath(self.path))}?mode=ro", uri=True))
+
+    def version(self):
+        from catalog_store import latest_run
+
+        if not os.path.exists(self.path):
+            return None
+        with self._connect() as conn:
+            try:
+                return latest_run(conn)
+            except sqlite3.OperationalError:
+                # The scraper has not created the schema yet
+                return None
+
+    def load(self):
+        from catalog_store import export_rows, latest_run
+
+        with self._connect() as conn:
+            # Partial runs only refresh some categories; the full run defines the catalog
+            try:
+                latest = latest_run(conn, full_only=True)
+            except sqlite3.OperationalError:
+                # Catalogs created before partial runs existed
+                latest = latest_run(conn)
+            return export_rows(conn, latest[0] if latest else 0, include_category=True)
+
+    def category_urls(self):
+        # Every row carries its category_url
+        return {}
+
+
+#####################################################################################################
+## SERVICE
+#####################################################################################################
+
+class LookupService:
+    """
+    Serves the latest scrape result from an in-memory CatalogIndex.
+
+    A background thread polls the source and, when a new result is complete,
+    builds a fresh index and swaps it in with a single reference assignment,
+    so requests always see either the old or the new result. Encoded
+    responses are kept in an LRU cache keyed by index generation.
+    """
+
+    def __init__(self, source, poll_interval=5.0, cache_size=10000):
+        self.source = source
+        self.poll_interval = poll_interval
+        self.cache_size = cache_size
+        self.index = CatalogIndex([])
+        self.generation = 0
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._stop = threading.Event()
+        self.reload()
+
+    def reload(self):
+        """Rebuild the index if the source has a new version. Returns True if swapped."""
+        version = self.source.version()
+        if version is None or version == self.index.source_version:
+            return False
+        try:
+            rows = self.source.load()
+            category_urls = self.source.category_urls()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            print(f"Could not load {self.source.path}: {e}")
+            return False
+
+        index = CatalogIndex(rows, version, category_urls)
+        self.index, self.generation = index, self.generation + 1
+        with self._cache_lock:
+            self._cache.clear()
+        print(f"Loaded {len(rows)} variants from {self.source.path} (generation {self.generation})")
+        return True
+
+    def watch(self):
+        while not self._stop.wait(self.poll_interval):
+            self.reload()
+
+    def stop(self):
+        self._stop.set()
+
+    def cached_response(self, key, build):
+        """Return the encoded response for key, building it on a cache miss."""
+        key = (self.generation, key)
+        with self._cache_lock:
+            body = self._cache.get(key)
+            if body is not None:
+                self._cache.move_to_end(key)
+                return body
+
+        body = build(self.index)
+        with self._cache_lock:
+            self._cache[key] = body
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return body
+
+
+def _encode(data):
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+class LookupHandler(BaseHTTPRequestHandler):
+    """
+    Read-only JSON endpoints:
+
+        GET /serial/<serial>
+        GET /category/<category url, slug, name or path>?limit=N
+        GET /search?prefix=<name prefix>&limit=N
+        GET /health
+    """
+
+    protocol_version = 'HTTP/1.1'
+    service = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = parse_qs(parsed.query)
+        parts = [unquote(part) for part in parsed.path.strip('/').split('/', 1)]
+        try:
+            limit = min(MAX_LIMIT, int(query.get('limit', [DEFAULT_LIMIT])[0]))
+        except ValueError:
+            return self._send(400, _encode({'error': 'limit must be an integer'}))
+
+        service = self.service
+        if parts[0] == 'serial' and len(parts) == 2:
+            body = service.cached_response(('serial', parts[1]), lambda index: _encode(index.serial(parts[1])))
+        elif parts[0] == 'category' and len(parts) == 2:
+            body = service.cached_response(('category', parts[1], limit),
+                                           lambda index: _encode(index.category(parts[1], limit)))
+        elif parts[0] == 'search' and query.get('prefix'):
+            prefix = query['prefix'][0]
+            body = service.cached_response(('search', prefix.lower(), limit),
+                                           lambda index: _encode(index.name_prefix(prefix, limit)))
+        elif parts[0] == 'health':
+            index = service.index
+            body = _encode({'generation': service.generation, 'variants': len(index.rows),
+                            'loaded_at': index.loaded_at})
+        else:
+            return self._send(404, _encode({'error': 'not found'}))
+
+        self._send(200, body)
+
+
+def serve(source_path='output.json', host='127.0.0.1', port=8080, poll_interval=5.0,
+          tree_file='category_tree.json'):
+    """Start the lookup service over output.json or a catalog.db and block forever."""
+    source = CatalogSource(source_path) if source_path.endswith('.db') else JsonSource(source_path, tree_file)
+    service = LookupService(source, poll_interval=poll_interval)
+    threading.Thread(target=service.watch, name="lookup-reloader", daemon=True).start()
+
+    handler = type('BoundLookupHandler', (LookupHandler,), {'service': service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Serving {source_path} on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Read-only lookup API over the latest scrape results.")
+    parser.add_argument("source", nargs="?", default="output.json", help="output.json or catalog.db")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--poll-interval", type=float, default=5.0, help="Seconds between reload checks")
+    parser.add_argument("--category-tree", default="category_tree.json",
+                        help="Category tree cache that maps URLs and slugs to output.json's category paths")
+    args = parser.parse_args()
+
+    serve(args.source, host=args.host, port=args.port, poll_interval=args.poll_interval,
+          tree_file=args.category_tree)
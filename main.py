@@ -1,152 +1,179 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from bs4 import BeautifulSoup
-import time
+import hashlib
+import json
+import os
 import re
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
+import sys
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from urllib.parse import urljoin
 
-BASE_URL = "https://www.tomanro.de/"
-MENU_ENDPOINT = "https://www.tomanro.de/MenuDeskNeu.php?Menubut={}"
-
+from bs4 import BeautifulSoup
 
-def get_sub_sub_category_links():
+import http_client
+from archive import PageArchive, archive_page
+from catalog_store import CatalogStore
+from categories import BASE_URL, DEFAULT_CACHE_FILE, category_path, get_category_tree
+from deadline import CrawlCoverage, RunDeadline, defer, dispatch_allowed
+from engines import ENGINES, get_stage_engine, use_engines
+from planner import CrawlPlanner
+from processes import ProcessMonitor
+from revisit import RevisitScheduler, record_listing_cards
+from sitemap import covered_categories, discover_product_links
+from xhr_replay import XhrListingFetcher, get_active_fetcher
+from profiling import RunProfiler, profiled
+from resilience import FailureTracker, ParseError, ScrapeError, load_manifest, retry_call
+
+# Selenium, Playwright and pandas/openpyxl are imported inside the fetch engines and
+# export functions that use them, so CLI stages that do not render or export start quickly.
+
+def get_sub_sub_category_links(patterns=None, cache_file=DEFAULT_CACHE_FILE):
     """
     Fetches all sub-sub-category (final product listing) links
     from tomanro.de mega menus.
 
+    The menus are parsed into a category tree (Hauptgruppe -> Gruppe) that
+    is cached in cache_file for a day; see categories.py.
+
+    Args:
+        patterns (list[str] | None): Only return groups matching these names,
+            URLs or path patterns (see CategoryTree.select)
+        cache_file (str | None): Category tree cache, None to always fetch
+
     Returns:
         list[str]: Absolute URLs of sub-sub-category pages
     """
+    tree = get_category_tree(cache_file)
+    return tree.select(patterns) if patterns else tree.leaf_urls()
+
+
+##################################################################################################################
+## PRODUCTS LINKS EXTRACTOR
+##################################################################################################################
 
-    session = requests.Session()
-    links = set()
+def fetch_page_links(url, headers):
+    """
+    Fetch product links from a single sub-sub-category page HTML.
 
-    # There are 6 top-level menus
-    for menubut in range(1, 7):
-        url = MENU_ENDPOINT.format(menubut)
-        resp = session.get(url, timeout=30)
-        resp.raise_for_status()
+    The page is rendered by the listing stage's fetch engine (Playwright by
+    default), which scrolls to the bottom so that lazily loaded products
+    appear before parsing.
 
-        soup = BeautifulSoup(resp.text, "html.parser")
+    Raises:
+        HTTPStatusError: If the page answered with an error status.
+        ParseError: If the rendered page could not be parsed.
+    """
+    html = get_stage_engine('listing').fetch(url, 'listing', headers)
+    archive_page(url, html, 'listing')
 
-        for a in soup.select("a.MainMenuLink[href]"):
-            href = a["href"].strip()
+    cards = {}
+    try:
+        result = parse_listing_page(html, url, cards)
+    except Exception as e:
+        raise ParseError(f"Could not parse listing page {url}: {e}") from e
 
-            # Final product listing pages
-            if href.endswith("-Gruppe") and not href.endswith("-Hauptgruppe"):
-                full_url = urljoin(BASE_URL, href)
-                links.add(full_url)
+    # Lets the revisit scheduler skip products whose listing card did not change
+    record_listing_cards(cards)
+    return result
 
-    return sorted(links)
 
+CARD_PRICE = re.compile(r'\d{1,3}(?:\.\d{3})*,\d{2}\s*€')
+CARD_VARIANT_COUNT = re.compile(r'(\d+)\s*(?:Varianten|Ausführungen|Typen|Artikel)\b', re.IGNORECASE)
 
-##################################################################################################################
-## PRODUCTS LINKS EXTRACTOR
-##################################################################################################################
 
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+def _product_card(anchor, href, max_depth=6):
+    """Return the largest ancestor of a product link that belongs to this product only."""
+    card = anchor
+    for _ in range(max_depth):
+        parent = card.parent
+        if parent is None or parent.name in ('body', 'html', '[document]'):
+            break
+        hrefs = {a["href"] for a in parent.find_all("a", href=True) if a["href"].endswith("-Typen")}
+        if hrefs != {href}:
+            break
+        card = parent
+    return card
 
 
-def _scroll_to_bottom(page, max_iterations: int = 40, wait_ms: int = 600) -> None:
+def listing_card_fingerprint(anchor, href):
     """
-    Scrolls the page to the bottom, repeatedly, to trigger lazy loading.
-    Stops when further scrolling no longer increases the document height
-    or when max_iterations is reached.
+    Fingerprint a product's card in the listing grid: displayed title, price
+    and variant count (if shown). A change in any of them means the product
+    page has to be rendered again.
     """
-    last_height = 0
+    card = _product_card(anchor, href)
+    text = " ".join(card.stripped_strings)
 
-    for _ in range(max_iterations):
-        # Scroll to the bottom
-        page.evaluate("window.scrollTo(0, document.body.scrollHeight);")
-        page.wait_for_timeout(wait_ms)
+    titles = [a.get("title") or a.get_text(" ", strip=True) for a in card.find_all("a", href=href)]
+    titles += [img.get("alt", "") for img in card.find_all("img")]
+    title = max(titles, key=len, default="")
 
-        # Check if more content was loaded
-        new_height = page.evaluate("document.body.scrollHeight")
-        if new_height == last_height:
-            break
-        last_height = new_height
+    price = CARD_PRICE.search(text)
+    variant_count = CARD_VARIANT_COUNT.search(text)
+    fingerprint = "|".join((title, price.group(0) if price else "", variant_count.group(1) if variant_count else ""))
+    return hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:16]
 
 
-def fetch_page_links(url, headers):
+def parse_listing_page(html, url, cards=None):
     """
-    Fetch product links from a single sub-sub-category page HTML.
+    Parse a rendered listing page into product links and pagination URLs.
+
+    Args:
+        html (str): HTML of the listing page
+        url (str): URL of the listing page, used to resolve relative links
+        cards (dict | None): If given, receives product link -> listing card fingerprint
 
-    This implementation uses Playwright to fully render the page and
-    scroll to the bottom so that lazily loaded products appear before
-    parsing. The function signature and return type remain unchanged.
+    Returns:
+        tuple[set[str], list[str]]: Product links and pagination page URLs
     """
     product_links = set()
     page_urls = []
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-
-        context_kwargs = {}
-        if isinstance(headers, dict) and "User-Agent" in headers:
-            context_kwargs["user_agent"] = headers["User-Agent"]
+    soup = BeautifulSoup(html, "html.parser")
 
-        context = browser.new_context(**context_kwargs)
-        page = context.new_page()
+    # 🔹 Extract only real product links from product grid
+    for a in soup.find_all("a", href=True):
+        href = a["href"]
+        if href.endswith("-Typen"):
+            full_url = urljoin(url, href)
+            product_links.add(full_url)
+            if cards is not None and full_url not in cards:
+                cards[full_url] = listing_card_fingerprint(a, href)
 
-        try:
-            page.goto(url, wait_until="load", timeout=60000)
-
-            # Try to accept cookies if the banner appears
-            try:
-                page.locator("button.button_einverstanden").first.click(timeout=3000)
-                page.wait_for_timeout(500)
-            except PlaywrightTimeoutError:
-                # Cookie banner not visible; continue normally
-                pass
-
-            # Scroll to the bottom to ensure all products are loaded
-            _scroll_to_bottom(page)
-
-            # Get the fully rendered HTML and parse with the existing logic
-            html = page.content()
-            soup = BeautifulSoup(html, "html.parser")
-
-            # 🔹 Extract only real product links from product grid
-            for a in soup.find_all("a", href=True):
-                href = a["href"]
-                if href.endswith("-Typen"):
-                    full_url = urljoin(url, href)
-                    product_links.add(full_url)
-
-            # 🔹 Extract pagination URLs
-            pagination = soup.select_one(".floatright")
-            if pagination:
-                for a in pagination.find_all("a", href=True):
-                    page_urls.append(urljoin(url, a["href"]))
-
-        finally:
-            browser.close()
+    # 🔹 Extract pagination URLs
+    pagination = soup.select_one(".floatright")
+    if pagination:
+        for a in pagination.find_all("a", href=True):
+            page_urls.append(urljoin(url, a["href"]))
 
     return product_links, page_urls
 
 
-def get_all_product_links(start_url):
+LISTING_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/144.0.0.0 Safari/537.36"
+    )
+}
+
+# Product pages have always been requested with this shorter user agent
+PRODUCT_HEADERS = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"}
+
+
+@profiled()
+def get_all_product_links(start_url, failures=None):
     """
     Given a sub-sub-category URL, return all product links for that
     category across all pagination pages.
+
+    Each listing page is fetched with retries; pages that still fail are
+    recorded in `failures` (if given) and skipped instead of aborting the
+    whole category. With XHR discovery active, pages are fetched by
+    replaying the lazy-load endpoint instead of scrolling in the browser.
     """
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/144.0.0.0 Safari/537.36"
-        )
-    }
+    headers = LISTING_HEADERS
+    xhr_fetcher = get_active_fetcher()
+    fetch = xhr_fetcher.fetch_page_links if xhr_fetcher is not None else fetch_page_links
 
     visited_pages = set()
     to_visit_pages = [start_url]
@@ -154,13 +181,23 @@ def get_all_product_links(start_url):
 
     # Sequentially visit each pagination page to avoid missing links
     while to_visit_pages:
+        if not dispatch_allowed():
+            # Out of time: the whole category is taken up again next run
+            defer('category', start_url)
+            break
         current_url = to_visit_pages.pop(0)
         if current_url in visited_pages:
             continue
 
         visited_pages.add(current_url)
 
-        products, pages = fetch_page_links(current_url, headers)
+        try:
+            products, pages = retry_call(fetch, current_url, headers)
+        except ScrapeError as e:
+            print(f"  Failed listing page {current_url} ({e.kind}): {e}")
+            if failures is not None:
+                failures.record(current_url, 'listing', e, context={'category': start_url})
+            continue
         all_product_links.update(products)
 
         # Add new pagination pages to the queue
@@ -175,97 +212,116 @@ def get_all_product_links(start_url):
 ## SINGLE PRODUCT EXTRACTOR
 #############################################################################################################
 
-def scrape_product_variants(page_link):
+@profiled()
+def scrape_product_variants(page_link, category_url=None):
     """
     Scrapes product variant grid from a page and returns product information.
     Handles both page types: with accordions and without accordions.
 
     Args:
         page_link (str): URL of the page to scrape
+        category_url (str | None): Category the page was found in, kept in the page archive
 
     Returns:
         list: List of dictionaries containing product information for unique variants
-    """
 
-    # Configure Selenium options
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    options.add_experimental_option("excludeSwitches", ["enable-automation"])
-    options.add_experimental_option('useAutomationExtension', False)
+    The page is rendered by the product stage's fetch engine (Selenium by default).
 
-    user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-    options.add_argument(f'user-agent={user_agent}')
+    Raises:
+        ParseError: If the rendered page could not be parsed. Driver and
+            network failures propagate unchanged for classification by retry_call.
+    """
+    page_source = get_stage_engine('product').fetch(page_link, 'product', PRODUCT_HEADERS)
+    archive_page(page_link, page_source, 'product', category_url)
 
-    driver = None
     try:
-        # Initialize Chrome driver
-        driver = webdriver.Chrome(options=options)
-
-        # Navigate to the page
-        driver.get(page_link)
-
-        # Wait for the page to load
-        time.sleep(5)
-
-        # Get page source
-        page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
-
-        # Get base product name
-        product_name_element = soup.find('h1', class_='TypUeber')
-        base_product_name = ""
-        if product_name_element:
-            base_product_name = product_name_element.get('content', '').strip()
-            if not base_product_name:
-                base_product_name = product_name_element.text.strip()
-
-        # Try both page structures
-        all_variants = []
-
-        # METHOD 1: Check for pages WITHOUT accordions (TabZel2 structure)
-        tab_zel2 = soup.find('div', class_='TabZel2')
-        if tab_zel2:
-            variants = extract_variants_from_tabzel2(tab_zel2, base_product_name)
-            all_variants.extend(variants)
-
-        # METHOD 2: Check for pages WITH accordions (TabZeile panel structure)
-        tab_zeile_panels = soup.find_all('div', class_='TabZeile panel panel-default')
-        if tab_zeile_panels:
-            variants = extract_variants_from_accordions(tab_zeile_panels, base_product_name)
-            all_variants.extend(variants)
-
-        # METHOD 3: Direct search for CarArtikel anywhere (fallback)
-        if not all_variants:
-            car_artikel_list = soup.find_all('div', class_='CarArtikel')
-            for variant in car_artikel_list:
-                product_data = extract_variant_data(variant, base_product_name, is_accordion=False)
-                all_variants.append(product_data)
-
-        # Remove duplicates based on serial number
-        unique_variants = []
-        seen_serials = set()
-
-        for variant in all_variants:
-            serial = variant.get('product_serial_number', '')
-            if serial and serial not in seen_serials:
-                seen_serials.add(serial)
-                unique_variants.append(variant)
-            elif not serial:  # If no serial, still add it (rare case)
-                unique_variants.append(variant)
-
-        # Clean the data
-        cleaned_variants = clean_product_data(unique_variants)
-
-        return cleaned_variants
-
+        return parse_product_page(page_source)
     except Exception as e:
-        return []
+        raise ParseError(f"Could not parse product page {page_link}: {e}") from e
 
-    finally:
-        if driver:
-            driver.quit()
+
+def parse_product_page(page_source):
+    """
+    Parse a rendered product page into its cleaned, de-duplicated variants.
+
+    postprocess.clean_variants gives the same result for the raw variants
+    (extract_product_variants) of many pages at once; the live scrape stays
+    page by page, because the catalog and revisit history need every page's
+    variants as soon as it is scraped. `python benchmark.py postprocess`
+    compares the two.
+
+    Args:
+        page_source (str): HTML of the product page
+
+    Returns:
+        list: List of dictionaries containing product information for unique variants
+    """
+    unique_variants = dedupe_by_serial(extract_product_variants(page_source))
+
+    # Clean the data
+    return clean_product_data(unique_variants)
+
+
+def dedupe_by_serial(variants):
+    """Remove variants repeating a serial number of an earlier one on the same page."""
+    unique_variants = []
+    seen_serials = set()
+
+    for variant in variants:
+        serial = variant.get('product_serial_number', '')
+        if serial and serial not in seen_serials:
+            seen_serials.add(serial)
+            unique_variants.append(variant)
+        elif not serial:  # If no serial, still add it (rare case)
+            unique_variants.append(variant)
+
+    return unique_variants
+
+
+def extract_product_variants(page_source):
+    """
+    Extract the raw variants of a rendered product page, in page order,
+    before de-duplication and cleaning.
+
+    Args:
+        page_source (str): HTML of the product page
+
+    Returns:
+        list: List of variant dictionaries as found on the page
+    """
+    soup = BeautifulSoup(page_source, 'html.parser')
+
+    # Get base product name
+    product_name_element = soup.find('h1', class_='TypUeber')
+    base_product_name = ""
+    if product_name_element:
+        base_product_name = product_name_element.get('content', '').strip()
+        if not base_product_name:
+            base_product_name = product_name_element.text.strip()
+
+    # Try both page structures
+    all_variants = []
+
+    # METHOD 1: Check for pages WITHOUT accordions (TabZel2 structure)
+    tab_zel2 = soup.find('div', class_='TabZel2')
+    if tab_zel2:
+        variants = extract_variants_from_tabzel2(tab_zel2, base_product_name)
+        all_variants.extend(variants)
+
+    # METHOD 2: Check for pages WITH accordions (TabZeile panel structure)
+    tab_zeile_panels = soup.find_all('div', class_='TabZeile panel panel-default')
+    if tab_zeile_panels:
+        variants = extract_variants_from_accordions(tab_zeile_panels, base_product_name)
+        all_variants.extend(variants)
+
+    # METHOD 3: Direct search for CarArtikel anywhere (fallback)
+    if not all_variants:
+        car_artikel_list = soup.find_all('div', class_='CarArtikel')
+        for variant in car_artikel_list:
+            product_data = extract_variant_data(variant, base_product_name, is_accordion=False)
+            all_variants.append(product_data)
+
+    return all_variants
 
 
 def extract_variants_from_tabzel2(tab_zel2_element, base_product_name):
@@ -455,64 +511,222 @@ def clean_product_data(products):
     return cleaned_products
 
 
-def get_product_variants(page_link):
+def get_product_variants(page_link, failures=None, category_url=None):
     """
     Main function to get product variants from any page type.
 
+    Transient failures (timeouts, 5xx/429, browser crashes) are retried with
+    jittered exponential backoff.
+
     Args:
         page_link (str): URL of the product page
+        failures (FailureTracker | None): Receives the classified error if the
+              page still fails after all retries
+        category_url (str | None): Category the page was found in, kept with
+              a failure so that its retry exports the same category path
 
     Returns:
         list: List of dictionaries with product data for each unique variant
               Returns empty list if no variants found or error occurs
     """
-    return scrape_product_variants(page_link)
+    try:
+        return retry_call(scrape_product_variants, page_link, category_url)
+    except ScrapeError as e:
+        print(f"  Failed product page {page_link} ({e.kind}): {e}")
+        if failures is not None:
+            failures.record(page_link, 'product', e, context={'category': category_url} if category_url else None)
+        return []
 
 
 #####################################################################################################
 ## MAIN SCRAPER
 #####################################################################################################
-import json
-import pandas as pd
-from concurrent.futures import ThreadPoolExecutor
 
+@profiled()
+def export_to_excel(products, excel_file):
+    """Save a list of variant dicts to an Excel file."""
+    import pandas as pd
+
+    df = pd.DataFrame(products)
+    df.to_excel(excel_file, index=False, engine='openpyxl')
 
-def scrape_all_products_to_csv(output_file='output', max_workers=5):
+
+@profiled()
+def export_to_json(products, json_file):
     """
-    Fetch all product variants from tomanro.de and save to Excel and JSON files.
+    Save a list of variant dicts to a JSON file.
 
-    Steps:
-    1. Fetch all sub-sub-category links.
-    2. For each category, fetch all product links.
-    3. For each product, fetch all variants.
-    4. Save all variants to Excel (.xlsx) and JSON (.json) files.
+    The file is written next to the target and renamed into place, so
+    readers such as lookup_api never see a half-written file.
+    """
+    tmp_file = f"{json_file}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(products, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_file, json_file)
+
+
+def _link_category(link, category_url=None, link_categories=None):
+    """Return a link's own category from link_categories, falling back to category_url."""
+    return (link_categories.get(link) if link_categories else None) or category_url
+
+
+def scrape_products(product_links, max_workers=5, failures=None, scheduler=None, store=None,
+                    category_url=None, page_key=None, link_categories=None):
+    """
+    Scrape the variants of many product pages in parallel and flatten the results.
+
+    Every successfully scraped page updates the RevisitScheduler history and
+    is upserted into the CatalogStore, if given. The returned variants carry
+    the category path ("Hauptgruppe > Gruppe") of their page's category, and
+    their page URL under page_key if one is given.
 
     Args:
-        output_file (str): Base name for output files (without extension).
-                          Will create output_file.xlsx and output_file.json
-        max_workers (int): Number of threads for parallel product scraping..
+        category_url (str | None): Category of all the links
+        link_categories (dict[str, str] | None): Category per link, for links
+              from several categories; links without one fall back to category_url
+    """
+    def scrape(link):
+        link_category = _link_category(link, category_url, link_categories)
+        if not dispatch_allowed():
+            defer('product', link, link_category)
+            return []
+        variants = get_product_variants(link, failures, link_category)
+        if failures is not None and failures.has_failed(link, 'product'):
+            return variants
+        if scheduler is not None:
+            scheduler.record(link, variants)
+        if store is not None:
+            store.add_variants(link, variants, link_category)
+        return variants
+
+    product_links = list(product_links)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(scrape, product_links))
+
+    variants = []
+    for link, variant_list in zip(product_links, results):
+        path = category_path(_link_category(link, category_url, link_categories))
+        for variant in variant_list:
+            variant = dict(variant, category_path=path)
+            if page_key:
+                variant[page_key] = link
+            variants.append(variant)
+    return variants
+
+
+def scrape_new_products(product_links, scraped_links, max_workers=5, failures=None, scheduler=None,
+                        lastmods=None, store=None, category_url=None, link_categories=None):
     """
+    Scrape the product links not seen earlier in this run.
 
-    print("Fetching all category links...")
-    category_links = get_sub_sub_category_links()
-    print(f"Found {len(category_links)} categories.")
+    Products that the revisit scheduler does not consider due contribute
+    their last known variants instead of being rendered.
 
-    all_products = []
+    Args:
+        product_links (iterable[str]): Discovered product links
+        scraped_links (set[str]): Product links already handled; updated in place
+        max_workers (int): Number of threads for parallel product scraping
+        failures (FailureTracker | None): Receives failed product pages
+        scheduler (RevisitScheduler | None): Adaptive revisit schedule
+        lastmods (dict[str, float] | None): Sitemap lastmod timestamps per link
+        store (CatalogStore | None): Catalog receiving discovered products and variants
+        category_url (str | None): Category the links were discovered in
+        link_categories (dict[str, str] | None): Category per link, for links
+                          not discovered in a single category
 
-    for idx, category_link in enumerate(category_links, start=1):
-        print(f"\n[{idx}/{len(category_links)}] Processing category: {category_link}")
-        product_links = get_all_product_links(category_link)
-        print(f"  Found {len(product_links)} products in this category.")
+    Returns:
+        list: Scraped and cached variants
+    """
+    product_links = [link for link in product_links if link not in scraped_links]
+    scraped_links.update(product_links)
+    print(f"  Found {len(product_links)} new products.")
+    if store is not None:
+        by_category = {}
+        for link in product_links:
+            by_category.setdefault(_link_category(link, category_url, link_categories), []).append(link)
+        for link_category, links in by_category.items():
+            store.add_products(links, link_category)
 
-        # Scrape product variants in parallel
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            results = list(executor.map(get_product_variants, product_links))
+    variants = []
+    # Products that are not due for a revisit keep their last known variants
+    if scheduler is not None:
+        product_links, cached_variants = scheduler.split(product_links, lastmods)
+        for link, cached in cached_variants.items():
+            path = category_path(_link_category(link, category_url, link_categories))
+            variants.extend(dict(variant, category_path=path) for variant in cached)
+        print(f"  {len(product_links)} products due for a revisit.")
+
+    # Scrape product variants in parallel
+    variants.extend(scrape_products(product_links, max_workers, failures, scheduler, store, category_url,
+                                    link_categories=link_categories))
+    return variants
 
-        # Flatten list of lists and append to all_products
-        for variant_list in results:
-            all_products.extend(variant_list)
 
-        print(f"  Total variants collected so far: {len(all_products)}")
+def retry_deferred_failures(failures, scraped_links, max_workers=5, scheduler=None, store=None):
+    """
+    Give every retryable failure of the run one more chance, after all other
+    work is done and any open circuit breaker has cooled down.
+
+    Args:
+        failures (FailureTracker): Failures collected during the run
+        scraped_links (set[str]): Product links already scraped; updated in place
+        max_workers (int): Number of threads for parallel product scraping
+        scheduler (RevisitScheduler | None): Revisit history to update and to
+                          decide which recovered product links are due
+        store (CatalogStore | None): Catalog receiving recovered products and variants
+
+    Returns:
+        list: Variants recovered by the deferred retries
+    """
+    if not dispatch_allowed():
+        # No time left; the failures stay in the manifest
+        return []
+    deferred = failures.pop_deferred()
+    if not deferred:
+        return []
+
+    print(f"\nRetrying {len(deferred)} deferred failure(s)...")
+    recovered = []
+
+    for stage, url, context in deferred:
+        if stage != 'listing':
+            continue
+        failures.wait_for_breaker(url)
+        failures.resolve(url, stage)
+        recovered.extend(scrape_new_products(get_all_product_links(url, failures), scraped_links,
+                                             max_workers, failures, scheduler, store=store,
+                                             category_url=context.get('category')))
+
+    link_categories = {url: context.get('category') for stage, url, context in deferred if stage == 'product'}
+    if link_categories:
+        product_links = list(link_categories)
+        # The first product runs the breaker's half-open trial; the others wait in retry_call for its outcome
+        failures.wait_for_breaker(product_links[0])
+        for url in product_links:
+            failures.resolve(url, 'product')
+        recovered.extend(scrape_products(product_links, max_workers, failures, scheduler, store,
+                                         link_categories=link_categories))
+
+    print(f"  Recovered {len(recovered)} variants; {len(failures)} URL(s) still failing.")
+    return recovered
+
+
+def save_outputs(all_products, output_file, failures=None, store=None, partial=False):
+    """
+    Write the Excel and JSON outputs plus the failure manifest, if any.
+
+    With a CatalogStore, the outputs are exported from the catalog (every
+    product seen in this run with its latest variants) instead of all_products.
+    After a partial run (selected categories only, or cut short by a time
+    budget) the export covers every product seen since the last full run,
+    so the outputs stay complete.
+    """
+    if store is not None:
+        if partial:
+            latest = store.latest_run(full_only=True)
+            all_products = store.export_rows(since=min(latest[0], store.run_started) if latest else 0)
+        else:
+            all_products = store.export_rows()
 
     if all_products:
         # Determine output file names
@@ -520,19 +734,388 @@ def scrape_all_products_to_csv(output_file='output', max_workers=5):
         json_file = f"{output_file}.json"
 
         # Save to Excel
-        df = pd.DataFrame(all_products)
-        df.to_excel(excel_file, index=False, engine='openpyxl')
+        export_to_excel(all_products, excel_file)
         print(f"\nData saved to Excel: {excel_file}")
 
         # Save to JSON
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(all_products, f, ensure_ascii=False, indent=2)
+        export_to_json(all_products, json_file)
         print(f"Data saved to JSON: {json_file}")
 
         print(f"\nScraping completed. Total variants: {len(all_products)}")
     else:
         print("No product data found.")
 
+    if failures is not None:
+        manifest_file = failures.write_manifest(f"{output_file}_failures.json")
+        print(f"Failure manifest ({len(failures)} URL(s)) saved to: {manifest_file}")
+
+
+def reprocess_failures(manifest_file, output_file='output_reprocessed', max_workers=5):
+    """
+    Re-run only the URLs listed in a failure manifest and save their variants
+    (and a new manifest for anything that still fails) under output_file.
+    """
+    entries = load_manifest(manifest_file)
+    print(f"Reprocessing {len(entries)} failed URL(s) from {manifest_file}...")
+    # The category paths of the outputs come from the category tree
+    get_category_tree()
+
+    failures = FailureTracker()
+    scraped_links = set()
+    all_products = []
+
+    for entry in entries:
+        if entry['stage'] == 'listing':
+            product_links = [link for link in get_all_product_links(entry['url'], failures)
+                             if link not in scraped_links]
+            scraped_links.update(product_links)
+            all_products.extend(scrape_products(product_links, max_workers, failures,
+                                                category_url=entry['context'].get('category', entry['url'])))
+
+    link_categories = {entry['url']: entry['context'].get('category') for entry in entries
+                       if entry['stage'] == 'product' and entry['url'] not in scraped_links}
+    scraped_links.update(link_categories)
+    all_products.extend(scrape_products(list(link_categories), max_workers, failures,
+                                        link_categories=link_categories))
+
+    all_products.extend(retry_deferred_failures(failures, scraped_links, max_workers))
+    save_outputs(all_products, output_file, failures)
+
+
+def scrape_all_products_to_csv(output_file='output', max_workers=5, profile_mode=None,
+                               profile_dir='profiles', slow_page_threshold=None, tracemalloc_every=0,
+                               archive_dir=None, revisit_history=None, full_sweep=False,
+                               discovery='listing', catalog_db=None, crawl_history=None,
+                               target_minutes=None, listing_engine=None, product_engine=None,
+                               categories=None, time_budget_minutes=None,
+                               coverage_file='crawl_coverage.json'):
+    """
+    Fetch all product variants from tomanro.de and save to Excel and JSON files.
+
+    Steps:
+    1. Fetch all sub-sub-category links.
+    2. For each category, fetch all product links.
+    3. For each product, fetch all variants.
+    4. Retry deferred failures once more at the end of the run.
+    5. Save all variants to Excel (.xlsx) and JSON (.json) files, and the
+       URLs that still failed to output_file_failures.json.
+
+    Args:
+        output_file (str): Base name for output files (without extension).
+                          Will create output_file.xlsx and output_file.json
+        max_workers (int): Number of threads for parallel product scraping..
+        profile_mode (str | None): "deterministic" or "sampling" to profile each
+                          stage into profile_dir; None disables profiling.
+        profile_dir (str): Directory for per-stage profiles, slow pages and
+                          tracemalloc reports.
+        slow_page_threshold (float | None): Capture HTML and timing breakdown
+                          of pages slower than this many seconds.
+        tracemalloc_every (int): Take a tracemalloc snapshot every N pages (0 = off).
+        archive_dir (str | None): Store every fetched page, compressed, in this
+                          archive so parsers can be re-run offline with
+                          `python archive.py <archive_dir>`. None disables it.
+        revisit_history (str | None): History file for adaptive revisits; product
+                          pages that are not due reuse their last variants.
+                          None renders every product page.
+        full_sweep (bool): Render every product page even with a revisit history.
+        discovery (str): "listing" renders every category listing page to find
+                          products; "sitemap" reads them from the site's sitemaps
+                          and only skips the listings of categories whose products
+                          (known from the catalog) are all in the sitemaps;
+                          "xhr" replays the listing's lazy-load endpoint over plain
+                          HTTP, rendering in the browser only to learn it.
+        catalog_db (str | None): SQLite catalog that scraped variants are upserted
+                          into and the Excel/JSON outputs are exported from.
+        crawl_history (str | None): Latency history for the crawl planner, which
+                          estimates the run before it starts and reports the
+                          estimate's accuracy at the end. None disables planning.
+        target_minutes (float | None): Desired run time; the planner then chooses
+                          the worker count instead of using max_workers.
+        listing_engine (str | None): Fetch engine for listing pages ("playwright",
+                          "selenium" or "http"); None keeps Playwright.
+        product_engine (str | None): Fetch engine for product pages; None keeps Selenium.
+        categories (list[str] | None): Only crawl the category subtrees matching
+                          these names, URLs or patterns, e.g. ["Hebetechnik",
+                          "*seilwinden*"]. With a catalog, the outputs still hold
+                          the whole catalog, with these categories refreshed.
+        time_budget_minutes (float | None): Wall-clock budget for the whole run.
+                          Categories are crawled stalest first; near the deadline
+                          no new pages are started, in-flight pages finish and the
+                          outputs are written. Skipped work is listed in
+                          coverage_file and taken first by the next run.
+        coverage_file (str): Per-category crawl times and uncovered URLs, used
+                          with a time budget.
+    """
+
+    profiling_enabled = profile_mode or slow_page_threshold is not None or tracemalloc_every
+    profiler = RunProfiler(output_dir=profile_dir, mode=profile_mode,
+                           slow_page_threshold=slow_page_threshold,
+                           tracemalloc_every=tracemalloc_every) if profiling_enabled else nullcontext()
+
+    archive = PageArchive(archive_dir) if archive_dir else nullcontext()
+    xhr_fetcher = XhrListingFetcher() if discovery == 'xhr' else nullcontext()
+    store = CatalogStore(catalog_db) if catalog_db else None
+    scheduler = RevisitScheduler(revisit_history, full_sweep=full_sweep) if revisit_history else None
+    planner = CrawlPlanner(crawl_history) if crawl_history else None
+
+    engines = use_engines(listing=listing_engine, product=product_engine)
+    coverage = CrawlCoverage(coverage_file) if time_budget_minutes else None
+    deadline = RunDeadline(time_budget_minutes * 60, coverage) if time_budget_minutes else nullcontext()
+    # Outermost, so that it checks for leaked browsers after the engines are closed
+    monitor = ProcessMonitor()
+
+    with monitor, deadline, profiler, archive, xhr_fetcher, engines, scheduler or nullcontext():
+        print("Fetching all category links...")
+        category_links = get_sub_sub_category_links(categories)
+        print(f"Found {len(category_links)} categories"
+              f"{' matching ' + ', '.join(categories) if categories else ''}.")
+        if coverage is not None:
+            category_links = coverage.prioritize(category_links)
+        if categories and discovery == 'sitemap':
+            # The sitemaps list products of every category
+            print("  Crawling listings of the selected categories instead of the sitemaps.")
+            discovery = 'listing'
+
+        if planner is not None:
+            print("\nPlanning the crawl...")
+            plan = planner.make_plan(category_links, target_minutes, max_workers,
+                                     render_ratio=1.0 if scheduler is None or full_sweep else None)
+            plan.print_summary()
+            max_workers = plan.workers
+            planner.start()
+
+        http_client.configure(max_workers)
+
+        all_products = []
+        failures = FailureTracker()
+        scraped_links = set()
+
+        if coverage is not None:
+            # Products the last run's deadline left unrendered go first
+            for category_link, product_links in coverage.pending_products(category_links).items():
+                print(f"\nTaking up {len(product_links)} product(s) left over by the last run...")
+                all_products.extend(scrape_new_products(product_links, scraped_links, max_workers, failures,
+                                                        scheduler, store=store, category_url=category_link))
+
+        if discovery == 'sitemap':
+            print("\nDiscovering products from sitemaps...")
+            sitemap_products, sitemap_categories = discover_product_links(BASE_URL)
+            # The sitemaps do not say which category a product belongs to; the
+            # catalog knows it for every product an earlier listing crawl found
+            link_categories = store.product_categories(sitemap_products) if store is not None else None
+            if store is not None:
+                covered = covered_categories(sitemap_categories, sitemap_products, store.category_products())
+                print(f"  {len(link_categories)} of {len(sitemap_products)} products have a known category; "
+                      f"{len(covered)} of {len(sitemap_categories)} sitemap categories have all their "
+                      f"known products in the sitemaps.")
+            else:
+                covered = set()
+                print("  Without a catalog the sitemaps cannot show which categories they cover completely.")
+            all_products.extend(scrape_new_products(sitemap_products, scraped_links, max_workers, failures,
+                                                    scheduler, lastmods=sitemap_products, store=store,
+                                                    link_categories=link_categories))
+            category_links = [link for link in category_links if link not in covered]
+            print(f"  Falling back to listing crawl for {len(category_links)} uncovered categories.")
+
+        for idx, category_link in enumerate(category_links, start=1):
+            if not dispatch_allowed():
+                for skipped_link in category_links[idx - 1:]:
+                    defer('category', skipped_link)
+                print(f"  Skipping the remaining {len(category_links) - idx + 1} categories.")
+                break
+            print(f"\n[{idx}/{len(category_links)}] Processing category: {category_link}")
+            if store is not None:
+                store.add_category(category_link)
+            all_products.extend(scrape_new_products(get_all_product_links(category_link, failures), scraped_links,
+                                                    max_workers, failures, scheduler, store=store,
+                                                    category_url=category_link))
+
+            if coverage is not None and category_link not in coverage.uncovered_categories:
+                coverage.category_done(category_link)
+            print(f"  Total variants collected so far: {len(all_products)}")
+
+        all_products.extend(retry_deferred_failures(failures, scraped_links, max_workers, scheduler, store))
+
+        # A run cut short by its deadline only refreshed part of the catalog
+        partial = bool(categories) or (coverage is not None and not coverage.complete)
+        save_outputs(all_products, output_file, failures, store, partial=partial)
+        if coverage is not None:
+            coverage.save()
+            coverage.print_summary()
+        if store is not None:
+            store.finish_run(len(all_products), partial=partial)
+            store.print_summary()
+            store.close()
+        if scheduler is not None:
+            scheduler.save()
+            scheduler.print_summary()
+        if planner is not None:
+            planner.plan.print_summary()
+            planner.finish(len(scraped_links))
+        http_client.print_connection_summary()
+
+    monitor.print_summary()
+
+
+#####################################################################################################
+## COMMAND LINE
+#####################################################################################################
+
+def read_url_file(path):
+    """Read URLs from a file (or "-" for stdin), one per line; blank lines and # comments are skipped."""
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8')
+    try:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def write_url_file(urls, path=None):
+    """Write URLs one per line to a file, or to stdout if path is None or "-"."""
+    if path in (None, '-'):
+        for url in urls:
+            print(url)
+        return
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(f"{url}\n" for url in urls)
+    print(f"Saved {len(urls)} URL(s) to: {path}", file=sys.stderr)
+
+
+def run_from_environment():
+    """Run the full pipeline configured by environment variables, as the scheduled workflow does."""
+    # Opt-in profiling, e.g. PROFILE_MODE=sampling SLOW_PAGE_THRESHOLD=20 TRACEMALLOC_EVERY=200
+    slow_page_threshold = os.environ.get("SLOW_PAGE_THRESHOLD")
+
+    # REPROCESS_MANIFEST=output_failures.json re-runs only the failed URLs of a previous run
+    if os.environ.get("REPROCESS_MANIFEST"):
+        reprocess_failures(os.environ["REPROCESS_MANIFEST"])
+    else:
+        scrape_all_products_to_csv(
+            profile_mode=os.environ.get("PROFILE_MODE") or None,
+            profile_dir=os.environ.get("PROFILE_DIR", "profiles"),
+            slow_page_threshold=float(slow_page_threshold) if slow_page_threshold else None,
+            tracemalloc_every=int(os.environ.get("TRACEMALLOC_EVERY", "0")),
+            archive_dir=os.environ.get("ARCHIVE_DIR") or None,
+            revisit_history=os.environ.get("REVISIT_HISTORY") or None,
+            full_sweep=os.environ.get("FULL_SWEEP", "") == "1",
+            discovery=os.environ.get("DISCOVERY", "listing"),
+            catalog_db=os.environ.get("CATALOG_DB", "catalog.db") or None,
+            crawl_history=os.environ.get("CRAWL_HISTORY") or None,
+            target_minutes=float(os.environ["TARGET_MINUTES"]) if os.environ.get("TARGET_MINUTES") else None,
+            listing_engine=os.environ.get("LISTING_ENGINE") or None,
+            product_engine=os.environ.get("PRODUCT_ENGINE") or None,
+            # e.g. CATEGORIES="Hebetechnik;*seilwinden*" refreshes only those subtrees
+            categories=[p for p in os.environ.get("CATEGORIES", "").split(";") if p.strip()] or None,
+            time_budget_minutes=float(os.environ["TIME_BUDGET_MINUTES"]) if os.environ.get("TIME_BUDGET_MINUTES") else None,
+            coverage_file=os.environ.get("COVERAGE_FILE", "crawl_coverage.json"),
+        )
+
+
+def main(argv=None):
+    """
+    Command line entry point. Without a subcommand the full pipeline runs
+    (configured by environment variables); the subcommands run one stage each:
+
+        python main.py categories [pattern...] [--tree] [-o categories.txt]
+        python main.py links <category URL>... | --from-file categories.txt [-o links.txt]
+        python main.py scrape links.txt [--output output] [--max-workers 5]
+        python main.py export [--db catalog.db] [--output output] [--since TIMESTAMP]
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape product variants from tomanro.de.")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("run", help="Run the full pipeline (the default), configured by environment variables")
+
+    categories_parser = subparsers.add_parser("categories", help="List the product listing (category) URLs")
+    categories_parser.add_argument("select", nargs="*", help="Only categories matching these names, URLs "
+                                                             "or patterns, e.g. Hebetechnik '*seilwinden*'")
+    categories_parser.add_argument("--tree", action="store_true", help="Print the category tree with names")
+    categories_parser.add_argument("--refresh", action="store_true", help="Refetch the menus, ignoring the cache")
+    categories_parser.add_argument("-o", "--output", help="Write the URLs to this file instead of stdout")
+
+    links_parser = subparsers.add_parser("links", help="List the product URLs of the given categories")
+    links_parser.add_argument("categories", nargs="*", help="Category listing URLs")
+    links_parser.add_argument("--from-file", help="Read category URLs from this file (- for stdin)")
+    links_parser.add_argument("-o", "--output", help="Write the URLs to this file instead of stdout")
+    links_parser.add_argument("--engine", choices=ENGINES, help="Fetch engine for listing pages")
+
+    scrape_parser = subparsers.add_parser("scrape", help="Scrape the product URLs listed in a file")
+    scrape_parser.add_argument("url_file", help="File with one product URL per line (- for stdin)")
+    scrape_parser.add_argument("--output", default="output", help="Base name for output files")
+    scrape_parser.add_argument("--max-workers", type=int, default=5)
+    scrape_parser.add_argument("--catalog-db", help="Also upsert the variants into this SQLite catalog")
+    scrape_parser.add_argument("--engine", choices=ENGINES, help="Fetch engine for product pages")
+
+    export_parser = subparsers.add_parser("export", help="Write Excel/JSON outputs from the SQLite catalog")
+    export_parser.add_argument("--db", default="catalog.db", help="Catalog database file")
+    export_parser.add_argument("--output", default="output", help="Base name for output files")
+    export_parser.add_argument("--since", type=float, help="Only products seen since this Unix time "
+                                                           "(default: the last completed full run)")
+
+    args = parser.parse_args(argv)
+
+    if args.command in (None, "run"):
+        run_from_environment()
+
+    elif args.command == "categories":
+        tree = get_category_tree(refresh=args.refresh)
+        category_links = tree.select(args.select) if args.select else tree.leaf_urls()
+        if args.tree:
+            tree.print_tree(category_links)
+        else:
+            write_url_file(category_links, args.output)
+
+    elif args.command == "links":
+        category_links = list(args.categories)
+        if args.from_file:
+            category_links.extend(read_url_file(args.from_file))
+        if not category_links:
+            parser.error("links: give category URLs or --from-file")
+
+        failures = FailureTracker()
+        product_links = set()
+        with use_engines(listing=args.engine):
+            for category_link in category_links:
+                product_links.update(get_all_product_links(category_link, failures))
+        write_url_file(sorted(product_links), args.output)
+        if len(failures):
+            manifest_file = failures.write_manifest(f"{args.output or 'links'}_failures.json")
+            print(f"Failure manifest ({len(failures)} URL(s)) saved to: {manifest_file}", file=sys.stderr)
+
+    elif args.command == "scrape":
+        http_client.configure(args.max_workers)
+        product_links = list(dict.fromkeys(read_url_file(args.url_file)))
+        store = CatalogStore(args.catalog_db) if args.catalog_db else None
+        failures = FailureTracker()
+        scraped_links = set(product_links)
+
+        # Category paths for the products the catalog already knows
+        get_category_tree()
+        link_categories = store.product_categories(product_links) if store is not None else None
+
+        print(f"Scraping {len(product_links)} product page(s)...")
+        with ProcessMonitor() as monitor, use_engines(product=args.engine):
+            all_products = scrape_products(product_links, args.max_workers, failures, store=store,
+                                           link_categories=link_categories)
+            all_products.extend(retry_deferred_failures(failures, scraped_links, args.max_workers, store=store))
+        # The URL file covers part of the catalog at most
+        save_outputs(all_products, args.output, failures, store, partial=True)
+        if store is not None:
+            store.finish_run(len(all_products), partial=True)
+            store.close()
+        monitor.print_summary()
+
+    elif args.command == "export":
+        with CatalogStore(args.db) as store:
+            since = args.since
+            if since is None:
+                latest = store.latest_run(full_only=True)
+                since = latest[0] if latest else 0
+            save_outputs(store.export_rows(since=since), args.output)
+
 
 if __name__ == "__main__":
-    scrape_all_products_to_csv()
\ No newline at end of file
+    main()
@@ -0,0 +1,264 @@
+import argparse
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+import http_client
+from profiling import add_page_listener, remove_page_listener
+from resilience import ScrapeError
+
+
+# Used until a run has recorded real latencies: a Playwright listing render with
+# scrolling, and a Selenium product render with its fixed 5 s wait
+DEFAULT_LATENCIES = {'listing': 25.0, 'product': 9.0}
+DEFAULT_PRODUCTS_PER_LISTING_PAGE = 20.0
+# Weight of the latest run in the exponentially weighted history
+HISTORY_WEIGHT = 0.3
+# Each worker drives its own Chrome; more than this does not fit a standard runner
+MAX_WORKERS_LIMIT = 8
+
+
+def _page_kind(url):
+    return 'product' if url.endswith('-Typen') else 'listing'
+
+
+def estimate_listing_pages(html, url):
+    """
+    Estimate a category's listing pages from its first page's pagination (.floatright).
+
+    The pagination may only show the pages around the current one, so the
+    highest page number in the link texts counts as well as the distinct links.
+
+    Returns:
+        tuple[int, int]: Estimated listing pages, products on the static first page
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    products = {a["href"] for a in soup.find_all("a", href=True) if a["href"].endswith("-Typen")}
+
+    pages = {url}
+    highest = 1
+    pagination = soup.select_one(".floatright")
+    if pagination:
+        for a in pagination.find_all("a", href=True):
+            pages.add(urljoin(url, a["href"]))
+            text = a.get_text(strip=True)
+            if text.isdigit():
+                highest = max(highest, int(text))
+
+    return max(len(pages), highest), len(products)
+
+
+class CrawlPlan:
+    """Estimated work, chosen worker count and batch size for one run."""
+
+    def __init__(self, categories, listing_pages, products, product_pages, latencies, workers,
+                 product_batch_size, projected_seconds, target_seconds=None):
+        self.categories = categories
+        self.listing_pages = listing_pages
+        self.products = products
+        self.product_pages = product_pages
+        self.latencies = latencies
+        self.workers = workers
+        self.product_batch_size = product_batch_size
+        self.projected_seconds = projected_seconds
+        self.target_seconds = target_seconds
+
+    @property
+    def meets_target(self):
+        return self.target_seconds is None or self.projected_seconds <= self.target_seconds
+
+    def print_summary(self):
+        print(f"Crawl plan: {self.categories} categories, ~{self.listing_pages} listing pages, "
+              f"~{self.products} products (~{self.product_pages} to render)")
+        print(f"  Latency per page: listing {self.latencies['listing']:.1f}s, "
+              f"product {self.latencies['product']:.1f}s")
+        target = f" (target {self.target_seconds / 60:.0f} min)" if self.target_seconds else ""
+        print(f"  {self.workers} workers: projected {self.projected_seconds / 60:.0f} min{target}")
+        if not self.meets_target:
+            print(f"  Target not reachable with {self.workers} workers; the listing crawl alone "
+                  f"takes ~{self.listing_pages * self.latencies['listing'] / 60:.0f} min")
+
+
+class CrawlPlanner:
+    """
+    Estimates a run's size before scraping and sizes the worker pool for it.
+
+    Listing pages are counted from each category's first page, fetched over
+    plain HTTP; products per listing page, the share of products actually
+    rendered (see RevisitScheduler) and the per-page latencies come from
+    `history_file`, which every finished run updates. Listing pages are
+    crawled one after another, product pages by `workers` browsers in
+    parallel, so the projected runtime is
+
+        listing_pages * listing_latency + product_pages * product_latency / workers
+
+    While the run is active, every page recorded through profiling.record_page
+    is timed, and `finish` prints how far the run was off the plan, as the
+    actual value's deviation from the planned one (-67% means a third of it).
+
+    Args:
+        history_file (str): JSON file with latencies and ratios of past runs
+        max_workers_limit (int): Upper bound for the chosen worker count
+    """
+
+    def __init__(self, history_file='crawl_history.json', max_workers_limit=MAX_WORKERS_LIMIT):
+        self.history_file = history_file
+        self.max_workers_limit = max_workers_limit
+        self.plan = None
+        self._lock = threading.Lock()
+        self._started = None
+        self._page_seconds = {'listing': 0.0, 'product': 0.0}
+        self._page_counts = {'listing': 0, 'product': 0}
+
+        self.history = {}
+        if history_file and os.path.exists(history_file):
+            with open(history_file, encoding='utf-8') as f:
+                self.history = json.load(f)
+
+    def _latency(self, kind):
+        return self.history.get('latencies', {}).get(kind, DEFAULT_LATENCIES[kind])
+
+    def _first_page_stats(self, category_links, max_fetchers):
+        def fetch(url):
+            try:
+                return estimate_listing_pages(http_client.fetch_text(url), url)
+            except ScrapeError:
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_fetchers) as executor:
+            return [stats for stats in executor.map(fetch, category_links) if stats is not None]
+
+    def make_plan(self, category_links, target_minutes=None, max_workers=5, render_ratio=None,
+                  batch_seconds=420, max_fetchers=8):
+        """
+        Estimate the run and choose the worker count and product batch size.
+
+        Args:
+            category_links (list[str]): Category listing URLs (the menu tree)
+            target_minutes (float | None): Desired completion time; None keeps max_workers
+            max_workers (int): Worker count to use when there is no target
+            render_ratio (float | None): Share of products rendered; defaults to
+                the history (below 1 with adaptive revisits)
+            batch_seconds (float): Product work per batch, i.e. the usable time
+                of one chunked Functions invocation
+            max_fetchers (int): Concurrent first-page requests
+
+        Returns:
+            CrawlPlan: The plan, also kept as self.plan
+        """
+        stats = self._first_page_stats(category_links, max_fetchers)
+        # Extrapolate categories whose first page could not be fetched
+        scale = len(category_links) / len(stats) if stats else 0
+        listing_pages = round(sum(pages for pages, _ in stats) * scale)
+
+        static_per_page = sum(products for _, products in stats) / len(stats) if stats else 0
+        per_page = self.history.get('products_per_listing_page') or static_per_page \
+            or DEFAULT_PRODUCTS_PER_LISTING_PAGE
+        products = round(listing_pages * per_page)
+        if render_ratio is None:
+            render_ratio = self.history.get('render_ratio', 1.0)
+        product_pages = round(products * render_ratio)
+
+        latencies = {kind: self._latency(kind) for kind in DEFAULT_LATENCIES}
+        listing_seconds = listing_pages * latencies['listing']
+        product_work = product_pages * latencies['product']
+
+        target_seconds = target_minutes * 60 if target_minutes else None
+        if target_seconds is None:
+            workers = max_workers
+        elif target_seconds > listing_seconds:
+            workers = min(self.max_workers_limit, max(1, math.ceil(product_work / (target_seconds - listing_seconds))))
+        else:
+            workers = self.max_workers_limit
+
+        product_batch_size = max(workers, int(batch_seconds * workers / latencies['product']))
+
+        self.plan = CrawlPlan(len(category_links), listing_pages, products, product_pages, latencies,
+                              workers, product_batch_size, listing_seconds + product_work / workers,
+                              target_seconds)
+        return self.plan
+
+    def _on_page(self, url, timings):
+        kind = _page_kind(url)
+        with self._lock:
+            self._page_counts[kind] += 1
+            self._page_seconds[kind] += sum(timings.values())
+
+    def start(self):
+        """Start timing the run and its pages."""
+        self._started = time.time()
+        add_page_listener(self._on_page)
+
+    def finish(self, products_discovered):
+        """
+        Print the plan's accuracy against the finished run and fold the run into the history.
+
+        Args:
+            products_discovered (int): Distinct product links found in this run
+        """
+        remove_page_listener(self._on_page)
+        elapsed = time.time() - self._started if self._started else 0
+        listing_pages = self._page_counts['listing']
+        product_pages = self._page_counts['product']
+
+        if self.plan is not None:
+            print("Plan accuracy (planned -> actual, actual vs. plan):")
+            for label, planned, actual in (
+                ("listing pages", self.plan.listing_pages, listing_pages),
+                ("products", self.plan.products, products_discovered),
+                ("product pages rendered", self.plan.product_pages, product_pages),
+                ("runtime (min)", round(self.plan.projected_seconds / 60), round(elapsed / 60)),
+            ):
+                error = f"{(actual - planned) / planned:+.0%}" if planned else "n/a"
+                print(f"  {label:<24} {planned:>8} -> {actual:<8} ({error})")
+
+        observed = {}
+        latencies = self.history.setdefault('latencies', {})
+        for kind in DEFAULT_LATENCIES:
+            if self._page_counts[kind]:
+                observed[kind] = self._page_seconds[kind] / self._page_counts[kind]
+                latencies[kind] = self._blend(latencies.get(kind), observed[kind])
+        if listing_pages:
+            self.history['products_per_listing_page'] = self._blend(
+                self.history.get('products_per_listing_page'), products_discovered / listing_pages)
+        if products_discovered:
+            self.history['render_ratio'] = self._blend(
+                self.history.get('render_ratio'), min(1.0, product_pages / products_discovered))
+        self.history['last_run'] = {'finished_at': time.time(), 'seconds': elapsed,
+                                    'listing_pages': listing_pages, 'product_pages': product_pages,
+                                    'products': products_discovered, 'latencies': observed}
+        self.save()
+
+    @staticmethod
+    def _blend(previous, value):
+        return value if previous is None else (1 - HISTORY_WEIGHT) * previous + HISTORY_WEIGHT * value
+
+    def save(self):
+        """Atomically write the history file."""
+        if not self.history_file:
+            return
+        tmp_file = f"{self.history_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.history, f, indent=2)
+        os.replace(tmp_file, self.history_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate a full scrape and size its worker pool.")
+    parser.add_argument("--history", default="crawl_history.json", help="Latency history of past runs")
+    parser.add_argument("--target-minutes", type=float, help="Desired completion time")
+    parser.add_argument("--category", action="append", help="Only plan this category URL (repeatable)")
+    args = parser.parse_args()
+
+    from main import get_sub_sub_category_links
+
+    plan = CrawlPlanner(args.history).make_plan(args.category or get_sub_sub_category_links(), args.target_minutes)
+    plan.print_summary()
+    print(f"  Chunked job: {plan.product_batch_size} products per work item "
+          f"(chunked_job.py --batch-size, or --crawl-history to plan it there)")
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+
+# Joins a whole column into one string; must not be whitespace, a digit, "," or "€"
+_SEPARATORS = [chr(code) for code in range(0, 9)]
+
+
+def _column_codes(values):
+    """
+    Join a column of strings into one array of Unicode code points, so that
+    character-level rules run as one NumPy operation over the whole column
+    instead of a regex call per row.
+
+    Returns:
+        tuple[str, numpy.ndarray]: The separator used and the code points
+    """
+    for separator in _SEPARATORS:
+        joined = separator.join(values)
+        if joined.count(separator) == len(values) - 1:
+            return separator, np.frombuffer(joined.encode('utf-32-le'), dtype=np.uint32)
+    raise ValueError("Every separator character occurs in the variant text")
+
+
+def _keep_chars(values, predicate, translate=None):
+    """
+    Remove the characters for which predicate is false from every string of a column.
+
+    The predicate runs once per distinct character; the filtering itself is a
+    single lookup-table mask over the column's code points. `translate` maps
+    kept characters to replacements.
+    """
+    if not values:
+        return []
+    separator, codes = _column_codes(values)
+    present = np.bincount(codes)
+    keep = np.zeros(len(present), dtype=bool)
+    for code in np.flatnonzero(present):
+        char = chr(code)
+        keep[code] = char == separator or predicate(char)
+    codes = codes[keep[codes]]
+    for old, new in (translate or {}).items():
+        codes = np.where(codes == ord(old), np.uint32(ord(new)), codes)
+    return codes.tobytes().decode('utf-32-le').split(separator)
+
+
+def _price_char(char):
+    # What re's [\d,\s€] matches in str patterns: Unicode decimal digits and whitespace
+    return char.isdecimal() or char.isspace() or char in (',', '€')
+
+
+def _clean_names(names):
+    # "Seilwinde Seilwinde 500 kg" -> "Seilwinde 500 kg" (three or more words only).
+    # Only the first three words are split off to look for the repeat.
+    cleaned = []
+    for name in names:
+        words = name.split(None, 2)
+        if len(words) > 2 and words[0] == words[1]:
+            cleaned.append(' '.join(name.split()[1:]))
+        else:
+            cleaned.append(name.strip())
+    return cleaned
+
+
+def _clean_prices(prices):
+    # "ab 1.958,37€ exkl. MwSt." -> "1958,37 €"
+    prices = [price.strip() for price in _keep_chars(prices, _price_char)]
+    return [price.replace('€', '').strip() + ' €' if '€' in price and not price.endswith(' €') else price
+            for price in prices]
+
+
+def parse_prices(prices):
+    """
+    Convert a column of cleaned prices ("1958,37 €") to floats.
+
+    The vectorized counterpart of catalog_store.parse_price: prices
+    without digits, or that are not a number, become NaN.
+    """
+    # "1.958,37 €" -> "1958.37"
+    digits = pd.Series(_keep_chars(prices.fillna('').astype(str).tolist(),
+                                   lambda c: c.isdecimal() or c == ',', translate={',': '.'}),
+                       index=prices.index, dtype=object)
+    values = pd.to_numeric(digits.where(digits.ne('')), errors='coerce')
+
+    # float() also reads non-ASCII digits, which to_numeric leaves as NaN
+    unparsed = values.isna() & digits.ne('')
+    values[unparsed] = [_to_float(value) for value in digits[unparsed]]
+    return values
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except ValueError:
+        return np.nan
+
+
+def clean_variants_frame(df, page_column='product_url', numeric_prices=False):
+    """
+    Clean and de-duplicate a whole result set of variants at once.
+
+    Produces the same rows and values as running each page's variants
+    through main.dedupe_by_serial and main.clean_product_data:
+
+    - variants repeating a serial number already seen on the same page are
+      dropped (variants without a serial are always kept),
+    - a product name starting with the same word twice loses the repeat,
+    - prices keep only digits, commas, whitespace and "€", with the euro
+      sign detached at the end ("1958,37 €").
+
+    Args:
+        df (pandas.DataFrame): Raw variants, one row each, in page order
+        page_column (str | None): Column identifying the page a variant came
+            from; None treats all rows as one page
+        numeric_prices (bool): Also add a float `price_value` column
+
+    Returns:
+        pandas.DataFrame: The cleaned variants with a fresh index
+    """
+    df = df.copy()
+    for column in ('product_name', 'product_price', 'product_serial_number'):
+        if column not in df:
+            df[column] = ''
+        df[column] = df[column].fillna('').astype(object)
+
+    keys = [page_column, 'product_serial_number'] if page_column else ['product_serial_number']
+    repeated_serial = df.duplicated(keys) & df['product_serial_number'].ne('')
+    df = df[~repeated_serial].reset_index(drop=True)
+
+    df['product_name'] = pd.Series(_clean_names(df['product_name'].tolist()), dtype=object)
+    df['product_price'] = pd.Series(_clean_prices(df['product_price'].tolist()), dtype=object)
+    if numeric_prices:
+        df['price_value'] = parse_prices(df['product_price'])
+    return df
+
+
+def clean_variants(variants, page_column='product_url', numeric_prices=False, drop_page_column=False):
+    """
+    List-of-dicts wrapper around clean_variants_frame.
+
+    Args:
+        variants (list[dict]): Raw variants in page order
+        page_column (str | None): Key identifying the page a variant came from
+        numeric_prices (bool): Also add a float `price_value` (None if there is no price)
+        drop_page_column (bool): Leave page_column out of the result
+
+    Returns:
+        list[dict]: Cleaned variants
+    """
+    if not variants:
+        return []
+    df = clean_variants_frame(pd.DataFrame(variants), page_column, numeric_prices)
+    if numeric_prices:
+        df['price_value'] = df['price_value'].astype(object).where(df['price_value'].notna(), None)
+    if drop_page_column and page_column:
+        df = df.drop(columns=page_column)
+    # Much faster than DataFrame.to_dict('records') for large frames
+    columns = list(df.columns)
+    return [dict(zip(columns, row)) for row in zip(*(df[column].tolist() for column in columns))]
@@ -0,0 +1,330 @@
+import os
+import signal
+import threading
+import time
+
+
+# Process names (/proc/<pid>/comm, at most 15 characters) of the browsers the
+# fetch engines start: Chrome/Chromium, Playwright's headless shell and chromedriver
+BROWSER_PREFIXES = ('chrome', 'chromium', 'headless_shell')
+DRIVER_NAMES = ('chromedriver',)
+# Set in the environment of every browser and driver the fetch engines launch, to
+# "<pid>:<start time>" of the scraper; the browsers' own children, crash handler
+# included, inherit it. The start time tells the scraper from a later process
+# that got its pid.
+OWNER_ENV = "TOMANRO_SCRAPER_OWNER"
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def supported():
+    """Return True if processes can be inspected (Linux /proc)."""
+    return os.path.isdir('/proc/self')
+
+
+def _read(path, mode='r'):
+    try:
+        with open(path, mode) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def start_time(pid):
+    """Return when a process started, in clock ticks since boot, or None if it is gone."""
+    stat = _read(f'/proc/{pid}/stat')
+    if not stat:
+        return None
+    # Field 22 of stat, counted from the fields after the parenthesised name
+    return int(stat[stat.rindex(')') + 2:].split()[19])
+
+
+def owner_marker(pid=None):
+    """Return the OWNER_ENV value for browsers launched by a process (this one by default)."""
+    pid = pid or os.getpid()
+    started = start_time(pid)
+    return str(pid) if started is None else f"{pid}:{started}"
+
+
+def browser_env():
+    """Return the environment to launch a browser or driver with, marked as started by this process."""
+    return dict(os.environ, **{OWNER_ENV: owner_marker()})
+
+
+def owner_of(pid):
+    """
+    Return the scraper that launched a browser process as (pid, start time),
+    or None if no scraper did. The start time is None for markers written
+    before it was recorded.
+    """
+    environ = _read(f'/proc/{pid}/environ', 'rb') or b''
+    prefix = f"{OWNER_ENV}=".encode()
+    for variable in environ.split(b'\0'):
+        if variable.startswith(prefix):
+            owner, _, started = variable[len(prefix):].decode('ascii', 'replace').partition(':')
+            try:
+                return int(owner), int(started) if started else None
+            except ValueError:
+                return None
+    return None
+
+
+def owner_alive(owner, table=None):
+    """Return True if the scraper behind an owner_of() result is still running."""
+    owner_pid, started = owner
+    table = process_table() if table is None else table
+    # A pid that was reused since has a different start time
+    return owner_pid in table and (started is None or start_time(owner_pid) == started)
+
+
+def rss_bytes(pid):
+    """Return the resident set size of a process in bytes, or 0 if it is gone."""
+    statm = _read(f'/proc/{pid}/statm')
+    return int(statm.split()[1]) * _PAGE_SIZE if statm else 0
+
+
+class ProcessInfo:
+    """One entry of the process table: pid, parent, name, state and command line."""
+
+    def __init__(self, pid, ppid, name, state, cmdline):
+        self.pid = pid
+        self.ppid = ppid
+        self.name = name
+        self.state = state
+        self.cmdline = cmdline
+
+    @property
+    def is_browser(self):
+        return self.name.startswith(BROWSER_PREFIXES) or self.name in DRIVER_NAMES
+
+
+def process_table():
+    """
+    Return the live processes of this user as {pid: ProcessInfo}, from /proc.
+
+    Zombies are left out: they hold no memory and vanish once reaped.
+    """
+    table = {}
+    if not supported():
+        return table
+    uid = os.getuid()
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        pid = int(entry)
+        try:
+            if os.stat(f'/proc/{pid}').st_uid != uid:
+                continue
+        except OSError:
+            continue
+        stat = _read(f'/proc/{pid}/stat')
+        if not stat:
+            continue
+        # The name is in parentheses and may itself contain spaces or parentheses
+        name = stat[stat.index('(') + 1:stat.rindex(')')]
+        state, ppid = stat[stat.rindex(')') + 2:].split()[:2]
+        if state in ('Z', 'X'):
+            continue
+        cmdline = _read(f'/proc/{pid}/cmdline', 'rb') or b''
+        table[pid] = ProcessInfo(pid, int(ppid), name, state,
+                                 cmdline.decode('utf-8', 'replace').split('\0'))
+    return table
+
+
+def descendants(pid, table=None):
+    """Return the pids of all live descendants of a process."""
+    table = process_table() if table is None else table
+    children = {}
+    for info in table.values():
+        children.setdefault(info.ppid, []).append(info.pid)
+
+    found = []
+    stack = list(children.get(pid, []))
+    while stack:
+        child = stack.pop()
+        found.append(child)
+        stack.extend(children.get(child, []))
+    return found
+
+
+def browser_children(pid=None, table=None):
+    """Return the pids of the browser and driver processes started (directly or not) by a process."""
+    table = process_table() if table is None else table
+    return [child for child in descendants(pid or os.getpid(), table) if table[child].is_browser]
+
+
+def orphaned_browsers(table=None):
+    """
+    Return the pids of browser processes launched by a scraper that is gone.
+
+    Only browsers marked with OWNER_ENV (see browser_env) count, so desktop
+    browsers and other tools' automated browsers are never touched. A browser
+    is orphaned only once the scraper that launched it has exited; where its
+    pid was reused since, the start time tells the two apart. Browsers of a
+    scraper that is still running, this one included, are left alone even if
+    they were reparented to init, like the crash handler Chrome always
+    detaches or a browser whose driver crashed.
+    """
+    table = process_table() if table is None else table
+    own = set(descendants(os.getpid(), table))
+    orphans = []
+    for info in table.values():
+        if not info.is_browser or info.pid in own:
+            continue
+        owner = owner_of(info.pid)
+        if owner is not None and not owner_alive(owner, table):
+            orphans.append(info.pid)
+    return orphans
+
+
+def _with_descendants(pids, table):
+    found = set(pids)
+    for pid in pids:
+        found.update(descendants(pid, table))
+    return found
+
+
+def terminate(pids, timeout=5.0):
+    """
+    Send SIGTERM to the processes, then SIGKILL to any still alive after timeout.
+
+    Returns:
+        int: Processes that were signalled
+    """
+    signalled = []
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+            signalled.append(pid)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    deadline = time.monotonic() + timeout
+    alive = signalled
+    while alive and time.monotonic() < deadline:
+        time.sleep(0.1)
+        alive = [pid for pid in alive if _alive(pid)]
+    for pid in alive:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
+    return len(signalled)
+
+
+def _alive(pid):
+    stat = _read(f'/proc/{pid}/stat')
+    return bool(stat) and stat[stat.rindex(')') + 2] not in 'ZX'
+
+
+def reap_orphaned_browsers():
+    """Terminate browsers left behind by earlier crashed runs; returns how many browser processes were found."""
+    table = process_table()
+    pids = _with_descendants(orphaned_browsers(table), table)
+    if pids:
+        # Whatever an orphaned browser started goes with it
+        terminate(pids)
+    return sum(table[pid].is_browser for pid in pids)
+
+
+def reap_browser_children():
+    """Terminate browser processes this run started but never closed; returns how many were found."""
+    table = process_table()
+    browsers = browser_children(table=table)
+    if browsers:
+        terminate(_with_descendants(browsers, table))
+    return len(browsers)
+
+
+def sample(pid=None):
+    """
+    Return the memory and browser count of a process and its browser children.
+
+    Returns:
+        dict: python_rss and browser_rss (bytes), browsers and orphans
+            (process counts; orphans as in orphaned_browsers)
+    """
+    pid = pid or os.getpid()
+    table = process_table()
+    browsers = browser_children(pid, table)
+    return {
+        'python_rss': rss_bytes(pid),
+        'browser_rss': sum(rss_bytes(child) for child in browsers),
+        'browsers': len(browsers),
+        'orphans': sum(table[child].is_browser
+                       for child in _with_descendants(orphaned_browsers(table), table)),
+    }
+
+
+class ProcessMonitor:
+    """
+    Samples the scraper's memory and browser processes in the background.
+
+    Every `interval` seconds the RSS of this process, the summed RSS of its
+    browser and driver children and their count are recorded; the summary
+    shows the start, peak and end of each. Browser RSS double-counts memory
+    the processes share, so it is an upper bound.
+
+    Entering the monitor terminates orphaned browsers of earlier crashed runs;
+    leaving it (after the fetch engines are closed) terminates browsers this
+    run leaked. Does nothing where /proc is not available.
+
+    Args:
+        interval (float | None): Seconds between samples; None samples only
+            on entry, on exit and when sample() is called
+    """
+
+    def __init__(self, interval=60.0):
+        self.interval = interval
+        self.samples = []
+        self.reaped_orphans = 0
+        self.reaped_leftovers = 0
+        self._active = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self._active = supported()
+        if self._active:
+            self.reaped_orphans = reap_orphaned_browsers()
+            if self.reaped_orphans:
+                print(f"Terminated {self.reaped_orphans} orphaned browser process(es) of an earlier run.")
+            self.sample()
+            if self.interval:
+                self._thread = threading.Thread(target=self._run, name="process-monitor", daemon=True)
+                self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._active:
+            self._active = False
+            if self._thread is not None:
+                self._stop.set()
+                self._thread.join()
+            # The fetch engines are closed by now; any browser still running leaked
+            self.reaped_leftovers = reap_browser_children()
+            if self.reaped_leftovers:
+                print(f"Terminated {self.reaped_leftovers} browser process(es) left running by this run.")
+            self.sample()
+        return False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        self.samples.append(dict(sample(), at=time.time()))
+        return self.samples[-1]
+
+    def print_summary(self):
+        if not self.samples:
+            return
+        first, last = self.samples[0], self.samples[-1]
+        print("Processes (start / peak / end):")
+        for key, label in (('python_rss', 'python RSS'), ('browser_rss', 'browser RSS')):
+            peak = max(s[key] for s in self.samples)
+            print(f"  {label:<12} {first[key] / 2**20:8.0f} / {peak / 2**20:8.0f} / {last[key] / 2**20:8.0f} MB")
+        print(f"  {'browsers':<12} {first['browsers']:8} / {max(s['browsers'] for s in self.samples):8} "
+              f"/ {last['browsers']:8}")
+        print(f"  Orphaned browsers terminated at start: {self.reaped_orphans}, "
+              f"left running at the end: {self.reaped_leftovers}")
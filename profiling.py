@@ -0,0 +1,351 @@
+import cProfile
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from functools import wraps
+
+
+# The profiler used by `profiled` stages and `record_page`; None means profiling is off.
+_active_profiler = None
+
+# Callables notified of every page timing, e.g. the crawl planner's latency history
+_page_listeners = []
+
+
+def get_active_profiler():
+    """Return the currently active RunProfiler, or None when profiling is disabled."""
+    return _active_profiler
+
+
+def _slugify(url, max_length=120):
+    """Turn a URL into a safe file name."""
+    slug = re.sub(r'[^A-Za-z0-9._-]+', '_', url.split('://', 1)[-1]).strip('_')
+    return slug[:max_length] or 'page'
+
+
+class _StackSampler:
+    """
+    Minimal sampling profiler.
+
+    A background thread periodically inspects the stack of every thread that
+    is currently inside a profiled stage and counts collapsed stacks
+    ("outer;inner;leaf"), which can be fed directly into flamegraph tools.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = {}
+        self._thread_stages = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+    def enter(self, stage):
+        with self._lock:
+            self._thread_stages.setdefault(threading.get_ident(), []).append(stage)
+
+    def exit(self):
+        with self._lock:
+            stages = self._thread_stages.get(threading.get_ident())
+            if stages:
+                stages.pop()
+                if not stages:
+                    del self._thread_stages[threading.get_ident()]
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            with self._lock:
+                active = {tid: stages[-1] for tid, stages in self._thread_stages.items()}
+            for tid, stage in active.items():
+                frame = frames.get(tid)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.samples.setdefault(stage, Counter())[key] += 1
+
+
+class RunProfiler:
+    """
+    Opt-in profiling for a scraping run.
+
+    - Wraps pipeline stages in a deterministic (cProfile) or sampling profiler
+      and writes one profile file per stage into `output_dir`.
+    - Captures the rendered HTML and timing breakdown of every page whose
+      total latency exceeds `slow_page_threshold` seconds.
+    - Takes a tracemalloc snapshot every `tracemalloc_every` pages and reports
+      the largest allocation growth since the previous snapshot.
+
+    Args:
+        output_dir (str): Directory for profiles, slow pages and memory reports.
+        mode (str | None): "deterministic" (cProfile), "sampling", or None to
+            only time stages (useful with slow page capture / tracemalloc alone).
+        slow_page_threshold (float | None): Latency in seconds above which a
+            page is captured. None disables slow page capture.
+        tracemalloc_every (int): Snapshot interval in pages. 0 disables it.
+        sample_interval (float): Seconds between stack samples in sampling mode.
+    """
+
+    def __init__(self, output_dir='profiles', mode='deterministic', slow_page_threshold=None,
+                 tracemalloc_every=0, sample_interval=0.005):
+        if mode not in (None, 'deterministic', 'sampling'):
+            raise ValueError(f"Unknown profiling mode: {mode}")
+
+        self.output_dir = output_dir
+        self.mode = mode
+        self.slow_page_threshold = slow_page_threshold
+        self.tracemalloc_every = tracemalloc_every
+
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stage_stats = {}
+        self._stage_times = Counter()
+        self._stage_calls = Counter()
+        self._sampler = _StackSampler(sample_interval) if mode == 'sampling' else None
+        self._unprofiled_calls = 0
+
+        self._pages_seen = 0
+        self._slow_pages = 0
+        self._last_snapshot = None
+        self._snapshot_index = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+    def start(self):
+        """Activate this profiler for the current process."""
+        global _active_profiler
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self._sampler:
+            self._sampler.start()
+        if self.tracemalloc_every and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        _active_profiler = self
+
+    def stop(self):
+        """Deactivate the profiler and write all per-stage profiles."""
+        global _active_profiler
+
+        if _active_profiler is self:
+            _active_profiler = None
+        if self._sampler:
+            self._sampler.stop()
+        if self.tracemalloc_every and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.dump()
+
+    @contextmanager
+    def stage(self, name):
+        """Profile everything executed inside the block under the given stage name."""
+        start = time.perf_counter()
+
+        if self._sampler:
+            self._sampler.enter(name)
+            try:
+                yield
+            finally:
+                self._sampler.exit()
+                self._add_time(name, time.perf_counter() - start)
+            return
+
+        # Only one cProfile can run per thread; a nested stage is already
+        # covered by the outer stage's profile.
+        depth = getattr(self._local, 'depth', 0)
+        profile = cProfile.Profile() if depth == 0 and self.mode == 'deterministic' else None
+        self._local.depth = depth + 1
+        if profile:
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ allows a single cProfile per process, so a stage
+                # entered while another thread is profiled is only timed
+                profile = None
+                with self._lock:
+                    self._unprofiled_calls += 1
+        try:
+            yield
+        finally:
+            self._local.depth = depth
+            if profile:
+                profile.disable()
+                with self._lock:
+                    if name in self._stage_stats:
+                        self._stage_stats[name].add(profile)
+                    else:
+                        self._stage_stats[name] = pstats.Stats(profile)
+            self._add_time(name, time.perf_counter() - start)
+
+    def _add_time(self, name, elapsed):
+        with self._lock:
+            self._stage_times[name] += elapsed
+            self._stage_calls[name] += 1
+
+    def record_page(self, url, timings, html=None):
+        """
+        Record the timing breakdown of a single fetched page.
+
+        Args:
+            url (str): Page URL.
+            timings (dict): Phase name -> seconds (e.g. goto, scroll, parse).
+            html (str | None): Rendered HTML, saved if the page is slow.
+        """
+        total = sum(timings.values())
+
+        with self._lock:
+            self._pages_seen += 1
+            pages_seen = self._pages_seen
+            is_slow = self.slow_page_threshold is not None and total >= self.slow_page_threshold
+            if is_slow:
+                self._slow_pages += 1
+
+        if is_slow:
+            slow_dir = os.path.join(self.output_dir, 'slow_pages')
+            os.makedirs(slow_dir, exist_ok=True)
+            base = os.path.join(slow_dir, f"{pages_seen:06d}_{_slugify(url)}")
+            with open(f"{base}.json", 'w', encoding='utf-8') as f:
+                json.dump({'url': url, 'total': round(total, 4),
+                           'timings': {k: round(v, 4) for k, v in timings.items()}}, f, indent=2)
+            if html is not None:
+                with open(f"{base}.html", 'w', encoding='utf-8') as f:
+                    f.write(html)
+            print(f"  Slow page ({total:.2f}s): {url}")
+
+        if self.tracemalloc_every and pages_seen % self.tracemalloc_every == 0:
+            self._take_memory_snapshot(pages_seen)
+
+    def _take_memory_snapshot(self, pages_seen, top=20):
+        if not tracemalloc.is_tracing():
+            return
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+
+        with self._lock:
+            previous = self._last_snapshot
+            self._last_snapshot = snapshot
+            self._snapshot_index += 1
+            index = self._snapshot_index
+
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [f"Snapshot {index} after {pages_seen} pages: "
+                 f"current={current / 1024 / 1024:.1f} MiB, peak={peak / 1024 / 1024:.1f} MiB"]
+        if previous is not None:
+            lines.append(f"Top {top} allocation changes since previous snapshot:")
+            for stat in snapshot.compare_to(previous, 'lineno')[:top]:
+                lines.append(f"  {stat}")
+        else:
+            lines.append(f"Top {top} allocations:")
+            for stat in snapshot.statistics('lineno')[:top]:
+                lines.append(f"  {stat}")
+
+        memory_dir = os.path.join(self.output_dir, 'memory')
+        os.makedirs(memory_dir, exist_ok=True)
+        with open(os.path.join(memory_dir, f"snapshot_{index:04d}.txt"), 'w', encoding='utf-8') as f:
+            f.write("\n".join(lines) + "\n")
+        print(f"  {lines[0]}")
+
+    def dump(self):
+        """Write one profile per stage plus a summary of stage timings."""
+        with self._lock:
+            stage_stats = dict(self._stage_stats)
+            stage_times = dict(self._stage_times)
+            stage_calls = dict(self._stage_calls)
+
+        for name, stats in stage_stats.items():
+            stats.dump_stats(os.path.join(self.output_dir, f"{name}.prof"))
+
+        if self._sampler:
+            for name, samples in self._sampler.samples.items():
+                with open(os.path.join(self.output_dir, f"{name}.folded"), 'w', encoding='utf-8') as f:
+                    for stack, count in samples.most_common():
+                        f.write(f"{stack} {count}\n")
+
+        summary = {
+            'mode': self.mode or 'timing',
+            'pages_seen': self._pages_seen,
+            'slow_pages': self._slow_pages,
+            'unprofiled_calls': self._unprofiled_calls,
+            'stages': {
+                name: {'calls': stage_calls[name], 'total_seconds': round(stage_times[name], 4)}
+                for name in stage_times
+            },
+        }
+        with open(os.path.join(self.output_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+        if stage_times:
+            print(f"\nProfiles written to: {self.output_dir}")
+            for name, elapsed in sorted(stage_times.items(), key=lambda item: -item[1]):
+                print(f"  {name}: {elapsed:.2f}s over {stage_calls[name]} call(s)")
+        if self._unprofiled_calls:
+            print(f"  {self._unprofiled_calls} stage call(s) overlapped another thread's profile and were "
+                  f"only timed; use sampling mode to profile concurrent stages on Python 3.12+")
+
+
+def profiled(stage_name=None):
+    """
+    Decorator that profiles the wrapped function as a stage when a
+    RunProfiler is active, and is a plain call otherwise.
+    """
+    def decorator(func):
+        name = stage_name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            profiler = _active_profiler
+            if profiler is None:
+                return func(*args, **kwargs)
+            with profiler.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def add_page_listener(listener):
+    """Call listener(url, timings) for every recorded page, whether or not profiling is on."""
+    _page_listeners.append(listener)
+
+
+def remove_page_listener(listener):
+    if listener in _page_listeners:
+        _page_listeners.remove(listener)
+
+
+def record_page(url, timings, html=None):
+    """Forward a page timing breakdown to the active profiler and page listeners, if any."""
+    profiler = _active_profiler
+    if profiler is not None:
+        profiler.record_page(url, timings, html)
+    for listener in list(_page_listeners):
+        listener(url, timings)
@@ -0,0 +1,375 @@
+import json
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+from deadline import time_left
+
+
+#####################################################################################################
+## ERROR CLASSES
+#####################################################################################################
+
+class ScrapeError(Exception):
+    """Base class for classified scraping failures."""
+
+    kind = "error"
+    retryable = False
+
+
+class FetchTimeoutError(ScrapeError):
+    """The page or request timed out, or the connection dropped."""
+
+    kind = "timeout"
+    retryable = True
+
+
+class HTTPStatusError(ScrapeError):
+    """The server answered with an error status code."""
+
+    kind = "http_status"
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def retryable(self):
+        # Rate limiting and server errors are transient; other 4xx are not
+        return self.status is None or self.status == 429 or self.status >= 500
+
+
+class BrowserCrashError(ScrapeError):
+    """The browser or driver process died or became unreachable."""
+
+    kind = "browser_crash"
+    retryable = True
+
+
+class ParseError(ScrapeError):
+    """The page was fetched but its content could not be parsed."""
+
+    kind = "parse"
+    retryable = False
+
+
+class CircuitOpenError(ScrapeError):
+    """The host's circuit breaker is open; the request was not attempted."""
+
+    kind = "circuit_open"
+    retryable = True
+
+
+def classify_error(exc):
+    """
+    Map an arbitrary exception from requests, Playwright or Selenium onto a
+    ScrapeError subclass. Library types are recognised by name so that this
+    module does not need to import the browser backends.
+
+    Args:
+        exc (Exception): The raised exception
+
+    Returns:
+        ScrapeError: The classified error (exc itself if already classified)
+    """
+    if isinstance(exc, ScrapeError):
+        return exc
+
+    name = type(exc).__name__
+    module = type(exc).__module__ or ""
+    message = f"{name}: {exc}".strip()
+
+    # requests; ConnectTimeout and ReadTimeout derive from Timeout. Invalid
+    # URLs, missing schemas or too many redirects fail the same way every time
+    if module.startswith("requests"):
+        response = getattr(exc, "response", None)
+        if response is not None and name == "HTTPError":
+            return HTTPStatusError(message, status=response.status_code)
+        if {cls.__name__ for cls in type(exc).__mro__} & {"Timeout", "ConnectionError"}:
+            return FetchTimeoutError(message)
+        return ScrapeError(message)
+
+    # Playwright
+    if module.startswith("playwright"):
+        if name == "TimeoutError":
+            return FetchTimeoutError(message)
+        if "net::ERR" in str(exc):
+            return FetchTimeoutError(message)
+        return BrowserCrashError(message)
+
+    # Selenium
+    if module.startswith("selenium"):
+        if name == "TimeoutException":
+            return FetchTimeoutError(message)
+        return BrowserCrashError(message)
+
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return FetchTimeoutError(message)
+
+    return ScrapeError(message)
+
+
+#####################################################################################################
+## CIRCUIT BREAKER
+#####################################################################################################
+
+class CircuitBreaker:
+    """
+    Per-host circuit breaker.
+
+    After `failure_threshold` consecutive failures against a host the circuit
+    opens and calls fail fast for `cooldown` seconds. The first call after the
+    cooldown is let through as a trial; other calls may wait for its outcome.
+    Success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, cooldown=60.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._failures = {}
+        self._opened_at = {}
+        # host -> thread running the half-open trial
+        self._trial_in_flight = {}
+        self._lock = threading.Lock()
+        self._trial_done = threading.Condition(self._lock)
+
+    def time_until_retry(self, host):
+        """Seconds until the host may be tried again (0 if the circuit is closed)."""
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return 0.0
+            return max(0.0, opened_at + self.cooldown - time.monotonic())
+
+    def allow(self, host, timeout=0.0):
+        """
+        Return True if a request to the host may be attempted.
+
+        Once the cooldown is over, only the first caller is admitted as the
+        trial; the caller must then report the outcome through record_success,
+        record_failure or release. Other callers wait up to `timeout` seconds
+        (None: as long as it takes) for the trial's outcome: they are admitted
+        if it closed the circuit and refused if it opened it again.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                opened_at = self._opened_at.get(host)
+                if opened_at is None:
+                    return True
+                if time.monotonic() < opened_at + self.cooldown:
+                    return False
+                if host not in self._trial_in_flight:
+                    self._trial_in_flight[host] = threading.get_ident()
+                    return True
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._trial_done.wait(remaining)
+
+    def trial_in_flight(self, host):
+        with self._lock:
+            return host in self._trial_in_flight
+
+    def _end_trial(self, host):
+        self._trial_in_flight.pop(host, None)
+        self._trial_done.notify_all()
+
+    def release(self, host):
+        """End this thread's trial call, if any, without judging the host's health."""
+        with self._lock:
+            if self._trial_in_flight.get(host) == threading.get_ident():
+                self._end_trial(host)
+
+    def record_success(self, host):
+        with self._lock:
+            self._failures.pop(host, None)
+            self._opened_at.pop(host, None)
+            self._end_trial(host)
+
+    def record_failure(self, host):
+        with self._lock:
+            self._end_trial(host)
+            count = self._failures.get(host, 0) + 1
+            self._failures[host] = count
+            if count >= self.failure_threshold:
+                if host not in self._opened_at or time.monotonic() >= self._opened_at[host] + self.cooldown:
+                    print(f"  Circuit opened for {host} after {count} consecutive failures")
+                self._opened_at[host] = time.monotonic()
+
+
+# Shared by every stage so that all requests to a host trip the same breaker
+default_breaker = CircuitBreaker()
+
+
+#####################################################################################################
+## RETRY
+#####################################################################################################
+
+def backoff_delay(attempt, base_delay=1.0, max_delay=30.0):
+    """Exponential backoff with full jitter for the given zero-based attempt."""
+    return random.uniform(0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+def retry_call(func, url, *args, retries=3, base_delay=1.0, max_delay=30.0, breaker=None, **kwargs):
+    """
+    Call func(url, *args, **kwargs), retrying retryable failures with jittered
+    exponential backoff and respecting the per-host circuit breaker.
+
+    While another call runs the breaker's half-open trial, the call waits for
+    its outcome instead of failing fast. Under a run deadline, waits and
+    backoff sleeps end when no new pages may be started; a retryable failure
+    is then raised for the deferred pass instead of being retried.
+
+    Args:
+        func (callable): Fetch function taking the URL as first argument
+        url (str): URL being fetched (used for the circuit breaker host)
+        retries (int): Number of retries after the first attempt
+        base_delay (float): Base delay in seconds for the backoff
+        max_delay (float): Upper bound for a single backoff delay
+        breaker (CircuitBreaker | None): Breaker to use, default_breaker if None
+
+    Returns:
+        The return value of func
+
+    Raises:
+        ScrapeError: The classified last error, with an `attempts` attribute
+    """
+    breaker = breaker or default_breaker
+    host = urlparse(url).netloc
+
+    attempt = 0
+    while True:
+        if not breaker.allow(host, timeout=time_left()):
+            error = CircuitOpenError(f"Circuit open for {host}")
+            error.attempts = attempt
+            raise error
+
+        try:
+            result = func(url, *args, **kwargs)
+        except Exception as exc:
+            error = classify_error(exc)
+            if error is not exc:
+                error.__cause__ = exc
+            attempt += 1
+            error.attempts = attempt
+
+            # Parse errors say nothing about the host's health
+            if error.retryable:
+                breaker.record_failure(host)
+            if not error.retryable or attempt > retries:
+                raise error
+
+            delay = backoff_delay(attempt - 1, base_delay, max_delay)
+            left = time_left()
+            if left is not None and left <= delay:
+                if left > 0:
+                    time.sleep(left)
+                raise error
+            print(f"  Retry {attempt}/{retries} for {url} in {delay:.1f}s ({error.kind}: {error})")
+            time.sleep(delay)
+        else:
+            breaker.record_success(host)
+            return result
+        finally:
+            # A trial cut short (parse error, KeyboardInterrupt, SystemExit) must not keep the host blocked
+            breaker.release(host)
+
+
+#####################################################################################################
+## FAILURE ACCOUNTING
+#####################################################################################################
+
+class FailureTracker:
+    """
+    Collects failed URLs during a run.
+
+    Retryable failures are also queued for a deferred retry at the end of the
+    run; whatever still fails afterwards ends up in the failure manifest so
+    that only those URLs need reprocessing.
+    """
+
+    def __init__(self):
+        self._failures = {}
+        self._deferred = []
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._failures)
+
+    def record(self, url, stage, error, context=None):
+        """
+        Record a failed URL.
+
+        Args:
+            url (str): URL that failed
+            stage (str): Pipeline stage, e.g. "listing" or "product"
+            error (ScrapeError): The classified error
+            context (dict | None): Extra data needed to reprocess the URL
+        """
+        entry = {
+            'url': url,
+            'stage': stage,
+            'error_type': error.kind,
+            'status': getattr(error, 'status', None),
+            'message': str(error),
+            'attempts': getattr(error, 'attempts', 1),
+            'context': context or {},
+        }
+        with self._lock:
+            self._failures[(stage, url)] = entry
+            if error.retryable:
+                self._deferred.append((stage, url))
+
+    def has_failed(self, url, stage):
+        """Return True if the URL is currently recorded as failed."""
+        with self._lock:
+            return (stage, url) in self._failures
+
+    def resolve(self, url, stage):
+        """Forget a failure after it succeeded on a later attempt."""
+        with self._lock:
+            self._failures.pop((stage, url), None)
+
+    def pop_deferred(self):
+        """Return and clear the deferred retry queue as (stage, url, context) tuples."""
+        with self._lock:
+            deferred = [(stage, url, self._failures[(stage, url)]['context'])
+                        for stage, url in dict.fromkeys(self._deferred)
+                        if (stage, url) in self._failures]
+            self._deferred = []
+        return deferred
+
+    def wait_for_breaker(self, url, breaker=None):
+        """Sleep until the circuit for the URL's host allows a new attempt."""
+        breaker = breaker or default_breaker
+        delay = breaker.time_until_retry(urlparse(url).netloc)
+        left = time_left()
+        if left is not None:
+            delay = min(delay, max(0.0, left))
+        if delay:
+            print(f"  Waiting {delay:.0f}s for circuit breaker cooldown...")
+            time.sleep(delay)
+
+    def failures(self):
+        with self._lock:
+            return list(self._failures.values())
+
+    def write_manifest(self, path):
+        """Write the remaining failures to a JSON manifest."""
+        failures = self.failures()
+        manifest = {
+            'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'failed_count': len(failures),
+            'failures': failures,
+        }
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        return path
+
+
+def load_manifest(path):
+    """Load the failures list from a manifest written by FailureTracker."""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f).get('failures', [])
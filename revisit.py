@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+import zlib
+
+
+DAY = 24 * 60 * 60
+
+# The scheduler receiving listing card fingerprints; None when adaptive revisits are off.
+_active_scheduler = None
+
+
+def record_listing_cards(cards):
+    """Forward listing card fingerprints (product link -> fingerprint) to the active scheduler, if any."""
+    scheduler = _active_scheduler
+    if scheduler is not None and cards:
+        scheduler.record_cards(cards)
+
+
+class RevisitScheduler:
+    """
+    Decides which product pages need to be rendered in this run.
+
+    For every product URL the history keeps the variants seen last time
+    (keyed by product_serial_number) and a revisit interval. A visit that
+    finds a changed price, a new or a removed serial halves the interval
+    (down to `min_interval_days`); an unchanged visit doubles it (up to
+    `max_staleness_days`). Products that are not due are served from the
+    cached variants, so the export stays complete.
+
+    While the scheduler is active (used as a context manager), listing pages
+    report a fingerprint of every product card (title, price, variant
+    count). A changed card makes a product due at once; an unchanged one
+    still lets it wait only for its revisit interval, so a volatile product
+    whose price moves without touching the card is not left stale.
+
+    Args:
+        history_file (str): JSON file holding the per-product history
+        min_interval_days (float): Revisit interval for volatile products
+        max_staleness_days (float): Guaranteed upper bound on a product's age
+        full_sweep (bool): Treat every product as due, ignoring the history
+    """
+
+    def __init__(self, history_file, min_interval_days=1, max_staleness_days=7, full_sweep=False):
+        self.history_file = history_file
+        self.min_interval = min_interval_days * DAY
+        self.max_staleness = max_staleness_days * DAY
+        self.full_sweep = full_sweep
+        self.now = time.time()
+        self._lock = threading.Lock()
+        self.visited = 0
+        self.skipped = 0
+        self.changed = 0
+        self.card_skipped = 0
+        self.cards = {}
+
+        self.history = {}
+        if os.path.exists(history_file):
+            with open(history_file, encoding='utf-8') as f:
+                self.history = json.load(f)
+
+    def __enter__(self):
+        global _active_scheduler
+        _active_scheduler = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active_scheduler
+        if _active_scheduler is self:
+            _active_scheduler = None
+        return False
+
+    def record_cards(self, cards):
+        """Remember the listing card fingerprints seen in this run."""
+        with self._lock:
+            self.cards.update(cards)
+
+    def _spread(self, url):
+        # Spread stable products over the week instead of revisiting them all on the same night
+        return 1 - 0.25 * (zlib.crc32(url.encode('utf-8')) % 1000) / 1000
+
+    def interval_for(self, url):
+        """Return the revisit interval of a product in seconds, from how often its variants changed."""
+        return min(self.history[url]['interval'], self.max_staleness) * self._spread(url)
+
+    def is_due(self, url, lastmod=None):
+        """
+        Return True if the product page should be rendered in this run.
+
+        A changed listing card or a sitemap lastmod newer than the last visit
+        makes the page due at once. Otherwise, with an unchanged card or an
+        older lastmod (neither need move when only a price changes), the page
+        is due after its revisit interval, which never exceeds the maximum
+        staleness.
+        """
+        entry = self.history.get(url)
+        if self.full_sweep or entry is None:
+            return True
+        # A little slack so that a nightly run is not skipped by a few minutes of drift
+        age = self.now - entry['last_visit'] + 60 * 60
+
+        card = self.cards.get(url)
+        if card is not None and entry.get('card') is not None and card != entry['card']:
+            return True
+        if lastmod is not None and lastmod > entry['last_visit']:
+            return True
+        return age >= self.interval_for(url)
+
+    def split(self, product_links, lastmods=None):
+        """
+        Split product links into those to render and those served from history.
+
+        Args:
+            product_links (list[str]): Product links
+            lastmods (dict[str, float | None] | None): Sitemap lastmod timestamps per link
+
+        Returns:
+            tuple[list[str], dict[str, list]]: Links to scrape, and the cached
+                variants of each skipped link
+        """
+        due = []
+        cached_variants = {}
+        card_skipped = 0
+        for url in product_links:
+            if self.is_due(url, lastmods.get(url) if lastmods else None):
+                due.append(url)
+            else:
+                cached_variants[url] = self.history[url]['variants']
+                if url in self.cards and 'card' in self.history[url]:
+                    card_skipped += 1
+
+        with self._lock:
+            self.skipped += len(product_links) - len(due)
+            self.card_skipped += card_skipped
+        return due, cached_variants
+
+    @staticmethod
+    def _fingerprint(variants):
+        return {v.get('product_serial_number', '') or v.get('product_name', ''): v.get('product_price', '')
+                for v in variants}
+
+    def record(self, url, variants):
+        """Update a product's history after a successful visit."""
+        with self._lock:
+            self.visited += 1
+            card = self.cards.get(url)
+            entry = self.history.get(url)
+            if entry is None:
+                self.history[url] = {
+                    'variants': variants,
+                    'last_visit': self.now,
+                    'last_change': self.now,
+                    'interval': self.min_interval,
+                    'visits': 1,
+                    'changes': 0,
+                    'card': card,
+                }
+                return
+
+            if self._fingerprint(variants) != self._fingerprint(entry['variants']):
+                self.changed += 1
+                entry['changes'] += 1
+                entry['last_change'] = self.now
+                entry['interval'] = max(self.min_interval, entry['interval'] / 2)
+            else:
+                entry['interval'] = min(self.max_staleness, entry['interval'] * 2)
+
+            entry['variants'] = variants
+            entry['last_visit'] = self.now
+            entry['visits'] += 1
+            if card is not None:
+                entry['card'] = card
+
+    def save(self):
+        """Atomically write the history file."""
+        tmp_file = f"{self.history_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.history, f, ensure_ascii=False)
+        os.replace(tmp_file, self.history_file)
+
+    def print_summary(self):
+        total = self.visited + self.skipped
+        if total:
+            print(f"Revisit scheduler: rendered {self.visited} of {total} product pages "
+                  f"({self.skipped} served from history, {self.card_skipped} of them on an unchanged "
+                  f"listing card; {self.changed} changed)")
@@ -0,0 +1,168 @@
+import argparse
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import urljoin
+from xml.etree.ElementTree import XMLPullParser
+
+import http_client
+from resilience import ScrapeError, retry_call
+
+
+def _local_name(tag):
+    """Strip the XML namespace from a tag name."""
+    return tag.rsplit('}', 1)[-1]
+
+
+def parse_lastmod(value):
+    """
+    Parse a sitemap <lastmod> (W3C datetime) into a Unix timestamp.
+
+    Returns:
+        float | None: Timestamp, or None if the value is missing or invalid
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def sitemaps_from_robots(base_url):
+    """Return the sitemap URLs declared in robots.txt, or the conventional /sitemap.xml."""
+    sitemaps = []
+    try:
+        robots = http_client.fetch_text(urljoin(base_url, "/robots.txt"))
+    except ScrapeError:
+        robots = ""
+
+    for line in robots.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip().lower() == 'sitemap' and value.strip():
+            sitemaps.append(urljoin(base_url, value.strip()))
+
+    return sitemaps or [urljoin(base_url, "/sitemap.xml")]
+
+
+def _parse_sitemap(url):
+    """
+    Stream-parse one sitemap or sitemap index.
+
+    Returns:
+        tuple[list[tuple[str, float | None]], list[str]]:
+            (page URL, lastmod) entries and nested sitemap URLs
+    """
+    entries = []
+    nested = []
+    loc = lastmod = None
+    parser = XMLPullParser(events=('end',))
+    decompressor = None
+
+    resp = http_client.get_session().get(url, timeout=60, stream=True)
+    try:
+        resp.raise_for_status()
+        for chunk in resp.iter_content(chunk_size=64 * 1024):
+            # Sitemaps are often served as .xml.gz without a Content-Encoding header
+            if decompressor is None:
+                decompressor = zlib.decompressobj(wbits=31) if chunk[:2] == b'\x1f\x8b' else False
+            if decompressor:
+                chunk = decompressor.decompress(chunk)
+            parser.feed(chunk)
+
+            for event, elem in parser.read_events():
+                name = _local_name(elem.tag)
+                if name == 'loc':
+                    loc = (elem.text or '').strip()
+                elif name == 'lastmod':
+                    lastmod = parse_lastmod(elem.text)
+                elif name in ('url', 'sitemap'):
+                    if loc:
+                        if name == 'url':
+                            entries.append((urljoin(url, loc), lastmod))
+                        else:
+                            nested.append(urljoin(url, loc))
+                    loc = lastmod = None
+                    elem.clear()
+    finally:
+        resp.close()
+
+    parser.close()
+    return entries, nested
+
+
+def discover_product_links(base_url, max_sitemaps=500):
+    """
+    Enumerate product and category URLs from the site's sitemaps.
+
+    Args:
+        base_url (str): Site root, e.g. "https://www.tomanro.de/"
+        max_sitemaps (int): Safety limit on the number of sitemap files read
+
+    Returns:
+        tuple[dict[str, float | None], set[str]]:
+            Product (-Typen) URL -> lastmod timestamp, and the listing
+            (-Gruppe) URLs the sitemap covers
+    """
+    products = {}
+    categories = set()
+    to_visit = sitemaps_from_robots(base_url)
+    visited = set()
+
+    while to_visit and len(visited) < max_sitemaps:
+        sitemap_url = to_visit.pop(0)
+        if sitemap_url in visited:
+            continue
+        visited.add(sitemap_url)
+
+        try:
+            entries, nested = retry_call(_parse_sitemap, sitemap_url)
+        except ScrapeError as e:
+            print(f"  Could not read sitemap {sitemap_url} ({e.kind}): {e}")
+            continue
+
+        to_visit.extend(u for u in nested if u not in visited)
+        for url, lastmod in entries:
+            if url.endswith("-Typen"):
+                products[url] = lastmod
+            elif url.endswith("-Gruppe") and not url.endswith("-Hauptgruppe"):
+                categories.add(url)
+
+    print(f"Sitemap: {len(products)} products and {len(categories)} categories from {len(visited)} sitemap(s).")
+    return products, categories
+
+
+def covered_categories(sitemap_categories, sitemap_products, category_products):
+    """
+    Return the categories whose listing crawl the sitemaps make unnecessary.
+
+    A category's -Gruppe URL in the sitemap says nothing about whether its
+    products are listed there too. A category only counts as covered if
+    earlier listing crawls found products in it and every one of them is in
+    the sitemap; any other category keeps its listing crawl.
+
+    Args:
+        sitemap_categories (set[str]): Listing URLs found in the sitemaps
+        sitemap_products (dict[str, float | None] | set[str]): Product URLs found in the sitemaps
+        category_products (dict[str, set[str]]): Known product URLs per
+            category, e.g. from CatalogStore.category_products
+
+    Returns:
+        set[str]: Covered category URLs
+    """
+    return {category for category in sitemap_categories
+            if category_products.get(category)
+            and all(product in sitemap_products for product in category_products[category])}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List product URLs found in a site's sitemaps.")
+    parser.add_argument("base_url", nargs="?", default="https://www.tomanro.de/", help="Site root URL")
+    args = parser.parse_args()
+
+    found_products, found_categories = discover_product_links(args.base_url)
+    for product_url, product_lastmod in sorted(found_products.items()):
+        print(product_url, product_lastmod or "")
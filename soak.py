@@ -0,0 +1,135 @@
+import argparse
+import csv
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle, islice
+
+from benchmark import fixture_server
+from engines import use_engines
+from processes import ProcessMonitor, supported
+
+
+MB = 2 ** 20
+
+
+def _settled(samples, count=3):
+    """Median of a few consecutive samples, so a single busy moment does not count as growth."""
+    return {key: statistics.median(s[key] for s in samples[:count])
+            for key in ('python_rss', 'browser_rss', 'browsers', 'orphans')}
+
+
+def soak_test(pages=2000, workers=4, listing_engine=None, product_engine=None, fixtures_dir=None,
+              settle_seconds=0.5, sample_every=50, warmup_pages=200, max_python_growth_mb=100,
+              max_browser_growth_mb=300, max_extra_browsers=2, samples_file=None):
+    """
+    Drive the scraper's fetch functions over fixture pages and check that
+    memory and browser processes stay flat.
+
+    Listing pages go through main.fetch_page_links and product pages through
+    main.get_product_variants, `workers` at a time, with the real fetch
+    engines against a local HTTP server. Every `sample_every` pages the RSS
+    of this process, the summed RSS of its browser children and the browser
+    and orphaned-browser counts are sampled. The levels right after
+    `warmup_pages` are compared with the levels at the end, and after the
+    engines are closed no browser may be left running.
+
+    Args:
+        pages (int): Pages to fetch in total
+        workers (int): Concurrent fetches, like scrape_products' max_workers
+        listing_engine (str | None): Fetch engine for listing pages
+        product_engine (str | None): Fetch engine for product pages
+        fixtures_dir (str | None): Directory of saved pages; synthetic if None
+        settle_seconds (float): Wait on product pages (the engines default to 5 s)
+        sample_every (int): Pages between samples
+        warmup_pages (int): Pages before the baseline is taken (pools filling up)
+        max_python_growth_mb (float): Allowed growth of the Python process RSS
+        max_browser_growth_mb (float): Allowed growth of the browser children's RSS
+        max_extra_browsers (int): Allowed growth of the browser process count
+        samples_file (str | None): CSV file to write the samples to
+
+    Returns:
+        bool: True if every check passed
+    """
+    from main import LISTING_HEADERS, fetch_page_links, get_product_variants
+    from resilience import FailureTracker
+
+    if not supported():
+        print("Soak test needs /proc (Linux) to sample processes.")
+        return False
+
+    failures = FailureTracker()
+    monitor = ProcessMonitor(interval=None)
+    started = time.perf_counter()
+    done = 0
+
+    def fetch(url):
+        if url.endswith('-Typen'):
+            get_product_variants(url, failures)
+        else:
+            fetch_page_links(url, LISTING_HEADERS)
+
+    with fixture_server(fixtures_dir) as (base_url, names):
+        urls = list(islice(cycle(base_url + name for name in names), pages))
+        print(f"Soak test: {pages} pages ({len(names)} distinct), {workers} workers...")
+        with monitor, use_engines(listing=listing_engine, product=product_engine, settle_seconds=settle_seconds):
+            monitor.samples[-1]['pages'] = 0
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for _ in executor.map(fetch, urls):
+                    done += 1
+                    if done % sample_every == 0 or done == pages:
+                        s = monitor.sample()
+                        s['pages'] = done
+                        print(f"  {done:>6} pages  python {s['python_rss'] / MB:7.0f} MB  "
+                              f"browsers {s['browser_rss'] / MB:7.0f} MB in {s['browsers']:>3} processes  "
+                              f"orphans {s['orphans']}")
+        monitor.samples[-1]['pages'] = done
+
+    elapsed = time.perf_counter() - started
+    if samples_file:
+        with open(samples_file, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['pages', 'at', 'python_rss', 'browser_rss', 'browsers', 'orphans'])
+            writer.writeheader()
+            writer.writerows(monitor.samples)
+
+    # The last sample is taken after the engines were closed
+    running = [s for s in monitor.samples[:-1] if s['pages'] >= min(warmup_pages, pages - sample_every)]
+    baseline, end = _settled(running), _settled(running[::-1])
+    checks = [
+        ("python RSS growth (MB)", (end['python_rss'] - baseline['python_rss']) / MB, max_python_growth_mb),
+        ("browser RSS growth (MB)", (end['browser_rss'] - baseline['browser_rss']) / MB, max_browser_growth_mb),
+        ("browser process growth", max(s['browsers'] for s in running) - baseline['browsers'], max_extra_browsers),
+        ("orphaned browser growth", monitor.samples[-1]['orphans'] - monitor.samples[0]['orphans'], 0),
+        ("browsers left running", monitor.reaped_leftovers, 0),
+    ]
+
+    print(f"Soak test finished in {elapsed / 60:.1f} min ({len(failures)} failed pages):")
+    passed = True
+    for label, value, limit in checks:
+        ok = value <= limit
+        passed = passed and ok
+        print(f"  {label:<26} {value:8.1f}  (limit {limit})  {'ok' if ok else 'FAIL'}")
+    print("PASSED" if passed else "FAILED")
+    return passed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the fetch engines for memory growth and leaked browsers.")
+    parser.add_argument("--pages", type=int, default=2000, help="Pages to fetch in total")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--listing-engine", help="Fetch engine for listing pages (default: playwright)")
+    parser.add_argument("--product-engine", help="Fetch engine for product pages (default: selenium)")
+    parser.add_argument("--fixtures", help="Directory of saved *-Gruppe.html / *-Typen.html pages")
+    parser.add_argument("--settle", type=float, default=0.5, help="Seconds to wait on product pages")
+    parser.add_argument("--sample-every", type=int, default=50, help="Pages between samples")
+    parser.add_argument("--warmup", type=int, default=200, help="Pages before the baseline sample")
+    parser.add_argument("--max-python-growth", type=float, default=100, help="MB")
+    parser.add_argument("--max-browser-growth", type=float, default=300, help="MB")
+    parser.add_argument("--max-extra-browsers", type=int, default=2)
+    parser.add_argument("--samples", help="Write the samples to this CSV file")
+    args = parser.parse_args()
+
+    sys.exit(0 if soak_test(args.pages, args.workers, args.listing_engine, args.product_engine, args.fixtures,
+                            args.settle, args.sample_every, args.warmup, args.max_python_growth,
+                            args.max_browser_growth, args.max_extra_browsers, args.samples) else 1)
@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import archive
+import categories
+from archive import PageArchive, archive_page, latest_entries, read_page, reextract
+from benchmark import PRODUCT_FIXTURE, VARIANT_FIXTURE
+from categories import CategoryTree
+
+
+CATEGORY = "https://example.test/15-Handseilwinden-Gruppe"
+WINDE = "https://example.test/Handseilwinde-Typen"
+LISTING = "https://example.test/15-Handseilwinden-Gruppe?seite=2"
+
+
+def _product_page(idx, variants=3):
+    return PRODUCT_FIXTURE.format(product=idx, variants=''.join(
+        VARIANT_FIXTURE.format(product=idx, load=250 * (v + 1), price=100 + v) for v in range(variants)))
+
+
+@pytest.mark.parametrize("zstd", [True, False])
+def test_store_and_read_page_round_trip(tmp_path, monkeypatch, zstd):
+    if not zstd:
+        monkeypatch.setattr(archive, 'zstandard', None)
+    elif archive.zstandard is None:
+        pytest.skip("zstandard is not installed")
+
+    html = _product_page(1) + "<!-- Preis: 1.958,37 € -->"
+    with PageArchive(str(tmp_path)) as page_archive:
+        archive_page(WINDE, html, 'product', CATEGORY)
+        archive_page(LISTING, "<html>listing</html>", 'listing')
+    assert archive._active_archive is None
+    assert page_archive.pages_written == 2
+
+    entries = list(archive.iter_index(str(tmp_path)))
+    assert [entry['codec'] for entry in entries] == ["zstd" if zstd else "zlib"] * 2
+    assert entries[0]['category'] == CATEGORY and 'category' not in entries[1]
+    assert read_page(str(tmp_path), entries[0]) == html
+    assert read_page(str(tmp_path), entries[1]) == "<html>listing</html>"
+
+
+def test_archive_page_without_an_active_archive_is_a_no_op(tmp_path):
+    archive_page(WINDE, "<html></html>", 'product')
+    assert list(archive.iter_index(str(tmp_path))) == []
+
+
+def test_latest_entries_keeps_the_newest_page_per_url(tmp_path):
+    with PageArchive(str(tmp_path)) as page_archive:
+        page_archive.store(WINDE, "old", 'product', fetched_at=100)
+        page_archive.store(WINDE, "new", 'product', fetched_at=200)
+        page_archive.store(LISTING, "listing", 'listing', fetched_at=150)
+
+    directory = str(tmp_path)
+    latest = {entry['url']: entry for entry in latest_entries(directory)}
+    assert read_page(directory, latest[WINDE]) == "new"
+    assert [entry['url'] for entry in latest_entries(directory, kind='listing')] == [LISTING]
+    assert [entry['url'] for entry in latest_entries(directory, since=160)] == [WINDE]
+    assert latest_entries(directory, since=300) == []
+
+
+def test_reextract_parses_archived_pages_offline(tmp_path, monkeypatch):
+    monkeypatch.setattr(categories, '_current_tree', None)
+    tree_file = tmp_path / "category_tree.json"
+    tree_file.write_text(json.dumps(CategoryTree([[{
+        'url': None, 'name': "Hebetechnik", 'groups': [{'url': CATEGORY, 'name': "Handseilwinden"}]}]],
+        fetched_at=1).to_dict()), encoding='utf-8')
+
+    directory = str(tmp_path / "archive")
+    with PageArchive(directory) as page_archive:
+        page_archive.store(WINDE, _product_page(1), 'product', category=CATEGORY)
+        page_archive.store("https://example.test/Kaputt-Typen", "<html></html>", 'product')
+
+    variants = reextract(directory, str(tmp_path / "output"), processes=1, chunk_size=1,
+                         tree_file=str(tree_file))
+    assert [v['product_serial_number'] for v in variants] == ["HW-1-250", "HW-1-500", "HW-1-750"]
+    assert {v['category_path'] for v in variants} == {"Hebetechnik > Handseilwinden"}
+    saved = json.loads((tmp_path / "output.json").read_text(encoding='utf-8'))
+    assert saved == variants
@@ -0,0 +1,95 @@
+import itertools
+import json
+
+import pytest
+
+import catalog_store
+import main
+from catalog_store import CatalogStore, parse_price
+
+
+CATEGORY = "https://example.test/15-Handseilwinden-Gruppe"
+PATH = "Hebetechnik > Handseilwinden"
+WINDE = "https://example.test/Handseilwinde-Typen"
+SEILWINDE = "https://example.test/Elektroseilwinde-Typen"
+
+
+class FakeTime:
+    """Stands in for the time module in catalog_store; every reading is one second later."""
+
+    def __init__(self):
+        self._clock = itertools.count(1000)
+
+    def time(self):
+        return float(next(self._clock))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(catalog_store, 'time', FakeTime())
+    return str(tmp_path / "catalog.db")
+
+
+def _variant(serial, price, name="Handseilwinde"):
+    return {'product_name': name, 'product_price': price, 'product_serial_number': serial}
+
+
+def test_parse_price():
+    assert parse_price("1.958,37 €") == 1958.37
+    assert parse_price("89,90 €") == 89.9
+    assert parse_price("") is None
+    assert parse_price("auf Anfrage") is None
+
+
+def test_rescrape_upserts_variants_and_drops_removed_ones(db):
+    with CatalogStore(db) as store:
+        store.add_category(CATEGORY, "Handseilwinden", PATH)
+        store.add_variants(WINDE, [_variant("HW-500", "89,90 €"), _variant("HW-900", "129,90 €")], CATEGORY)
+        store.add_variants(WINDE, [_variant("HW-500", "99,90 €")], CATEGORY)
+
+        assert store.export_rows() == [dict(_variant("HW-500", "99,90 €"), category_path=PATH)]
+        assert [row['price_value'] for row in store.find_by_serial("HW-500")] == [99.9]
+        # The removed variant stays in the catalog, but not in the export
+        assert len(store.find_by_serial("HW-900")) == 1
+
+
+def test_variants_without_a_category_export_their_products_category(db):
+    with CatalogStore(db) as store:
+        store.add_category(CATEGORY, "Handseilwinden", PATH)
+        store.add_products([WINDE], CATEGORY)
+        # Found again through the sitemaps, which do not know the category
+        store.add_products([WINDE])
+        store.add_variants(WINDE, [_variant("HW-500", "89,90 €")])
+
+        assert store.export_rows() == [dict(_variant("HW-500", "89,90 €"), category_path=PATH)]
+        assert store.export_rows(include_category=True)[0]['category_url'] == CATEGORY
+
+
+def test_partial_run_exports_everything_since_the_last_full_run(db, tmp_path):
+    with CatalogStore(db) as store:
+        store.add_variants(WINDE, [_variant("HW-500", "89,90 €")], CATEGORY)
+        store.add_variants(SEILWINDE, [_variant("ES-1", "1.958,37 €", "Elektroseilwinde")], CATEGORY)
+        store.finish_run(2)
+        full_run = store.run_started
+
+    # A partial run refreshes one product only
+    with CatalogStore(db) as store:
+        store.add_variants(WINDE, [_variant("HW-500", "99,90 €")], CATEGORY)
+        assert [row['product_serial_number'] for row in store.export_rows()] == ["HW-500"]
+
+        main.save_outputs([], str(tmp_path / "output"), store=store, partial=True)
+        store.finish_run(1, partial=True)
+        assert store.latest_run(full_only=True)[0] == full_run
+        assert store.latest_run()[0] == store.run_started
+
+    exported = json.loads((tmp_path / "output.json").read_text(encoding='utf-8'))
+    assert sorted((row['product_serial_number'], row['product_price']) for row in exported) == [
+        ("ES-1", "1.958,37 €"), ("HW-500", "99,90 €")]
+
+    # The next full run exports only what it saw itself
+    with CatalogStore(db) as store:
+        store.add_variants(SEILWINDE, [_variant("ES-1", "1.958,37 €", "Elektroseilwinde")], CATEGORY)
+        main.save_outputs([], str(tmp_path / "output"), store=store)
+        store.finish_run(1)
+    exported = json.loads((tmp_path / "output.json").read_text(encoding='utf-8'))
+    assert [row['product_serial_number'] for row in exported] == ["ES-1"]
@@ -0,0 +1,79 @@
+import pytest
+
+import categories
+import main
+from catalog_store import CatalogStore
+from categories import CategoryTree, set_category_tree
+from resilience import FailureTracker, FetchTimeoutError
+from revisit import RevisitScheduler
+
+
+HANDSEILWINDEN = "https://example.test/15-Handseilwinden-Gruppe"
+KETTENZUEGE = "https://example.test/21-Handkettenzuege-Gruppe"
+TREE = CategoryTree([[{
+    'url': "https://example.test/3-Hebetechnik-Hauptgruppe",
+    'name': "Hebetechnik",
+    'groups': [{'url': HANDSEILWINDEN, 'name': "Handseilwinden"},
+               {'url': KETTENZUEGE, 'name': "Handkettenzüge"}],
+}]])
+WINDE = "https://example.test/Handseilwinde-Typen"
+KETTENZUG = "https://example.test/Handkettenzug-Typen"
+
+
+@pytest.fixture
+def site(monkeypatch):
+    """Product pages that fail once with a timeout for the URLs in `flaky`."""
+    monkeypatch.setattr(categories, '_current_tree', None)
+    set_category_tree(TREE.to_dict())
+    flaky = set()
+
+    def scrape_product_variants(link, category_url=None):
+        if link in flaky:
+            flaky.discard(link)
+            raise FetchTimeoutError(f"Timed out: {link}")
+        return [{'product_name': link.rsplit('/', 1)[-1], 'product_price': '10 €', 'product_serial_number': link}]
+
+    monkeypatch.setattr(main, 'scrape_product_variants', scrape_product_variants)
+    # One attempt per call; the deferred retry is the second one
+    monkeypatch.setattr(main, 'retry_call', lambda func, url, *args: func(url, *args))
+    return flaky
+
+
+def _paths(variants):
+    return {v['product_serial_number']: v['category_path'] for v in variants}
+
+
+def test_deferred_product_retry_keeps_its_category(site):
+    site.add(WINDE)
+    failures = FailureTracker()
+    variants = main.scrape_products([WINDE, KETTENZUG], 2, failures,
+                                    link_categories={WINDE: HANDSEILWINDEN, KETTENZUG: KETTENZUEGE})
+    assert _paths(variants) == {KETTENZUG: "Hebetechnik > Handkettenzüge"}
+    assert failures.failures()[0]['context'] == {'category': HANDSEILWINDEN}
+
+    recovered = main.retry_deferred_failures(failures, {WINDE, KETTENZUG}, 2)
+    assert _paths(recovered) == {WINDE: "Hebetechnik > Handseilwinden"}
+    assert len(failures) == 0
+
+
+def test_sitemap_and_cached_products_take_their_category_from_the_catalog(site, tmp_path):
+    scheduler = RevisitScheduler(str(tmp_path / "revisits.json"))
+    scheduler.record(KETTENZUG, [{'product_name': "Handkettenzug", 'product_price': '10 €',
+                                  'product_serial_number': KETTENZUG}])
+
+    with CatalogStore(str(tmp_path / "catalog.db")) as store:
+        # An earlier listing crawl; the categories themselves were never recorded
+        store.add_products([WINDE], HANDSEILWINDEN)
+        store.add_products([KETTENZUG], KETTENZUEGE)
+        link_categories = store.product_categories([WINDE, KETTENZUG, "https://example.test/Neu-Typen"])
+        assert link_categories == {WINDE: HANDSEILWINDEN, KETTENZUG: KETTENZUEGE}
+
+        # Only the Handseilwinde is due; the Handkettenzug comes from the revisit history
+        variants = main.scrape_new_products([WINDE, KETTENZUG], set(), 2, scheduler=scheduler, store=store,
+                                            link_categories=link_categories)
+        exported = store.export_rows()
+        categories = dict(store.conn.execute("SELECT url, path FROM categories"))
+
+    assert _paths(variants) == {WINDE: "Hebetechnik > Handseilwinden", KETTENZUG: "Hebetechnik > Handkettenzüge"}
+    assert _paths(exported) == {WINDE: "Hebetechnik > Handseilwinden"}
+    assert categories == {HANDSEILWINDEN: "Hebetechnik > Handseilwinden", KETTENZUEGE: "Hebetechnik > Handkettenzüge"}
@@ -0,0 +1,176 @@
+import time
+
+import pytest
+
+import categories
+import chunked_job
+import main
+from categories import CategoryTree
+from chunked_job import FileStateStore, TimeBudget, process_work_item, start_job
+
+
+CATEGORY = "https://example.test/Handseilwinden-Gruppe"
+TREE = CategoryTree([[{'url': "https://example.test/Hebetechnik-Hauptgruppe", 'name': "Hebetechnik",
+                       'groups': [{'url': CATEGORY, 'name': "Handseilwinden"}]}]])
+PRODUCTS = [f"https://example.test/Produkt-{idx}-Typen" for idx in range(10)]
+
+
+class FakeClock:
+    """Stands in for the time module in chunked_job; scraping advances it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.strftime = time.strftime
+        self.time = time.time
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(chunked_job, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def site(monkeypatch, clock):
+    """Stubs the listing and product fetches; every product batch takes 15 s."""
+    scraped = []
+
+    def fetch_page_links(url, headers):
+        return (PRODUCTS, []) if url == CATEGORY else ([], [])
+
+    def get_product_variants(link, failures=None, category_url=None):
+        scraped.append(link)
+        return [{'product_name': link.rsplit('/', 1)[-1], 'product_price': '10 €', 'product_serial_number': 'S1'}]
+
+    def scrape_products(*args, **kwargs):
+        clock.now += 15
+        return main.scrape_products(*args, **kwargs)
+
+    # Workers only know the tree from the job state
+    monkeypatch.setattr(categories, '_current_tree', None)
+    monkeypatch.setattr(chunked_job, 'get_category_tree', lambda: TREE)
+    monkeypatch.setattr(chunked_job, 'fetch_page_links', fetch_page_links)
+    monkeypatch.setattr(main, 'get_product_variants', get_product_variants)
+    monkeypatch.setattr(chunked_job, 'scrape_products', scrape_products)
+    monkeypatch.setattr(chunked_job, 'reap_orphaned_browsers', lambda: 0)
+    return scraped
+
+
+def _run_until_done(store, messages, budget_seconds=100, max_workers=2):
+    invocations = 0
+    while messages:
+        message = messages.pop(0)
+        messages.extend(process_work_item(store, message['job_id'], message['item_id'],
+                                          budget_seconds, max_workers))
+        invocations += 1
+    return invocations
+
+
+def _output(store, job_id):
+    return store.read_json(f"jobs/{job_id}/output.json")
+
+
+def test_file_state_store_round_trip(tmp_path):
+    store = FileStateStore(str(tmp_path))
+    assert store.read_json("jobs/a/item.json") is None
+
+    store.write_json("jobs/a/item.json", {'price': '1.958,37 €'})
+    store.write_json("jobs/a/other.json", [1, 2])
+    assert store.read_json("jobs/a/item.json") == {'price': '1.958,37 €'}
+    assert store.list("jobs/a") == ["jobs/a/item.json", "jobs/a/other.json"]
+    assert store.list("jobs/missing") == []
+
+    store.delete("jobs/a/item.json")
+    store.delete("jobs/a/item.json")
+    assert store.list("jobs/a/") == ["jobs/a/other.json"]
+    # Writes are renamed into place, so no temporary files are left behind
+    assert sorted(p.name for p in (tmp_path / "jobs" / "a").iterdir()) == ["other.json"]
+
+
+def test_time_budget_runs_first_unit_and_leaves_room_for_the_slowest(clock):
+    budget = TimeBudget(100, reserve=60)
+    clock.now = 90
+    assert not budget.should_stop()
+
+    clock.now = 0
+    budget.start_unit()
+    clock.now = 15
+    budget.end_unit()
+    assert not budget.should_stop()
+    assert budget.remaining() == 85
+
+    budget.start_unit()
+    clock.now = 30
+    budget.end_unit()
+    # 70 s left cannot fit the 60 s reserve plus another 15 s unit
+    assert budget.should_stop()
+
+
+def test_exhausted_budget_splits_work_into_follow_ups(tmp_path, site):
+    store = FileStateStore(str(tmp_path))
+    messages = start_job(store, [CATEGORY], batch_size=10)
+    job_id = messages[0]['job_id']
+
+    follow_ups = process_work_item(store, job_id, messages[0]['item_id'], 100, 2)
+    assert [m['item_id'] for m in follow_ups] == ["c0000-p0000"]
+
+    # Two 15 s batches of two links fit into 100 s with a 60 s reserve
+    follow_ups = process_work_item(store, job_id, "c0000-p0000", 100, 2)
+    assert follow_ups == [{'job_id': job_id, 'item_id': "c0000-p0000"}]
+    item = store.read_json(f"jobs/{job_id}/items/c0000-p0000.json")
+    assert item['product_links'] == PRODUCTS[4:]
+    assert item['scraped'] == 4
+    assert _output(store, job_id) is None
+
+    assert _run_until_done(store, follow_ups) == 2
+    output = _output(store, job_id)
+    assert sorted(v['product_name'] for v in output) == sorted(p.rsplit('/', 1)[-1] for p in PRODUCTS)
+    assert all(chunked_job.PAGE_KEY not in v for v in output)
+    assert {v['category_path'] for v in output} == {"Hebetechnik > Handseilwinden"}
+    assert store.list(f"jobs/{job_id}/items") == []
+
+
+def test_redelivered_message_does_not_duplicate_variants(tmp_path, site):
+    store = FileStateStore(str(tmp_path))
+    messages = start_job(store, [CATEGORY], batch_size=10)
+    job_id = messages[0]['job_id']
+    process_work_item(store, job_id, messages[0]['item_id'], 100, 2)
+
+    # The invocation wrote its results, then died before moving the cursor
+    item_path = f"jobs/{job_id}/items/c0000-p0000.json"
+    cursor = store.read_json(item_path)
+    process_work_item(store, job_id, "c0000-p0000", 100, 2)
+    store.write_json(item_path, cursor)
+
+    # The queue delivers the message again, and once more after the item finished
+    message = {'job_id': job_id, 'item_id': "c0000-p0000"}
+    _run_until_done(store, [message, dict(message)])
+    assert process_work_item(store, job_id, "c0000-p0000", 100, 2) == []
+
+    output = _output(store, job_id)
+    assert len(site) > len(PRODUCTS)
+    assert len(output) == len(PRODUCTS)
+    assert len({v['product_name'] for v in output}) == len(PRODUCTS)
+
+
+def test_overlapping_chunks_of_diverging_deliveries_merge_by_page(tmp_path, site, clock):
+    store = FileStateStore(str(tmp_path))
+    messages = start_job(store, [CATEGORY], batch_size=10)
+    job_id = messages[0]['job_id']
+    process_work_item(store, job_id, messages[0]['item_id'], 100, 2)
+
+    # Two copies of the same message run with different budgets left
+    item_path = f"jobs/{job_id}/items/c0000-p0000.json"
+    cursor = store.read_json(item_path)
+    process_work_item(store, job_id, "c0000-p0000", 100, 2)
+    store.write_json(item_path, cursor)
+    process_work_item(store, job_id, "c0000-p0000", 80, 3)
+
+    _run_until_done(store, [{'job_id': job_id, 'item_id': "c0000-p0000"}])
+    assert len(store.list(f"jobs/{job_id}/results")) > 3
+    output = _output(store, job_id)
+    assert sorted(v['product_name'] for v in output) == sorted(p.rsplit('/', 1)[-1] for p in PRODUCTS)
@@ -0,0 +1,57 @@
+import json
+
+import main
+from deadline import CrawlCoverage, RunDeadline, dispatch_allowed, time_left
+from profiling import record_page
+
+
+CATEGORY = "https://example.test/15-Handseilwinden-Gruppe"
+LINKS = [f"https://example.test/Winde-{n}-Typen" for n in range(4)]
+
+
+def test_slowest_page_and_reserve_stop_dispatch(tmp_path):
+    assert dispatch_allowed() and time_left() is None
+    with RunDeadline(100, CrawlCoverage(str(tmp_path / "coverage.json")), reserve_seconds=60):
+        assert dispatch_allowed()
+        assert 39 < time_left() <= 40
+        # The next page could take as long as this one, which no longer fits before the reserve
+        record_page(LINKS[0], {'goto': 30, 'wait': 15})
+        assert not dispatch_allowed()
+        assert time_left() == 0
+    assert dispatch_allowed() and time_left() is None
+
+
+def test_expired_deadline_defers_the_remaining_products(tmp_path, monkeypatch):
+    rendered = []
+
+    def get_product_variants(link, failures=None, category_url=None):
+        rendered.append(link)
+        # The first page is slow enough to use up the budget
+        record_page(link, {'goto': 50})
+        return [{'product_name': link, 'product_price': '10 €', 'product_serial_number': link}]
+
+    monkeypatch.setattr(main, 'get_product_variants', get_product_variants)
+    coverage = CrawlCoverage(str(tmp_path / "coverage.json"))
+    with RunDeadline(100, coverage, reserve_seconds=60):
+        variants = main.scrape_products(LINKS, max_workers=1, category_url=CATEGORY)
+
+    assert rendered == LINKS[:1]
+    assert [v['product_serial_number'] for v in variants] == LINKS[:1]
+    assert coverage.uncovered_products == [{'url': link, 'category': CATEGORY} for link in LINKS[1:]]
+    assert not coverage.complete
+
+    coverage.save()
+    state = json.loads((tmp_path / "coverage.json").read_text(encoding='utf-8'))
+    assert [entry['url'] for entry in state['uncovered_products']] == LINKS[1:]
+    # The next run takes up the deferred products first
+    assert CrawlCoverage(str(tmp_path / "coverage.json")).pending_products() == {CATEGORY: LINKS[1:]}
+
+
+def test_uncovered_and_stalest_categories_go_first(tmp_path):
+    fresh, stale, cut_off = (f"https://example.test/{n}-Gruppe" for n in ("1-Frisch", "2-Alt", "3-Offen"))
+    coverage = CrawlCoverage(str(tmp_path / "coverage.json"))
+    coverage.last_crawled = {fresh: 2000, stale: 1000}
+    coverage.defer('category', cut_off)
+    coverage.save()
+
+    assert CrawlCoverage(str(tmp_path / "coverage.json")).prioritize([fresh, stale, cut_off]) == [cut_off, stale, fresh]
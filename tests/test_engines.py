@@ -0,0 +1,154 @@
+import threading
+
+import pytest
+
+import engines
+import main
+from benchmark import fixture_server
+from engines import HttpEngine, PlaywrightEngine, SeleniumEngine, get_stage_engine, use_engines
+from resilience import HTTPStatusError
+
+
+@pytest.fixture(scope="module")
+def site():
+    with fixture_server(pages=2, products_per_page=3, variants_per_product=2) as served:
+        yield served
+
+
+def test_every_listed_product_has_a_fixture_page(site):
+    base_url, pages = site
+    with HttpEngine() as engine:
+        for listing in [page for page in pages if page.endswith('-Gruppe')]:
+            links, _ = main.parse_listing_page(engine.fetch(base_url + listing, 'listing'), base_url + listing)
+            # Plain HTTP only sees the first, server-rendered batch
+            assert len(links) == 3
+            for link in links:
+                assert len(main.parse_product_page(engine.fetch(link, 'product'))) == 2
+    assert len([page for page in pages if page.endswith('-Typen')]) == 2 * 2 * 3
+
+
+def test_error_status_raises(site):
+    base_url, _ = site
+    with HttpEngine() as engine, pytest.raises(HTTPStatusError) as excinfo:
+        engine.fetch(base_url + "Fehlt-Typen", 'product')
+    assert excinfo.value.status == 404
+
+
+def test_use_engines_swaps_the_stage_engines_for_the_block(site, monkeypatch):
+    base_url, pages = site
+    default = object()
+    monkeypatch.setattr(engines, '_stage_engines', {'listing': default, 'product': default})
+    product_url = base_url + next(page for page in pages if page.endswith('-Typen'))
+
+    with use_engines(listing='http', product='http') as selected:
+        # Both stages share one engine and its pool
+        assert selected['listing'] is selected['product'] is get_stage_engine('product')
+        seen_headers = []
+        fetch = selected['product']._fetch
+        monkeypatch.setattr(selected['product'], '_fetch',
+                            lambda url, kind, headers, timings: seen_headers.append(headers)
+                            or fetch(url, kind, headers, timings))
+
+        variants = main.scrape_product_variants(product_url)
+        assert [v['product_serial_number'] for v in variants] == ["HW-0-0-250", "HW-0-0-500"]
+        assert seen_headers == [main.PRODUCT_HEADERS]
+        assert selected['product'].pages == 1
+    assert get_stage_engine('listing') is get_stage_engine('product') is default
+
+
+class FakeDriver:
+    def __init__(self, user_agent):
+        self.user_agent = user_agent
+        self.page_source = "<html></html>"
+        self.quit_called = False
+
+    def set_page_load_timeout(self, timeout):
+        pass
+
+    def get(self, url):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_selenium_reuses_drivers_only_for_their_user_agent(monkeypatch):
+    engine = SeleniumEngine(settle_seconds=0, max_drivers=2)
+    started = []
+
+    def new_driver(user_agent):
+        driver = FakeDriver(user_agent)
+        started.append(driver)
+        with engine._lock:
+            engine._drivers.append(driver)
+        return driver
+
+    monkeypatch.setattr(engine, '_new_driver', new_driver)
+    product = {"User-Agent": "Product/1.0"}
+    other = {"User-Agent": "Other/1.0"}
+
+    engine.fetch("https://example.test/a-Typen", 'product', product)
+    engine.fetch("https://example.test/b-Typen", 'product', product)
+    assert [d.user_agent for d in started] == ["Product/1.0"]
+
+    engine.fetch("https://example.test/c-Typen", 'product', other)
+    engine.fetch("https://example.test/d-Typen", 'product')
+    # The pool is full, so the idle driver of another user agent made room
+    assert [d.user_agent for d in started] == ["Product/1.0", "Other/1.0", engines.USER_AGENT]
+    assert started[0].quit_called and not started[2].quit_called
+    assert len(engine._drivers) == 2
+
+    engine.close()
+    assert all(d.quit_called for d in started)
+
+
+def test_playwright_startup_failure_reaches_every_caller(monkeypatch):
+    import playwright.sync_api
+
+    def broken():
+        raise RuntimeError("no driver")
+
+    monkeypatch.setattr(playwright.sync_api, 'sync_playwright', broken)
+    engine = PlaywrightEngine(max_browsers=2)
+    errors = []
+
+    def fetch():
+        try:
+            engine.fetch("https://example.test/a-Typen", 'product')
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=fetch) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert errors == ["no driver"] * 3
+    assert 1 <= len(engine._workers) <= 2
+
+    engine.close()
+    assert engine._workers == []
+
+
+def _chromium_available():
+    try:
+        from playwright.sync_api import sync_playwright
+        with sync_playwright() as p:
+            p.chromium.launch(headless=True).close()
+        return True
+    except Exception:
+        return False
+
+
+@pytest.mark.skipif(not _chromium_available(), reason="needs Playwright's Chromium")
+def test_playwright_keeps_one_browser_per_worker(site):
+    base_url, pages = site
+    products = [base_url + page for page in pages if page.endswith('-Typen')][:4]
+    with PlaywrightEngine(settle_seconds=0, max_browsers=1) as engine:
+        for url in products:
+            assert len(main.parse_product_page(engine.fetch(url, 'product'))) == 2
+        assert engine.launches == 1
+        listing = base_url + next(page for page in pages if page.endswith('-Gruppe'))
+        links, _ = main.parse_listing_page(engine.fetch(listing, 'listing'), listing)
+        # Scrolling loads the lazy batch
+        assert len(links) == 6
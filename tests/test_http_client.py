@@ -0,0 +1,84 @@
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = self.path.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        # /close answers on a connection that is not kept alive
+        if self.path == "/close":
+            self.send_header("Connection", "close")
+            self.close_connection = True
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server.server_port
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """A fresh shared session, DNS cache and statistics, with getaddrinfo calls counted."""
+    monkeypatch.setattr(http_client, '_session', None)
+    monkeypatch.setattr(http_client, '_pool_size', 10)
+    monkeypatch.setattr(http_client, '_dns_cache', {})
+    monkeypatch.setattr(http_client, 'stats', http_client.ConnectionStats())
+    lookups = []
+    getaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(host, port, *args, **kwargs):
+        lookups.append((host, port))
+        return getaddrinfo(host, port, *args, **kwargs)
+
+    monkeypatch.setattr(socket, 'getaddrinfo', counting_getaddrinfo)
+    yield lookups
+    if http_client._session is not None:
+        http_client._session.close()
+
+
+def test_new_connections_reuse_the_cached_lookup(server, client):
+    url = f"http://localhost:{server}/close"
+    assert http_client.fetch_text(url) == "/close"
+    assert http_client.fetch_text(url) == "/close"
+
+    summary = http_client.stats.summary()
+    assert (summary['requests'], summary['connections']) == (2, 2)
+    assert client.count(('localhost', server)) == 1
+
+
+def test_expired_lookup_is_repeated(server, client, monkeypatch):
+    monkeypatch.setattr(http_client, '_dns_ttl', 0.0)
+    url = f"http://localhost:{server}/close"
+    http_client.fetch_text(url)
+    http_client.fetch_text(url)
+    assert client.count(('localhost', server)) == 2
+
+
+def test_kept_alive_connections_are_reused(server, client):
+    bodies = [http_client.fetch_text(f"http://localhost:{server}/page-{idx}") for idx in range(3)]
+    assert bodies == ["/page-0", "/page-1", "/page-2"]
+
+    summary = http_client.stats.summary()
+    assert (summary['requests'], summary['connections'], summary['reused']) == (3, 1, 2)
+
@@ -0,0 +1,126 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+import categories
+import main
+from catalog_store import CatalogStore
+from categories import CategoryTree, get_category_tree
+from lookup_api import CatalogSource, JsonSource, LookupService
+
+
+HANDSEILWINDEN = "https://www.tomanro.de/15-Handseilwinden-Gruppe"
+KETTENZUEGE = "https://www.tomanro.de/21-Handkettenzuege-Gruppe"
+MENUS = [[{
+    'url': "https://www.tomanro.de/3-Hebetechnik-Hauptgruppe",
+    'name': "Hebetechnik",
+    'groups': [{'url': HANDSEILWINDEN, 'name': "Handseilwinden"},
+               {'url': KETTENZUEGE, 'name': "Handkettenzüge"}],
+}]]
+VARIANTS = {
+    HANDSEILWINDEN + "/Handseilwinde-500-Typen": [
+        {'product_name': "Handseilwinde 500 kg", 'product_price': "89,90 €", 'product_serial_number': "HW-500"},
+        {'product_name': "Handseilwinde 900 kg", 'product_price': "129,90 €", 'product_serial_number': "HW-900"},
+    ],
+    KETTENZUEGE + "/Handkettenzug-Typen": [
+        {'product_name': "Handkettenzug 1 t", 'product_price': "1.958,37 €", 'product_serial_number': "HK-1000"},
+    ],
+}
+
+
+@pytest.fixture
+def category_tree(tmp_path, monkeypatch):
+    monkeypatch.setattr(categories, '_current_tree', None)
+    tree_file = str(tmp_path / "category_tree.json")
+    with open(tree_file, 'w', encoding='utf-8') as f:
+        json.dump(CategoryTree(MENUS).to_dict(), f)
+    get_category_tree(tree_file)
+    return tree_file
+
+
+@pytest.fixture
+def scraped(monkeypatch, category_tree):
+    """Variants as scrape_products returns them for the two categories."""
+    monkeypatch.setattr(main, 'get_product_variants', lambda link, failures=None, category_url=None: VARIANTS[link])
+    rows = []
+    for category_url in (HANDSEILWINDEN, KETTENZUEGE):
+        links = [link for link in VARIANTS if link.startswith(category_url)]
+        rows.extend(main.scrape_products(links, 2, category_url=category_url))
+    return rows
+
+
+def _serials(rows):
+    return sorted(row['product_serial_number'] for row in rows)
+
+
+def test_category_lookup_over_saved_json_output(tmp_path, scraped, category_tree):
+    main.save_outputs(scraped, str(tmp_path / "output"))
+    service = LookupService(JsonSource(str(tmp_path / "output.json"), category_tree))
+    index = service.index
+
+    assert _serials(index.category("Handseilwinden")) == ["HW-500", "HW-900"]
+    assert _serials(index.category("hebetechnik > handkettenzüge")) == ["HK-1000"]
+    assert _serials(index.category("Hebetechnik")) == ["HK-1000", "HW-500", "HW-900"]
+    # URLs and slugs resolve through the category tree cache
+    assert _serials(index.category("15-Handseilwinden-Gruppe")) == ["HW-500", "HW-900"]
+    assert _serials(index.category(KETTENZUEGE + "/")) == ["HK-1000"]
+    assert index.category("Unbekannt") == []
+    assert index.serial("HK-1000")[0]['category_path'] == "Hebetechnik > Handkettenzüge"
+
+
+def test_category_lookup_without_category_tree(tmp_path, scraped):
+    main.save_outputs(scraped, str(tmp_path / "output"))
+    index = LookupService(JsonSource(str(tmp_path / "output.json"), tree_file=None)).index
+
+    assert _serials(index.category("Handseilwinden")) == ["HW-500", "HW-900"]
+    assert index.category("15-Handseilwinden-Gruppe") == []
+
+
+def test_catalog_source_reads_without_writing(tmp_path, category_tree):
+    db = str(tmp_path / "catalog.db")
+    writer = CatalogStore(db)
+    for category_url in (HANDSEILWINDEN, KETTENZUEGE):
+        writer.add_category(category_url, path=categories.category_path(category_url))
+        for link, variants in VARIANTS.items():
+            if link.startswith(category_url):
+                writer.add_variants(link, variants, category_url)
+    writer.finish_run(3)
+
+    # The scraper keeps its connection open while the service polls
+    source = CatalogSource(db)
+    service = LookupService(source)
+    assert _serials(service.index.category("15-Handseilwinden-Gruppe")) == ["HW-500", "HW-900"]
+    assert _serials(service.index.category("Hebetechnik")) == ["HK-1000", "HW-500", "HW-900"]
+    assert not service.reload()
+    writer.close()
+
+
+def test_catalog_source_leaves_old_schema_alone(tmp_path):
+    db = str(tmp_path / "catalog.db")
+    with CatalogStore(db) as store:
+        store.add_variants(KETTENZUEGE + "/Handkettenzug-Typen", VARIANTS[KETTENZUEGE + "/Handkettenzug-Typen"],
+                           KETTENZUEGE)
+        store.finish_run(1)
+    # A catalog from before partial runs existed
+    with sqlite3.connect(db) as conn:
+        conn.execute("ALTER TABLE runs DROP COLUMN partial")
+    conn.close()
+    mtime = os.stat(db).st_mtime_ns
+
+    source = CatalogSource(db)
+    assert source.version() is not None
+    assert _serials(source.load()) == ["HK-1000"]
+    with sqlite3.connect(db) as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(runs)")}
+    conn.close()
+    assert 'partial' not in columns
+    assert os.stat(db).st_mtime_ns == mtime
+
+
+def test_catalog_source_before_the_schema_exists(tmp_path):
+    db = str(tmp_path / "catalog.db")
+    sqlite3.connect(db).close()
+    assert CatalogSource(db).version() is None
+    assert not os.path.exists(db + "-wal")
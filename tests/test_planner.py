@@ -0,0 +1,102 @@
+import json
+
+import pytest
+
+import http_client
+import planner
+from planner import CrawlPlanner, estimate_listing_pages
+from profiling import record_page
+
+
+def _listing(pages, products=20, current=1):
+    links = ''.join(f'<a href="/Produkt-{idx}-Typen">Produkt</a>' for idx in range(products))
+    pagination = ''.join(f'<a href="?seite={page}">{page}</a>' for page in pages if page != current)
+    return f'<html><body>{links}<div class="floatright">{pagination}</div></body></html>'
+
+
+CATEGORIES = {
+    "https://example.test/1-Seilwinden-Gruppe": _listing([1, 2, 3]),
+    # The pagination only shows the pages around the current one
+    "https://example.test/2-Kettenzuege-Gruppe": _listing([1, 2, 3, 10]),
+    "https://example.test/3-Zubehoer-Gruppe": _listing([], products=5),
+}
+
+
+@pytest.fixture
+def site(monkeypatch):
+    monkeypatch.setattr(planner.http_client, 'fetch_text', lambda url: CATEGORIES[url])
+
+
+def test_estimate_listing_pages():
+    url = "https://example.test/2-Kettenzuege-Gruppe"
+    assert estimate_listing_pages(CATEGORIES[url], url) == (10, 20)
+    assert estimate_listing_pages(_listing([], products=5), url) == (1, 5)
+
+
+def test_plan_without_history_uses_default_latencies(site, tmp_path):
+    plan = CrawlPlanner(str(tmp_path / "history.json")).make_plan(list(CATEGORIES), max_workers=4,
+                                                                   batch_seconds=90)
+    assert (plan.categories, plan.listing_pages) == (3, 14)
+    # No history yet: products per page from the static first pages (45 / 3)
+    assert plan.products == 14 * 15 == plan.product_pages
+    assert plan.workers == 4
+    assert plan.projected_seconds == 14 * 25.0 + 210 * 9.0 / 4
+    assert plan.product_batch_size == int(90 * 4 / 9.0)
+
+
+def test_target_chooses_the_worker_count(site, tmp_path):
+    history_file = tmp_path / "history.json"
+    history_file.write_text(json.dumps({'latencies': {'listing': 10.0, 'product': 6.0},
+                                        'products_per_listing_page': 30, 'render_ratio': 0.5}))
+    crawl_planner = CrawlPlanner(str(history_file))
+
+    plan = crawl_planner.make_plan(list(CATEGORIES), target_minutes=10)
+    # 14 listing pages take 140 s; 210 of 420 products are rendered in the remaining 460 s
+    assert (plan.products, plan.product_pages) == (420, 210)
+    assert plan.workers == 3 and plan.meets_target
+
+    plan = crawl_planner.make_plan(list(CATEGORIES), target_minutes=2)
+    assert plan.workers == planner.MAX_WORKERS_LIMIT and not plan.meets_target
+
+
+def test_finish_reports_actual_vs_plan_and_updates_the_history(site, tmp_path, capsys):
+    crawl_planner = CrawlPlanner(str(tmp_path / "history.json"))
+    crawl_planner.make_plan(list(CATEGORIES))
+    crawl_planner.start()
+    for idx in range(7):
+        record_page(f"https://example.test/1-Seilwinden-Gruppe?seite={idx}", {'goto': 20.0})
+    for idx in range(70):
+        record_page(f"https://example.test/Produkt-{idx}-Typen", {'goto': 4.0, 'wait': 1.0})
+    crawl_planner.finish(140)
+
+    report = capsys.readouterr().out
+    # Half of the 14 planned listing pages, a third of the 210 planned product pages
+    assert "listing pages" in report and "14 -> 7        (-50%)" in report
+    assert "210 -> 70       (-67%)" in report
+
+    history = json.loads((tmp_path / "history.json").read_text())
+    assert history['latencies'] == {'listing': 20.0, 'product': 5.0}
+    assert history['products_per_listing_page'] == 20.0
+    assert history['render_ratio'] == 0.5
+
+    # The next plan starts from the observed run
+    plan = CrawlPlanner(str(tmp_path / "history.json")).make_plan(list(CATEGORIES))
+    assert plan.latencies == {'listing': 20.0, 'product': 5.0}
+    assert (plan.products, plan.product_pages) == (280, 140)
+
+
+def test_pool_grows_on_the_existing_session(monkeypatch):
+    monkeypatch.setattr(http_client, '_session', None)
+    monkeypatch.setattr(http_client, '_pool_size', 10)
+    session = http_client.get_session()
+    adapter = session.adapters["https://"]
+
+    http_client.configure(4)
+    assert session.adapters["https://"] is adapter
+
+    http_client.configure(16)
+    assert http_client.get_session() is session
+    assert session.adapters["https://"] is not adapter
+    assert session.adapters["https://"]._pool_maxsize == 16
+    assert session.adapters["http://"] is session.adapters["https://"]
+    session.close()
@@ -0,0 +1,57 @@
+import pandas as pd
+
+from benchmark import synthetic_variants, write_synthetic_fixtures
+from catalog_store import parse_price
+from main import clean_product_data, dedupe_by_serial, extract_product_variants, parse_product_page
+from postprocess import clean_variants, parse_prices
+
+
+def _page_by_page(variants):
+    pages = {}
+    for variant in variants:
+        pages.setdefault(variant['_page'], []).append(variant)
+    return [cleaned for page in pages.values() for cleaned in clean_product_data(dedupe_by_serial(page))]
+
+
+def test_batched_cleaning_matches_page_by_page_on_synthetic_variants():
+    variants = synthetic_variants(5000)
+    expected = _page_by_page(variants)
+    # Repeated serials and doubled words were dropped
+    assert len(expected) < len(variants)
+    assert clean_variants(variants, page_column='_page') == expected
+
+
+def test_batched_cleaning_matches_parse_product_page_on_fixture_pages(tmp_path):
+    write_synthetic_fixtures(str(tmp_path), pages=2, products_per_page=2, variants_per_product=3)
+    raw, expected = [], []
+    for page in sorted(tmp_path.glob("*-Typen.html")):
+        html = page.read_text(encoding='utf-8')
+        raw.extend(dict(variant, _page=page.name) for variant in extract_product_variants(html))
+        expected.extend(parse_product_page(html))
+    assert len(expected) == 2 * 4 * 3
+    assert clean_variants(raw, page_column='_page', drop_page_column=True) == expected
+
+
+def test_serials_repeat_only_within_a_page():
+    variants = [
+        {'_page': 1, 'product_name': "Seilwinde Seilwinde 500 kg", 'product_price': "ab 1.958,37€ exkl. MwSt.",
+         'product_serial_number': "SW-500"},
+        {'_page': 1, 'product_name': "Seilwinde 500 kg", 'product_price': "1.958,37 €",
+         'product_serial_number': "SW-500"},
+        {'_page': 1, 'product_name': " Seilwinde ", 'product_price': "", 'product_serial_number': ""},
+        {'_page': 1, 'product_name': " Seilwinde ", 'product_price': "", 'product_serial_number': ""},
+        {'_page': 2, 'product_name': "Seilwinde 500 kg", 'product_price': "99€", 'product_serial_number': "SW-500"},
+    ]
+    cleaned = clean_variants(variants, page_column='_page', numeric_prices=True)
+    assert [(v['_page'], v['product_name'], v['product_price'], v['price_value']) for v in cleaned] == [
+        (1, "Seilwinde 500 kg", "1958,37 €", 1958.37),
+        (1, "Seilwinde", "", None),
+        (1, "Seilwinde", "", None),
+        (2, "Seilwinde 500 kg", "99 €", 99.0),
+    ]
+
+
+def test_parse_prices_matches_parse_price():
+    prices = ["1958,37 €", "99 €", "", "€", "1,2,3 €", "12", "٣,٥ €"]
+    values = parse_prices(pd.Series(prices))
+    assert [None if pd.isna(value) else value for value in values] == [parse_price(price) for price in prices]
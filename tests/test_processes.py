@@ -0,0 +1,66 @@
+import os
+import shutil
+import subprocess
+import time
+
+import pytest
+
+import processes
+from processes import OWNER_ENV, orphaned_browsers, owner_marker, owner_of, process_table, start_time, terminate
+
+
+pytestmark = pytest.mark.skipif(not processes.supported(), reason="needs /proc")
+
+
+@pytest.fixture
+def detached_browsers(tmp_path):
+    """Start "chrome" processes that are reparented away from the test, like a crashed run's browsers."""
+    chrome = tmp_path / "chrome"
+    os.symlink(shutil.which("sleep"), chrome)
+    pid_file = tmp_path / "pids"
+    started = []
+
+    def start(owner=None):
+        env = dict(os.environ)
+        env.pop(OWNER_ENV, None)
+        if owner is not None:
+            env[OWNER_ENV] = owner
+        # The shell exits at once, so the sleeping "chrome" loses its parent
+        subprocess.run(["sh", "-c", f'"{chrome}" 60 & echo $! > "{pid_file}"'], env=env, check=True)
+        pid = int(pid_file.read_text())
+        started.append(pid)
+        return pid
+
+    yield start
+    terminate(started, timeout=1)
+
+
+def _dead_pid():
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+def test_only_browsers_of_gone_scrapers_are_orphaned(detached_browsers):
+    other_run = subprocess.Popen(["sleep", "60"])
+    try:
+        crashed = detached_browsers(owner=owner_marker(_dead_pid()))
+        # Reparented to init after a driver crash, but this scraper is still running
+        own_crashed = detached_browsers(owner=owner_marker())
+        desktop = detached_browsers()
+        crash_handler = detached_browsers(owner=owner_marker(other_run.pid))
+        # The pid now belongs to another process than the scraper that launched the browser
+        reused_pid = detached_browsers(owner=f"{other_run.pid}:{start_time(other_run.pid) - 1}")
+        legacy = detached_browsers(owner=str(other_run.pid))
+        time.sleep(0.2)
+        table = process_table()
+        assert {crashed, own_crashed, desktop, crash_handler, reused_pid, legacy} <= set(table)
+        assert owner_of(crash_handler) == (other_run.pid, start_time(other_run.pid))
+
+        orphans = set(orphaned_browsers(table))
+        assert {crashed, reused_pid} <= orphans
+        # Neither a browser the scraper did not launch, nor one of a scraper still running
+        assert not {own_crashed, desktop, crash_handler, legacy} & orphans
+    finally:
+        other_run.kill()
+        other_run.wait()
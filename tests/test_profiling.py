@@ -0,0 +1,66 @@
+import json
+import threading
+import time
+
+from profiling import RunProfiler, get_active_profiler, profiled, record_page
+
+
+@profiled("busy_stage")
+def _busy(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(200))
+
+
+def test_sampling_mode_writes_folded_stacks_per_stage(tmp_path):
+    with RunProfiler(str(tmp_path), mode='sampling', sample_interval=0.001) as profiler:
+        assert get_active_profiler() is profiler
+        threads = [threading.Thread(target=_busy, args=(0.2,)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    assert get_active_profiler() is None
+
+    lines = (tmp_path / "busy_stage.folded").read_text(encoding='utf-8').splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    # Collapsed stacks run from the thread's entry point down to the leaf
+    assert any("_busy (test_profiling.py:" in line for line in lines)
+    assert stack.split(";")[0].startswith("_bootstrap")
+
+    summary = json.loads((tmp_path / "summary.json").read_text(encoding='utf-8'))
+    assert summary['mode'] == 'sampling'
+    assert summary['stages']['busy_stage']['calls'] == 2
+
+
+def test_slow_pages_are_captured_with_their_html(tmp_path):
+    with RunProfiler(str(tmp_path), mode=None, slow_page_threshold=1.0):
+        record_page("https://example.test/fast-Typen", {'goto': 0.2})
+        record_page("https://example.test/slow-Typen", {'goto': 0.8, 'wait': 0.5}, html="<html></html>")
+
+    slow_pages = sorted(path.name for path in (tmp_path / "slow_pages").iterdir())
+    assert slow_pages == ["000002_example.test_slow-Typen.html", "000002_example.test_slow-Typen.json"]
+    summary = json.loads((tmp_path / "summary.json").read_text(encoding='utf-8'))
+    assert (summary['pages_seen'], summary['slow_pages']) == (2, 1)
+
+
+def test_profiled_is_a_plain_call_without_a_profiler():
+    assert get_active_profiler() is None
+    _busy(0)
+
+
+def test_deterministic_mode_times_every_call_of_concurrent_stages(tmp_path):
+    with RunProfiler(str(tmp_path), mode='deterministic'):
+        threads = [threading.Thread(target=_busy, args=(0.05,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    summary = json.loads((tmp_path / "summary.json").read_text(encoding='utf-8'))
+    # Calls that could not get their own cProfile (Python 3.12+) are still timed
+    assert summary['stages']['busy_stage']['calls'] == 3
+    assert summary['unprofiled_calls'] < 3
+    assert (tmp_path / "busy_stage.prof").exists()
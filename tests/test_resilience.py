@@ -0,0 +1,132 @@
+import threading
+import time
+
+import pytest
+
+import main
+import resilience
+from deadline import CrawlCoverage, RunDeadline
+from resilience import CircuitBreaker, CircuitOpenError, FailureTracker, FetchTimeoutError, retry_call
+
+
+HOST = "shop.example.test"
+URL = f"https://{HOST}/Produkt-Typen"
+
+
+def _open_breaker(cooldown=0.05):
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=cooldown)
+    breaker.record_failure(HOST)
+    assert breaker.allow(HOST)
+    breaker.record_failure(HOST)
+    return breaker
+
+
+def test_breaker_opens_and_admits_a_single_trial_after_the_cooldown():
+    breaker = _open_breaker()
+    assert not breaker.allow(HOST)
+    assert breaker.time_until_retry(HOST) > 0
+
+    time.sleep(0.06)
+    assert breaker.allow(HOST)
+    assert breaker.trial_in_flight(HOST)
+    assert not breaker.allow(HOST)
+
+    # A failed trial opens the circuit for another cooldown
+    breaker.record_failure(HOST)
+    assert not breaker.allow(HOST)
+    time.sleep(0.06)
+    assert breaker.allow(HOST)
+    breaker.record_success(HOST)
+    assert breaker.allow(HOST) and breaker.allow(HOST)
+    assert breaker.time_until_retry(HOST) == 0
+
+
+def test_callers_waiting_for_the_trial_follow_its_outcome():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow(HOST)
+
+    admitted = []
+    waiter = threading.Thread(target=lambda: admitted.append(breaker.allow(HOST, timeout=5)))
+    waiter.start()
+    time.sleep(0.05)
+    assert waiter.is_alive()
+    breaker.record_success(HOST)
+    waiter.join()
+    assert admitted == [True]
+
+    breaker = _open_breaker()
+    time.sleep(0.06)
+    assert breaker.allow(HOST)
+    waiter = threading.Thread(target=lambda: admitted.append(breaker.allow(HOST, timeout=5)))
+    waiter.start()
+    breaker.record_failure(HOST)
+    waiter.join()
+    assert admitted == [True, False]
+
+
+def test_retry_call_waits_for_the_trial_instead_of_failing_fast():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+
+    def fetch(url):
+        time.sleep(0.1)
+        return url
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(retry_call(fetch, URL, breaker=breaker)))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [URL] * 4
+
+
+def test_interrupted_trial_does_not_block_the_host():
+    breaker = _open_breaker()
+    time.sleep(0.06)
+
+    def interrupted(url):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        retry_call(interrupted, URL, breaker=breaker)
+    assert not breaker.trial_in_flight(HOST)
+    assert retry_call(lambda url: "ok", URL, breaker=breaker) == "ok"
+
+
+def test_backoff_stops_at_the_run_deadline(tmp_path):
+    calls = []
+
+    def timing_out(url):
+        calls.append(url)
+        raise TimeoutError("read timed out")
+
+    coverage = CrawlCoverage(str(tmp_path / "coverage.json"))
+    started = time.monotonic()
+    with RunDeadline(0.3, coverage, reserve_seconds=0.1):
+        with pytest.raises(FetchTimeoutError) as excinfo:
+            retry_call(timing_out, URL, retries=3, base_delay=60, breaker=CircuitBreaker())
+    assert time.monotonic() - started < 1
+    assert excinfo.value.retryable
+    assert len(calls) == 1
+
+
+def test_deferred_products_are_all_retried_after_the_breaker_cools_down(monkeypatch):
+    breaker = _open_breaker(cooldown=0.1)
+    monkeypatch.setattr(resilience, 'default_breaker', breaker)
+
+    def scrape_product_variants(link, category_url=None):
+        time.sleep(0.05)
+        return [{'product_name': link, 'product_price': '10 €', 'product_serial_number': link}]
+
+    monkeypatch.setattr(main, 'scrape_product_variants', scrape_product_variants)
+    links = [f"https://{HOST}/Produkt-{idx}-Typen" for idx in range(6)]
+    failures = FailureTracker()
+    for link in links:
+        failures.record(link, 'product', CircuitOpenError(f"Circuit open for {HOST}"))
+
+    recovered = main.retry_deferred_failures(failures, set(links), max_workers=4)
+    assert sorted(v['product_serial_number'] for v in recovered) == links
+    assert len(failures) == 0
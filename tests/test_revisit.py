@@ -0,0 +1,107 @@
+from revisit import DAY, RevisitScheduler
+
+
+URL = "https://example.test/Handseilwinde-Typen"
+HOUR = 60 * 60
+
+
+def _variants(price):
+    return [{'product_name': "Handseilwinde 500 kg", 'product_price': price, 'product_serial_number': "HW-500"}]
+
+
+def _scheduler(tmp_path, now, **kwargs):
+    scheduler = RevisitScheduler(str(tmp_path / "revisits.json"), **kwargs)
+    scheduler.now = now
+    return scheduler
+
+
+def _visit(tmp_path, now, price, **kwargs):
+    """One run that renders the product (if due) and saves the history; returns whether it was due."""
+    scheduler = _scheduler(tmp_path, now, **kwargs)
+    due = scheduler.is_due(URL)
+    if due:
+        scheduler.record(URL, _variants(price))
+        scheduler.save()
+    return due
+
+
+def test_unseen_products_are_due_and_recorded_products_wait(tmp_path):
+    assert _visit(tmp_path, 0, "10 €")
+    scheduler = _scheduler(tmp_path, 2 * HOUR)
+    assert not scheduler.is_due(URL)
+    due, cached = scheduler.split([URL, "https://example.test/Neu-Typen"])
+    assert due == ["https://example.test/Neu-Typen"]
+    assert cached == {URL: _variants("10 €")}
+    assert scheduler.skipped == 1
+
+    # A new product starts at the minimum interval (1 day, spread down by at most a quarter)
+    assert _scheduler(tmp_path, DAY).is_due(URL)
+    assert _scheduler(tmp_path, 2 * HOUR, full_sweep=True).is_due(URL)
+
+
+def test_interval_doubles_while_unchanged_and_halves_on_a_change(tmp_path):
+    _visit(tmp_path, 0, "10 €")
+    now = 0
+    for expected in (2, 4, 7, 7):
+        now += 7 * DAY
+        assert _visit(tmp_path, now, "10 €")
+        assert _scheduler(tmp_path, now).history[URL]['interval'] == expected * DAY
+
+    now += 7 * DAY
+    _visit(tmp_path, now, "12 €")
+    entry = _scheduler(tmp_path, now).history[URL]
+    assert entry['interval'] == 3.5 * DAY
+    assert (entry['changes'], entry['last_change']) == (1, now)
+
+
+def test_stable_product_waits_for_its_interval(tmp_path):
+    _visit(tmp_path, 0, "10 €")
+    _visit(tmp_path, DAY, "10 €")  # interval now 2 days
+    scheduler = _scheduler(tmp_path, DAY)
+    interval = scheduler.interval_for(URL)
+    assert 1.5 * DAY <= interval <= 2 * DAY
+
+    assert not _scheduler(tmp_path, DAY + interval - 2 * HOUR).is_due(URL)
+    assert _scheduler(tmp_path, DAY + interval).is_due(URL)
+
+
+def test_sitemap_lastmod(tmp_path):
+    _visit(tmp_path, 10 * DAY, "10 €")
+    scheduler = _scheduler(tmp_path, 10 * DAY + 2 * HOUR)
+    # A newer lastmod makes the page due at once
+    assert scheduler.is_due(URL, lastmod=10 * DAY + HOUR)
+    # An older one says nothing about prices: the revisit interval still applies
+    assert not scheduler.is_due(URL, lastmod=5 * DAY)
+    assert _scheduler(tmp_path, 11 * DAY + HOUR).is_due(URL, lastmod=5 * DAY)
+
+
+def _card_scheduler(tmp_path, now, card):
+    scheduler = _scheduler(tmp_path, now)
+    scheduler.record_cards({URL: card})
+    return scheduler
+
+
+def test_unchanged_card_waits_no_longer_than_the_revisit_interval(tmp_path):
+    scheduler = _card_scheduler(tmp_path, 0, "Handseilwinde|10 €|1")
+    scheduler.record(URL, _variants("10 €"))
+    scheduler.save()
+
+    # A volatile product (1 day interval) is due after a day even though its card did not move
+    assert not _card_scheduler(tmp_path, 2 * HOUR, "Handseilwinde|10 €|1").is_due(URL)
+    scheduler = _card_scheduler(tmp_path, DAY, "Handseilwinde|10 €|1")
+    assert scheduler.is_due(URL)
+    assert scheduler.split([URL]) == ([URL], {})
+    # A changed card makes it due at once
+    assert _card_scheduler(tmp_path, 2 * HOUR, "Handseilwinde|12 €|1").is_due(URL)
+
+
+def test_unchanged_card_of_a_stable_product_waits_for_the_maximum_staleness(tmp_path):
+    scheduler = _card_scheduler(tmp_path, 0, "Handseilwinde|10 €|1")
+    scheduler.history[URL] = {'variants': _variants("10 €"), 'last_visit': 0, 'last_change': 0,
+                              'interval': 30 * DAY, 'visits': 9, 'changes': 0, 'card': "Handseilwinde|10 €|1"}
+    scheduler.save()
+
+    waiting = _card_scheduler(tmp_path, 5 * DAY, "Handseilwinde|10 €|1")
+    assert waiting.split([URL]) == ([], {URL: _variants("10 €")})
+    assert waiting.card_skipped == 1
+    assert _card_scheduler(tmp_path, 7 * DAY, "Handseilwinde|10 €|1").is_due(URL)
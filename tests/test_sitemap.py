@@ -0,0 +1,83 @@
+import functools
+import gzip
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from sitemap import covered_categories, discover_product_links, parse_lastmod
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sitemap")
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def sitemap_site(tmp_path):
+    """Serve the sitemap fixtures, with the index and the product sitemap gzipped like .xml.gz files."""
+    for name in os.listdir(FIXTURES):
+        source = os.path.join(FIXTURES, name)
+        if name in ("sitemap_index.xml", "sitemap_products.xml"):
+            with open(source, 'rb') as f, gzip.open(tmp_path / f"{name}.gz", 'wb') as out:
+                shutil.copyfileobj(f, out)
+        else:
+            shutil.copy(source, tmp_path / name)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), functools.partial(_QuietHandler, directory=str(tmp_path)))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}/"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_parse_lastmod():
+    assert parse_lastmod("2026-10-12T08:30:00Z") == datetime(2026, 10, 12, 8, 30, tzinfo=timezone.utc).timestamp()
+    assert parse_lastmod("2026-09-30") == datetime(2026, 9, 30, tzinfo=timezone.utc).timestamp()
+    assert parse_lastmod("") is None
+    assert parse_lastmod("yesterday") is None
+
+
+def test_discover_product_links_from_gzipped_sitemap_index(sitemap_site):
+    products, categories = discover_product_links(sitemap_site)
+
+    assert products == {
+        sitemap_site + "Seilwinden/Elektrische-Seilwinde-500-kg-Typen": parse_lastmod("2026-10-12T08:30:00Z"),
+        sitemap_site + "Seilwinden/Handseilwinde-Typen": parse_lastmod("2026-09-30"),
+        sitemap_site + "Kettenzuege/Handkettenzug-Typen": None,
+    }
+    # Main groups are not listing pages; the missing sitemap is skipped
+    assert categories == {sitemap_site + "Seilwinden-Gruppe", sitemap_site + "Kettenzuege-Gruppe"}
+
+
+def test_discover_product_links_without_robots_sitemap(sitemap_site, tmp_path):
+    os.remove(tmp_path / "robots.txt")
+    shutil.copy(tmp_path / "sitemap_categories.xml", tmp_path / "sitemap.xml")
+
+    products, categories = discover_product_links(sitemap_site)
+    assert products == {}
+    assert categories == {sitemap_site + "Seilwinden-Gruppe", sitemap_site + "Kettenzuege-Gruppe"}
+
+
+def test_only_categories_with_all_known_products_in_the_sitemap_are_covered(sitemap_site):
+    products, categories = discover_product_links(sitemap_site)
+    seilwinden, kettenzuege = sitemap_site + "Seilwinden-Gruppe", sitemap_site + "Kettenzuege-Gruppe"
+    known = {
+        seilwinden: {sitemap_site + "Seilwinden/Elektrische-Seilwinde-500-kg-Typen",
+                     sitemap_site + "Seilwinden/Handseilwinde-Typen"},
+        # A product the listing showed but the sitemap leaves out
+        kettenzuege: {sitemap_site + "Kettenzuege/Handkettenzug-Typen",
+                      sitemap_site + "Kettenzuege/Elektrokettenzug-Typen"},
+    }
+    assert covered_categories(categories, products, known) == {seilwinden}
+    # Categories no listing crawl has seen yet are never covered
+    assert covered_categories(categories, products, {}) == set()
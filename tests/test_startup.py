@@ -0,0 +1,36 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from benchmark import ALL_BACKENDS
+
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ['selenium', 'playwright', 'pandas', 'numpy', 'openpyxl']
+
+
+def _loaded_after(code):
+    """Run code in a fresh interpreter and return which heavy modules it left imported."""
+    script = f"{code}\nimport json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    result = subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR, capture_output=True, text=True,
+                            check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+@pytest.mark.parametrize("module", ["main", "archive", "catalog_store", "chunked_job", "lookup_api"])
+def test_importing_a_stage_loads_no_browser_or_export_backend(module):
+    assert _loaded_after(f"import {module}") == []
+
+
+def test_cli_help_loads_no_backend():
+    assert _loaded_after("import sys, main\nsys.argv = ['main.py', '--help']\n"
+                         "try:\n    main.main()\nexcept SystemExit:\n    pass") == []
+
+
+def test_backends_load_when_a_stage_uses_them(tmp_path):
+    assert 'pandas' in _loaded_after(f"import main\nmain.export_to_excel([{{'a': 1}}], {str(tmp_path / 'x.xlsx')!r})")
+    # The benchmark's eager case still names every backend the stages import lazily
+    assert {backend.split('.')[0] for backend in ALL_BACKENDS} <= set(HEAVY_MODULES)
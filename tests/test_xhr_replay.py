@@ -0,0 +1,80 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from xhr_replay import PatternMismatch, learn_pattern, replay_listing
+
+
+BATCH = 4
+BATCHES = 3
+
+
+def _links(slug, page):
+    return [f"/{slug}/Produkt-{(page - 1) * BATCH + idx}-Typen" for idx in range(BATCH)]
+
+
+class _ListingHandler(BaseHTTPRequestHandler):
+    """A listing that shows the first batch statically and lazy-loads the rest from /ajax?cat=&page=."""
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/ajax":
+            params = parse_qs(parsed.query)
+            page = int(params['page'][0])
+            links = _links(params['cat'][0], page) if 1 <= page <= BATCHES else []
+            body = json.dumps({'html': "".join(f'<a href="{link}">Produkt</a>' for link in links)})
+            content_type = "application/json"
+        else:
+            slug = parsed.path.strip("/")
+            body = "<html><body>" + "".join(f'<a href="{link}">Produkt</a>' for link in _links(slug, 1))
+            body += "</body></html>"
+            content_type = "text/html"
+
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def listing_site():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _ListingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _learned_pattern(base_url, slug):
+    captured = [{'method': 'GET', 'url': f"{base_url}/ajax?cat={slug}&page={page}", 'post_data': None,
+                 'status': 200, 'product_count': BATCH} for page in (2, 3)]
+    return learn_pattern(captured, f"{base_url}/{slug}", BATCH)
+
+
+def test_replay_collects_every_batch_of_another_category(listing_site):
+    pattern = _learned_pattern(listing_site, "101-Seilwinden-Gruppe")
+    assert pattern['query'] == [['cat', '{category_slug}']]
+
+    product_links, _ = replay_listing(f"{listing_site}/202-Kettenzuege-Gruppe", pattern)
+    expected = {listing_site + link for page in range(1, BATCHES + 1) for link in _links("202-Kettenzuege-Gruppe", page)}
+    assert product_links == expected
+
+
+def test_replay_rejects_a_pattern_that_serves_the_learned_category(listing_site):
+    pattern = _learned_pattern(listing_site, "101-Seilwinden-Gruppe")
+    # The category did not get templated, so every replay asks for the learned one
+    pattern['query'] = [['cat', "101-Seilwinden-Gruppe"]]
+
+    with pytest.raises(PatternMismatch):
+        replay_listing(f"{listing_site}/202-Kettenzuege-Gruppe", pattern)
@@ -0,0 +1,355 @@
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qsl, urljoin, urlparse, urlunparse
+
+import http_client
+from archive import archive_page
+from engines import COOKIE_BUTTON, scroll_to_bottom
+from processes import browser_env
+from profiling import record_page
+from revisit import record_listing_cards
+
+
+# Query/body parameter names that usually carry the paging position
+PAGING_NAMES = re.compile(r'^(page|p|seite|offset|start|from|skip|anzahl|limitstart|pos)$', re.IGNORECASE)
+PRODUCT_LINK = re.compile(r'([^\s"\'<>\\]+-Typen)(?![\w-])')
+
+# The fetcher used by get_all_product_links; None means plain browser rendering.
+_active_fetcher = None
+
+
+def get_active_fetcher():
+    """Return the active XhrListingFetcher, or None when XHR discovery is off."""
+    return _active_fetcher
+
+
+class PatternMismatch(Exception):
+    """The learned XHR pattern no longer produces the expected responses."""
+
+
+def extract_product_links(text, base_url):
+    """Find product (-Typen) links in an HTML fragment or JSON response body."""
+    text = text.replace('\\/', '/')
+    return {urljoin(base_url, href) for href in PRODUCT_LINK.findall(text)}
+
+
+def _category_tokens(category_url):
+    """Return the values that identify a category in request parameters (id and slug)."""
+    slug = urlparse(category_url).path.strip('/').split('/')[-1]
+    tokens = {'{category_slug}': slug}
+    match = re.match(r'(\d+)-', slug)
+    if match:
+        tokens['{category_id}'] = match.group(1)
+    return tokens
+
+
+def _templated(params, category_url):
+    """Replace category-specific parameter values with placeholders."""
+    tokens = _category_tokens(category_url)
+    templated = []
+    for name, value in params:
+        for placeholder, token in tokens.items():
+            if value == token:
+                value = placeholder
+                break
+        templated.append([name, value])
+    return templated
+
+
+def _filled(params, category_url):
+    """Fill category placeholders in templated parameters for another category."""
+    tokens = _category_tokens(category_url)
+    return [(name, tokens.get(value, value)) for name, value in params]
+
+
+#####################################################################################################
+## LEARNING
+#####################################################################################################
+
+def learn_pattern(captured, category_url, initial_batch_size):
+    """
+    Infer how the listing's lazy-load endpoint pages through products.
+
+    Args:
+        captured (list[dict]): Background requests seen while scrolling, each
+            with method, url, post_data and product_count
+        category_url (str): Listing page the requests were captured on
+        initial_batch_size (int): Products present before any scrolling
+
+    Returns:
+        dict | None: The pattern, or None if no paging request was recognised
+    """
+    candidates = [c for c in captured if c['product_count'] > 0]
+    if not candidates:
+        return None
+
+    # The endpoint that delivered the most product-bearing responses
+    groups = {}
+    for request in candidates:
+        parsed = urlparse(request['url'])
+        groups.setdefault((request['method'], parsed.scheme, parsed.netloc, parsed.path), []).append(request)
+    (method, scheme, netloc, path), requests_ = max(groups.items(), key=lambda item: len(item[1]))
+
+    def split_params(request):
+        query = parse_qsl(urlparse(request['url']).query, keep_blank_values=True)
+        body = parse_qsl(request['post_data'] or '', keep_blank_values=True)
+        return query, body
+
+    first_query, first_body = split_params(requests_[0])
+
+    paging = None
+    for location, params in (('query', first_query), ('body', first_body)):
+        for name, value in params:
+            if not value.isdigit():
+                continue
+            values = []
+            for request in requests_:
+                query, body = split_params(request)
+                other = dict(query if location == 'query' else body).get(name)
+                if other is not None and other.isdigit():
+                    values.append(int(other))
+            steps = {b - a for a, b in zip(values, values[1:])}
+            if len(values) >= 2 and len(steps) == 1 and steps != {0}:
+                paging = {'name': name, 'location': location, 'start': values[0], 'step': steps.pop()}
+                break
+            if len(values) == 1 and PAGING_NAMES.match(name):
+                # Only one request seen: pages step by one, offsets by the batch size
+                step = 1 if name.lower() in ('page', 'p', 'seite') else max(1, initial_batch_size)
+                paging = {'name': name, 'location': location, 'start': values[0], 'step': step}
+                break
+        if paging:
+            break
+
+    if paging is None:
+        return None
+
+    return {
+        'method': method,
+        'url': urlunparse((scheme, netloc, path, '', '', '')),
+        'query': _templated([p for p in first_query if not (paging['location'] == 'query' and p[0] == paging['name'])],
+                            category_url),
+        'body': _templated([p for p in first_body if not (paging['location'] == 'body' and p[0] == paging['name'])],
+                           category_url) if requests_[0]['post_data'] else None,
+        'paging': paging,
+        'initial_batch_size': initial_batch_size,
+        'learned_from': category_url,
+        'learned_at': time.time(),
+    }
+
+
+def capture_listing_requests(url, headers):
+    """
+    Render a listing page in the browser like fetch_page_links, while
+    recording every background request made during scrolling.
+
+    Returns:
+        tuple[set[str], list[str], list[dict], int, str]: Product links,
+            pagination URLs, captured requests, products present before
+            scrolling and the final HTML
+    """
+    from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+    from main import parse_listing_page
+
+    captured = []
+
+    def on_response(response):
+        request = response.request
+        if request.resource_type not in ('xhr', 'fetch'):
+            return
+        try:
+            body = response.text()
+        except Exception:
+            return
+        captured.append({
+            'method': request.method,
+            'url': request.url,
+            'post_data': request.post_data,
+            'status': response.status,
+            'product_count': len(extract_product_links(body, url)),
+        })
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True, env=browser_env())
+        try:
+            context_kwargs = {}
+            if isinstance(headers, dict) and "User-Agent" in headers:
+                context_kwargs["user_agent"] = headers["User-Agent"]
+            page = browser.new_context(**context_kwargs).new_page()
+
+            page.goto(url, wait_until="load", timeout=60000)
+            try:
+                page.locator(COOKIE_BUTTON).first.click(timeout=3000)
+                page.wait_for_timeout(500)
+            except PlaywrightTimeoutError:
+                pass
+
+            initial_products, _ = parse_listing_page(page.content(), url)
+
+            page.on("response", on_response)
+            scroll_to_bottom(page)
+            html = page.content()
+        finally:
+            browser.close()
+
+    cards = {}
+    product_links, page_urls = parse_listing_page(html, url, cards)
+    record_listing_cards(cards)
+    return product_links, page_urls, captured, len(initial_products), html
+
+
+#####################################################################################################
+## REPLAY
+#####################################################################################################
+
+def _request_step(session, pattern, url, query, body, value):
+    """Request one step of the lazy-load endpoint and return the response body."""
+    paging = pattern['paging']
+    step_query = query + [(paging['name'], value)] if paging['location'] == 'query' else query
+    step_body = body + [(paging['name'], value)] if paging['location'] == 'body' else body
+
+    try:
+        resp = session.request(pattern['method'], pattern['url'], params=step_query, data=step_body,
+                               headers={'Referer': url, 'X-Requested-With': 'XMLHttpRequest'}, timeout=30)
+        resp.raise_for_status()
+    except Exception as e:
+        raise PatternMismatch(f"Endpoint request failed: {e}") from e
+    return resp.text
+
+
+def replay_listing(url, pattern, max_steps=200):
+    """
+    Collect a listing page's products with plain HTTP: the static page first,
+    then the lazy-load endpoint, step by step, until it returns nothing new.
+
+    Before paging, the endpoint is asked for the batch preceding the first
+    lazily loaded one, which is the batch the static page shows. If the two
+    share no product, the pattern did not carry this category into the
+    request (it would serve the products of the category it was learned on).
+
+    Raises:
+        PatternMismatch: If the endpoint fails, returns another listing's
+            products or stops returning products where the browser would
+            have loaded more
+    """
+    from main import parse_listing_page
+
+    session = http_client.get_session()
+    timings = {}
+
+    started = time.perf_counter()
+    html = http_client.fetch_text(url)
+    # Only server-rendered cards get fingerprints; lazily loaded products keep the revisit interval
+    cards = {}
+    product_links, page_urls = parse_listing_page(html, url, cards)
+    record_listing_cards(cards)
+    timings['static'] = time.perf_counter() - started
+
+    paging = pattern['paging']
+    query = _filled(pattern['query'], url)
+    body = _filled(pattern['body'], url) if pattern['body'] is not None else None
+
+    started = time.perf_counter()
+    first_value = paging['start'] - paging['step']
+    if product_links and first_value >= 0:
+        first_links = extract_product_links(_request_step(session, pattern, url, query, body, str(first_value)), url)
+        if not first_links & product_links:
+            raise PatternMismatch(f"Endpoint returned {len(first_links)} products, none of them on the listing page")
+
+    for step in range(max_steps):
+        value = str(paging['start'] + step * paging['step'])
+        new_links = extract_product_links(_request_step(session, pattern, url, query, body, value), url) - product_links
+        if not new_links:
+            # A full first batch means the browser would have loaded more
+            if step == 0 and len(product_links) >= pattern['initial_batch_size'] > 0:
+                raise PatternMismatch("Endpoint returned no products for a full listing page")
+            break
+        product_links.update(new_links)
+    timings['xhr'] = time.perf_counter() - started
+
+    record_page(url, timings, html)
+    archive_page(url, html, 'listing')
+    return product_links, page_urls
+
+
+class XhrListingFetcher:
+    """
+    Listing fetcher that replays the lazy-load endpoint over plain HTTP.
+
+    The first listing page is rendered in the browser to capture and learn
+    the endpoint's parameter pattern (or the pattern is loaded from
+    `pattern_file`). Later pages are fetched with plain HTTP calls; when the
+    pattern stops matching, that page falls back to the browser and the
+    pattern is learned again.
+    """
+
+    def __init__(self, pattern_file='xhr_pattern.json'):
+        self.pattern_file = pattern_file
+        self.pattern = None
+        self._lock = threading.Lock()
+        self.replayed = 0
+        self.rendered = 0
+        self.replay_seconds = 0.0
+        self.render_seconds = 0.0
+
+        if pattern_file and os.path.exists(pattern_file):
+            with open(pattern_file, encoding='utf-8') as f:
+                self.pattern = json.load(f)
+
+    def __enter__(self):
+        global _active_fetcher
+        _active_fetcher = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active_fetcher
+        if _active_fetcher is self:
+            _active_fetcher = None
+        self.print_summary()
+        return False
+
+    def _render_and_learn(self, url, headers):
+        started = time.perf_counter()
+        product_links, page_urls, captured, initial_count, html = capture_listing_requests(url, headers)
+        pattern = learn_pattern(captured, url, initial_count)
+
+        with self._lock:
+            self.rendered += 1
+            self.render_seconds += time.perf_counter() - started
+            if pattern is not None:
+                self.pattern = pattern
+                if self.pattern_file:
+                    with open(self.pattern_file, 'w', encoding='utf-8') as f:
+                        json.dump(pattern, f, indent=2)
+                print(f"  Learned lazy-load pattern: {pattern['method']} {pattern['url']} "
+                      f"({pattern['paging']['name']} from {pattern['paging']['start']} step {pattern['paging']['step']})")
+
+        archive_page(url, html, 'listing')
+        return product_links, page_urls
+
+    def fetch_page_links(self, url, headers):
+        """Same contract as main.fetch_page_links."""
+        pattern = self.pattern
+        if pattern is None:
+            return self._render_and_learn(url, headers)
+
+        started = time.perf_counter()
+        try:
+            result = replay_listing(url, pattern)
+        except PatternMismatch as e:
+            print(f"  Lazy-load pattern no longer matches on {url} ({e}); rendering in the browser")
+            return self._render_and_learn(url, headers)
+
+        with self._lock:
+            self.replayed += 1
+            self.replay_seconds += time.perf_counter() - started
+        return result
+
+    def print_summary(self):
+        if self.replayed or self.rendered:
+            replay_avg = self.replay_seconds / self.replayed if self.replayed else 0
+            render_avg = self.render_seconds / self.rendered if self.rendered else 0
+            print(f"XHR discovery: {self.replayed} listing pages replayed over HTTP ({replay_avg:.2f}s avg), "
+                  f"{self.rendered} rendered in the browser ({render_avg:.2f}s avg)")